@@ -5,6 +5,8 @@ from typing import List, Dict, Union, Optional
 import numpy as np
 from transformers import AutoModel, AutoTokenizer
 
+from utils.embedding_registry import get_embedding_model
+
 
 # 你的MLP模型定义（保持不变）
 class MLP(nn.Module):
@@ -81,8 +83,42 @@ class MLP(nn.Module):
 
 
 # ------------------------------
-# 修复：文本转Embedding函数（直接使用Hugging Face加载Qwen3）
+# 文本转Embedding：Qwen3模型通过进程级注册表只加载一次
 # ------------------------------
+class _HFEmbeddingEncoder:
+    """把Hugging Face的AutoModel封装为encode接口（供嵌入模型注册表使用）"""
+
+    def __init__(self, model_path: str, device: str):
+        print(f"正在加载Qwen3-Embedding模型：{model_path}（设备：{device}）")
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+        self.model = AutoModel.from_pretrained(model_path, trust_remote_code=True).to(device)
+        self.model.eval()  # 评估模式
+
+    def encode(self, texts: List[str], batch_size: int = 32, max_length: int = 512) -> np.ndarray:
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            # Tokenize（padding=True自动填充，truncation=True自动截断）
+            inputs = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors="pt"
+            ).to(self.device)
+
+            # 生成Embedding（禁用梯度计算）
+            with torch.no_grad():
+                outputs = self.model(**inputs)
+                # 优先使用模型直接输出的embeddings，否则取最后一层隐藏状态的[CLS] token
+                if hasattr(outputs, 'embeddings'):
+                    embeddings = outputs.embeddings
+                else:
+                    embeddings = outputs.last_hidden_state[:, 0, :]  # (batch_size, embedding_dim)
+            chunks.append(embeddings.float().cpu().numpy())
+        return np.concatenate(chunks, axis=0)
+
+
 def text_to_embedding(
         text: Union[str, List[str]],
         model_path: str = "/root/autodl-tmp/Qwen3-Embedding-8B",
@@ -91,7 +127,7 @@ def text_to_embedding(
         max_length: int = 512  # Qwen3默认最大长度
 ) -> np.ndarray:
     """
-    直接使用Hugging Face加载Qwen3-Embedding模型，生成文本Embedding
+    使用Qwen3-Embedding模型生成文本Embedding（模型在进程内只加载一次，并发调用共享前向计算）
 
     Args:
         text: 输入文本（单个字符串或列表）
@@ -106,44 +142,20 @@ def text_to_embedding(
     # 1. 设备自动检测
     if device is None:
         device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Qwen3-Embedding 使用设备：{device}")
 
-    # 2. 加载Qwen3的Tokenizer和Model（直接用Hugging Face接口）
-    print(f"正在加载Qwen3-Embedding模型：{model_path}")
-    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
-    model = AutoModel.from_pretrained(model_path, trust_remote_code=True).to(device)
-    model.eval()  # 评估模式
+    # 2. 从注册表获取模型句柄（同一模型+设备只加载一次）
+    handle = get_embedding_model(f"hf:{model_path}@{device}",
+                                 loader=lambda: _HFEmbeddingEncoder(model_path, device))
 
     # 3. 文本编码（处理单个/批量文本）
     if isinstance(text, str):
         text = [text]  # 转为列表统一处理
+    embeddings = handle.encode(text, batch_size=32, max_length=max_length)
 
-    # Tokenize（padding=True自动填充，truncation=True自动截断）
-    inputs = tokenizer(
-        text,
-        padding=True,
-        truncation=True,
-        max_length=max_length,
-        return_tensors="pt"
-    ).to(device)
-
-    # 4. 生成Embedding（禁用梯度计算）
-    with torch.no_grad():
-        outputs = model(**inputs)
-        # Qwen3-Embedding的输出格式：last_hidden_state -> 取[CLS] token的embedding（或均值）
-        # 优先使用模型的pooling逻辑，如果没有则用[CLS] token
-        if hasattr(outputs, 'embeddings'):
-            embeddings = outputs.embeddings  # 部分Qwen3模型直接输出embeddings
-        else:
-            # 常规处理：取最后一层隐藏状态的[CLS] token（index=0）
-            embeddings = outputs.last_hidden_state[:, 0, :]  # (batch_size, embedding_dim)
-
-    # 5. 归一化（可选，与训练时保持一致）
+    # 4. 归一化（可选，与训练时保持一致）
     if normalize_embedding:
-        embeddings = F.normalize(embeddings, p=2, dim=1)  # L2归一化
-
-    # 6. 转为numpy数组并返回
-    return embeddings.cpu().numpy()
+        embeddings = F.normalize(torch.from_numpy(embeddings), p=2, dim=1).numpy()  # L2归一化
+    return embeddings
 
 
 # ------------------------------
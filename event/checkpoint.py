@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+逐日完成日志（断点续跑）
+
+每个日期生成结束后向JSONL日志追加一行（fsync落盘），只记录状态和当日数据所在的区间日志：
+    {"persona": 人物ID, "date": "YYYY-MM-DD", "status": "done", "journal": 区间逐日日志路径}
+    {"persona": 人物ID, "date": "YYYY-MM-DD", "status": "failed", "error": "..."}
+
+当日中间输出和结束时的Mind状态只保存在区间逐日日志（见Mind.append_day_journal）中，这里按路径读取。
+同一 (人物, 日期) 以最后一条记录为准。重新运行时已完成的日期直接恢复当日结束时的Mind状态
+（thought、长期记忆、短期记忆），只有未完成或失败的日期重新生成；上次失败的日期重新生成时跳过LLM响应缓存。
+当日记忆在记录完成之前就已写入记忆库，重新生成前先删除该日期的记忆（MemoryModule.delete_memories_on_date），
+重试不会产生重复记忆。
+"""
+import threading
+from typing import Dict, List, Optional
+
+from utils.IO import append_jsonl, read_jsonl
+
+
+class DayCheckpoint:
+    """
+    逐日完成日志（线程安全，各区间线程共享同一个实例）
+
+    参数:
+        journal_file: JSONL日志文件路径
+        persona_id: 人物标识（同一日志文件可记录多个人物）
+        fsync: 每条记录写入后是否fsync
+    """
+
+    def __init__(self, journal_file: str, persona_id, fsync: bool = True):
+        self.journal_file = journal_file
+        self.persona_id = str(persona_id)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict] = {}
+        self._day_journals: Dict[str, Dict[str, Dict]] = {}  # {区间日志路径: {日期: 当日记录}}
+        for record in read_jsonl(journal_file):
+            if str(record.get("persona")) == self.persona_id and record.get("date"):
+                self.records[record["date"]] = record
+        done = sum(1 for record in self.records.values() if record.get("status") == "done")
+        if self.records:
+            print(f"已加载逐日完成日志：{journal_file}，已完成 {done} 天，失败 {len(self.records) - done} 天")
+
+    def _read_day_journal(self, day_journal: str) -> Dict[str, Dict]:
+        """读取区间逐日日志中的当日记录（同一日期以最后一行为准），按路径缓存（调用方持有锁）"""
+        days = self._day_journals.get(day_journal)
+        if days is None:
+            days = {}
+            for record in read_jsonl(day_journal):
+                if record.get("type") == "day" and record.get("date"):
+                    days[record["date"]] = record
+            self._day_journals[day_journal] = days
+        return days
+
+    def completed(self, date: str) -> Optional[Dict]:
+        """
+        返回已完成日期在区间逐日日志中的当日记录
+
+        参数:
+            date: 日期（格式：YYYY-MM-DD）
+
+        返回:
+            Optional[Dict]: 当日记录（含outputs、state），未完成、失败或区间日志中找不到该日时返回None
+        """
+        with self._lock:
+            record = self.records.get(date)
+            if record is None or record.get("status") != "done" or not record.get("journal"):
+                return None
+            return self._read_day_journal(record["journal"]).get(date)
+
+    def failed(self, date: str) -> bool:
+        """日期最近一次记录是否为失败"""
+        with self._lock:
+            record = self.records.get(date)
+        return record is not None and record.get("status") == "failed"
+
+    def failed_dates(self) -> List[str]:
+        """最近一次记录为失败的日期（升序）"""
+        with self._lock:
+            return sorted(date for date, record in self.records.items() if record.get("status") == "failed")
+
+    def _append(self, record: Dict) -> None:
+        record = {"persona": self.persona_id, **record}
+        with self._lock:
+            append_jsonl(self.journal_file, [record], fsync=self.fsync)
+            self.records[record["date"]] = record
+
+    def mark_done(self, date: str, day_journal: str) -> None:
+        """
+        记录日期完成
+
+        参数:
+            date: 日期（格式：YYYY-MM-DD）
+            day_journal: 已写入当日记录的区间逐日日志路径
+        """
+        self._append({"date": date, "status": "done", "journal": day_journal})
+        with self._lock:
+            self._day_journals.pop(day_journal, None)  # 区间日志已追加新行，下次读取时重新加载
+
+    def mark_failed(self, date: str, error: str) -> None:
+        """记录日期失败（重新运行时重试）"""
+        self._append({"date": date, "status": "failed", "error": error})
@@ -8,6 +8,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from event.templates import template_event_format_sequence
 from event.mind import llm_call
+from utils.IO import atomic_write_json, read_jsonl
 from utils.llm_call import llm_call_reason, llm_call_reason_j
 
 
@@ -192,14 +193,21 @@ class EventFormatter:
             # 查找该日期文件夹下的intermediate_output文件夹
             intermediate_output_folders = glob.glob(os.path.join(folder, "intermediate_output"))
             for intermediate_folder in intermediate_output_folders:
-                # 查找intermediate_output文件夹中的所有中间输出文件
-                files = glob.glob(os.path.join(intermediate_folder, "intermediate_outputs_thread_*.json"))
+                # 查找intermediate_output文件夹中的所有中间输出文件（逐日日志及旧版按线程保存的JSON）
+                files = glob.glob(os.path.join(intermediate_folder, "intermediate_outputs_*.jsonl"))
+                files += glob.glob(os.path.join(intermediate_folder, "intermediate_outputs_thread_*.json"))
                 intermediate_files.extend(files)
         
+        # 按人物和区间命名的逐日日志（不区分运行日期）
+        intermediate_files.extend(glob.glob(os.path.join(self.data_dir, "intermediate_output", "intermediate_outputs_*.jsonl")))
+        
         # 如果在日期文件夹下没找到，检查根目录下是否有直接的中间输出文件
-        root_files = glob.glob(os.path.join(self.data_dir, "intermediate_outputs_thread_*.json"))
+        root_files = glob.glob(os.path.join(self.data_dir, "intermediate_outputs_*.jsonl"))
+        root_files += glob.glob(os.path.join(self.data_dir, "intermediate_outputs_thread_*.json"))
         intermediate_files.extend(root_files)
         
+        # 按修改时间排序，同一日期出现在多个文件中（如重新运行）时以最新的为准
+        intermediate_files.sort(key=os.path.getmtime)
         return intermediate_files
     
     def extract_adjusted_events(self, file_path: str) -> List[Dict]:
@@ -207,14 +215,22 @@ class EventFormatter:
         从中间输出文件中提取adjusted_events
         
         参数:
-            file_path: 中间输出文件路径
+            file_path: 中间输出文件路径（逐日日志.jsonl或旧版.json）
         
         返回:
             List[Dict]: adjusted_events列表，每个元素包含日期和对应的事件
         """
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            if file_path.endswith(".jsonl"):
+                # 逐日日志：按行顺序读取，同一日期重复时以最后一行为准
+                data = {}
+                for record in read_jsonl(file_path):
+                    if record.get("type") == "day" and record.get("date"):
+                        data.pop(record["date"], None)
+                        data[record["date"]] = record.get("outputs", {})
+            else:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
             
             adjusted_events_list = []
             for date, outputs in data.items():
@@ -370,9 +386,8 @@ class EventFormatter:
         intermediate_files = self.find_all_intermediate_files()
         print(f"找到 {len(intermediate_files)} 个中间输出文件")
         
-        # 收集所有需要处理的任务
-        tasks = []
-        task_id = 1
+        # 收集所有需要处理的任务（同一日期只保留最新文件中的一份）
+        items_by_date = {}
         
         for file_path in intermediate_files:
             print(f"收集文件 {file_path} 的任务")
@@ -382,17 +397,17 @@ class EventFormatter:
             
             # 收集每个日期的事件处理任务
             for item in adjusted_events_list:
-                date = item["date"]
-                events = item["events"]
-                poi_data = item["poi_data"]
-                
-                tasks.append({
-                    'task_id': task_id,
-                    'events': events,
-                    'poi_data': poi_data,
-                    'date': date
-                })
-                task_id += 1
+                items_by_date.pop(item["date"], None)
+                items_by_date[item["date"]] = item
+        
+        tasks = []
+        for task_id, item in enumerate(items_by_date.values(), start=1):
+            tasks.append({
+                'task_id': task_id,
+                'events': item["events"],
+                'poi_data': item["poi_data"],
+                'date': item["date"]
+            })
         
         print(f"共收集到 {len(tasks)} 个处理任务")
         
@@ -465,14 +480,8 @@ class EventFormatter:
         if output_path is None:
             output_path = os.path.join(self.data_dir, "event.json")
         
-        # 确保输出目录存在
-        output_dir = os.path.dirname(output_path)
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        # 保存到JSON文件
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(self.formatted_events, f, ensure_ascii=False, indent=2)
+        # 原子写入JSON文件（自动创建输出目录）
+        atomic_write_json(output_path, self.formatted_events)
         
         print(f"格式化后的事件已保存到: {output_path}")
     
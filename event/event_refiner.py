@@ -9,6 +9,7 @@ from event.template2 import template_daily_event_refine, template_daily_diversit
 from utils.llm_call import llm_call
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
+from utils.IO import atomic_write_json
 from utils.llm_call import llm_call
 
 
@@ -73,22 +74,6 @@ class EventRefiner:
     
 
     
-    def extract_start_date(self, date_str: str) -> str:
-        """
-        提取起始日期
-        
-        参数:
-            date_str: 日期字符串，格式可能为"YYYY-MM-DD"、"YYYY-MM-DD HH:MM:SS"或"YYYY-MM-DD 至 YYYY-MM-DD"
-            
-        返回:
-            str: 起始日期，格式为"YYYY-MM-DD"
-        """
-        if " " in date_str:
-            return date_str.split()[0]
-        elif "至" in date_str:
-            return date_str.split("至")[0].strip()
-        return date_str
-
     def _get_bottom_level_events(self, events: List[Dict]) -> List[Dict]:
         """
         递归地获取所有底层事件
@@ -118,8 +103,25 @@ class EventRefiner:
         返回:
             List[Dict]: 筛选出的事件列表
         """
-        all_events = self._get_bottom_level_events(events)
-        return [e for e in all_events if self.extract_start_date(e["date"]) == [target_date]]
+        return self.build_date_index(events).get(target_date, [])
+
+    def build_date_index(self, events: List[Dict]) -> Dict[str, List[Dict]]:
+        """
+        按日期对底层事件分组（逐日筛选时先分组一次，再按日查询）
+        只收录date恰好为[单个日期]的事件，与逐日比较 e["date"] == [target_date] 的结果一致
+        
+        参数:
+            events: 事件列表
+            
+        返回:
+            Dict[str, List[Dict]]: {日期: 事件列表}，事件保持原顺序
+        """
+        index = {}
+        for event in self._get_bottom_level_events(events):
+            date = event.get("date")
+            if isinstance(date, list) and len(date) == 1 and isinstance(date[0], str):
+                index.setdefault(date[0], []).append(event)
+        return index
 
     def get_event_by_id(self, events: List[Dict], event_id: str) -> Dict:
         """
@@ -298,8 +300,9 @@ class EventRefiner:
             
             # 获取两周内的所有底层事件
             event_sequence = []
+            date_index = self.build_date_index(events)
             for date in all_dates:
-                date_events = self.filter_by_date(events, date)
+                date_events = date_index.get(date, [])
                 #print(len(date_events))
                 event_sequence.extend(date_events)
             
@@ -431,20 +434,11 @@ class EventRefiner:
             dailylife_data: 每日生活数据列表
             output_path: 输出文件路径，默认保存到output文件夹下的daily_state.json
         """
-        import os
-        import json
-        
-        # 确保输出目录存在
-        output_dir = os.path.dirname(output_path)
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
         # 按日期排序
         dailylife_data.sort(key=lambda x: x.get('date', ''))
         
-        # 保存到JSON文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(dailylife_data, f, ensure_ascii=False, indent=2)
+        # 保存到JSON文件（atomic_write_json会创建输出目录）
+        atomic_write_json(output_path, dailylife_data)
         
         print(f"每日生活数据已保存到: {output_path}")
 
@@ -520,8 +514,9 @@ class EventRefiner:
                 
                 # 获取该日期范围内的所有底层事件
                 event_sequence = []
+                date_index = self.build_date_index(events)
                 for date in range_dates:
-                    date_events = self.filter_by_date(events, date)
+                    date_events = date_index.get(date, [])
                     event_sequence.extend(date_events)
 
                 # 如果没有事件，直接返回空结果
@@ -554,8 +549,9 @@ class EventRefiner:
                 
                 # 为daily_life数据添加事件字段
                 daily_life_data = []
+                updated_date_index = self.build_date_index(updated_events)
                 for date in range_dates:
-                    date_events = self.filter_by_date(updated_events, date)
+                    date_events = updated_date_index.get(date, [])
                     event_descriptions = []
                     event_ids = []
                     for event in date_events:
@@ -1377,8 +1373,7 @@ class EventRefiner:
         # 保存所有报告到一个汇总文件
         summary_file_path = os.path.join(output_dir, "all_monthly_health_reports.json")
         try:
-            with open(summary_file_path, 'w', encoding='utf-8') as f:
-                json.dump(sorted_reports, f, ensure_ascii=False, indent=2)
+            atomic_write_json(summary_file_path, sorted_reports)
             print(f"已保存所有月度健康报告汇总到: {summary_file_path}")
         except Exception as e:
             print(f"保存月度健康报告汇总时出错: {e}")
@@ -1,7 +1,7 @@
 import json
 import os
 import threading
-from utils.llm_call import llm_call
+from utils.llm_call import llm_call, MAX_CONCURRENCY
 
 class EventTreeClassifier:
     def __init__(self):
@@ -333,8 +333,8 @@ class EventTreeClassifier:
         total_events = len(bottom_events)
         print(f"Found {total_events} bottom-level events.")
         
-        # Calculate events per thread
-        num_threads = 24
+        # Calculate events per thread (thread count follows the global LLM concurrency limit)
+        num_threads = max(1, min(MAX_CONCURRENCY, total_events))
         events_per_thread = total_events // num_threads
         remainder = total_events % num_threads
         
@@ -372,4 +372,83 @@ class FuzzyMemoryBuilder:
         """
         if not hasattr(FuzzyMemoryBuilder, "_instance"):
             FuzzyMemoryBuilder._instance = FuzzyMemoryBuilder(event_data, persona, output_dir)
-        return FuzzyMemoryBuilder._instance
\ No newline at end of file
+        return FuzzyMemoryBuilder._instance
+
+class DailySummaryCache:
+    """
+    当月滚动总结缓存：键为 (人物, 月份, 日)，值为当月1日到该日的总结
+
+    人物由输出目录区分（每个人物一个数据目录），同一目录在进程内只有一个实例，多个Mind实例共享；
+    总结持久化到 daily_summaries.json，中断后重新运行时直接复用。
+    每条记录带有生成时所用事件的摘要（digest），事件或画像变化后旧记录不再命中。
+    """
+    _instances: Dict[str, "DailySummaryCache"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.file = os.path.join(output_dir, "daily_summaries.json")
+        self.lock = threading.RLock()
+        self._date_locks: Dict[str, threading.Lock] = {}
+        # 格式：{"2025-03-05": {"digest": "...", "summary": "总结内容"}}
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(self.file):
+            self.entries = read_json_file(self.file) or {}
+
+    @classmethod
+    def get_instance(cls, output_dir: str) -> "DailySummaryCache":
+        key = os.path.abspath(output_dir)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(output_dir)
+            return cls._instances[key]
+
+    def date_lock(self, date: str) -> threading.Lock:
+        """同一日期的总结只生成一次，并发请求等待先到者的结果"""
+        with self.lock:
+            return self._date_locks.setdefault(date, threading.Lock())
+
+    def get(self, date: str, digest: str) -> Optional[str]:
+        """
+        读取某日的总结
+
+        参数:
+            date: 日期，格式为"YYYY-MM-DD"
+            digest: 当前事件摘要，与记录不一致时视为未命中
+
+        返回:
+            Optional[str]: 总结内容，未命中返回None
+        """
+        with self.lock:
+            entry = self.entries.get(date)
+        if entry is None or entry.get("digest") != digest:
+            return None
+        return entry.get("summary", "")
+
+    def latest_before(self, date: str, digests: Dict[str, str]) -> Optional[tuple]:
+        """
+        查找同月中早于date、且事件摘要仍然一致的最近一日的总结
+
+        参数:
+            date: 目标日期，格式为"YYYY-MM-DD"
+            digests: {日期: 当前事件摘要}，覆盖当月1日到目标日期
+
+        返回:
+            Optional[tuple]: (日期, 总结内容)，没有可用记录时返回None
+        """
+        with self.lock:
+            candidates = sorted(
+                (d for d in self.entries if d[:7] == date[:7] and d < date and d in digests),
+                reverse=True
+            )
+            for d in candidates:
+                if self.entries[d].get("digest") == digests[d]:
+                    return d, self.entries[d].get("summary", "")
+        return None
+
+    def put(self, date: str, digest: str, summary: str) -> None:
+        """写入某日的总结并持久化"""
+        with self.lock:
+            self.entries[date] = {"digest": digest, "summary": summary}
+            if not write_json_file(self.file, self.entries):
+                print(f"保存当月滚动总结失败：{self.file}")
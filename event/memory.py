@@ -1,12 +1,16 @@
+import base64
+import bisect
 import json
 import os
+import re
+import tempfile
 import threading
-from datetime import datetime
+from datetime import date as Date, datetime
 from collections import defaultdict
 import numpy as np
 from typing import List, Dict, Any, Optional
-
-from sentence_transformers import SentenceTransformer
+from utils.IO import atomic_write_json, dumps_json, load_json, loads_json
+from utils.embedding_registry import get_sentence_encoder
 
 
 class MemoryModule:
@@ -30,6 +34,14 @@ class MemoryModule:
         """添加记忆"""
         return self.mem_mgr.add_memory(data)
 
+    def add_memories(self, data: List[Dict]) -> List[str]:
+        """批量添加记忆（一次批量编码、一次持久化）"""
+        return self.mem_mgr.add_memories(data)
+
+    def delete_memories_on_date(self, date: str) -> int:
+        """删除指定日期的全部记忆"""
+        return self.mem_mgr.delete_memories_on_date(date)
+
     def search_by_date(self, start_time: str) -> List[Dict]:
         """按日期检索记忆"""
         return self.mem_mgr.search_by_date(start_time)
@@ -40,31 +52,392 @@ class MemoryModule:
 
     @classmethod
     def destroy_instance(cls, instance_id: str = "default"):
-        """销毁指定实例"""
+        """销毁指定实例（销毁前写入快照并关闭操作日志）"""
         with cls._lock:
             if instance_id in cls._instances:
+                cls._instances[instance_id].mem_mgr.close()
                 del cls._instances[instance_id]
 
 
+class EmbeddingMatrix:
+    """
+    连续存储的嵌入矩阵：每行一个L2归一化后的float32向量，配合行号↔事件ID映射
+
+    余弦相似度检索退化为一次矩阵-向量乘法 + argpartition取top-k，
+    容量按倍数增长，追加为均摊O(1)
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._capacity = capacity
+        self._matrix: Optional[np.ndarray] = None  # 首次写入时按向量维度分配
+        self._ids: List[str] = []  # 行号 -> 事件ID
+        self._rows: Dict[str, int] = {}  # 事件ID -> 行号
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self._rows
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / (norms + 1e-8)
+
+    def _reserve(self, size: int, dim: int) -> None:
+        if self._matrix is None:
+            self._matrix = np.zeros((max(self._capacity, size), dim), dtype=np.float32)
+        elif size > self._matrix.shape[0]:
+            grown = np.zeros((max(size, self._matrix.shape[0] * 2), dim), dtype=np.float32)
+            grown[:len(self._ids)] = self._matrix[:len(self._ids)]
+            self._matrix = grown
+
+    def add(self, event_id: str, vector: np.ndarray) -> None:
+        """追加（或覆盖）一个事件的嵌入向量"""
+        self.add_batch([event_id], np.asarray(vector).reshape(1, -1))
+
+    def add_batch(self, event_ids: List[str], vectors: np.ndarray) -> None:
+        """批量追加嵌入向量，vectors形状为(len(event_ids), dim)"""
+        if not event_ids:
+            return
+        vectors = self._normalize(vectors)
+        for event_id, vector in zip(event_ids, vectors):
+            row = self._rows.get(event_id)
+            if row is None:
+                row = len(self._ids)
+                self._reserve(row + 1, vectors.shape[1])
+                self._ids.append(event_id)
+                self._rows[event_id] = row
+            if not self._matrix.flags.writeable:
+                # 快照的只读内存映射：覆盖已有行时才复制到内存（追加新行时扩容已换成内存数组）
+                self._matrix = np.array(self._matrix)
+            self._matrix[row] = vector
+
+    @classmethod
+    def from_snapshot(cls, event_ids: List[str], matrix: np.ndarray) -> "EmbeddingMatrix":
+        """
+        直接采用快照中的矩阵（已归一化，可以是只读内存映射），不复制也不重新归一化
+
+        参数:
+            event_ids: 行号顺序的事件ID列表
+            matrix: (len(event_ids), dim) 的已归一化float32矩阵
+        """
+        embeddings = cls()
+        embeddings._matrix = matrix
+        embeddings._ids = list(event_ids)
+        embeddings._rows = {eid: row for row, eid in enumerate(embeddings._ids)}
+        return embeddings
+
+    def fork(self) -> "EmbeddingMatrix":
+        """
+        写时复制的分叉：共享底层数组，复制行号映射
+
+        分叉后的追加只写入原对象可见行之外的位置（扩容时换用新数组），原对象看到的内容保持不变
+        """
+        clone = EmbeddingMatrix(self._capacity)
+        clone._matrix = self._matrix
+        clone._ids = list(self._ids)
+        clone._rows = dict(self._rows)
+        return clone
+
+    def remove(self, event_ids) -> None:
+        """删除一组事件的向量（压缩到新数组，不修改可能被分叉共享的原数组）"""
+        drop = {eid for eid in event_ids if eid in self._rows}
+        if not drop:
+            return
+        keep = [row for row, eid in enumerate(self._ids) if eid not in drop]
+        if self._matrix is not None:
+            self._matrix = self._matrix[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {eid: row for row, eid in enumerate(self._ids)}
+
+    def get(self, event_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(event_id)
+        return None if row is None else self._matrix[row]
+
+    def rows_for(self, event_ids) -> np.ndarray:
+        """返回一组事件ID对应的行号（忽略不存在的ID）"""
+        return np.fromiter((self._rows[eid] for eid in event_ids if eid in self._rows), dtype=np.int64)
+
+    def items(self):
+        for row, eid in enumerate(self._ids):
+            yield eid, self._matrix[row]
+
+    def export(self) -> tuple:
+        """返回(行号顺序的事件ID列表, 有效行组成的矩阵视图)，用于快照"""
+        if self._matrix is None:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return list(self._ids), self._matrix[:len(self._ids)]
+
+    def top_k(self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[tuple]:
+        """
+        余弦相似度top-k检索
+
+        参数:
+            query: 查询向量（无需归一化）
+            k: 返回数量
+            rows: 候选行号（None表示全部），用于按日期等条件过滤后的检索
+
+        返回:
+            List[tuple]: [(事件ID, 相似度)]，按相似度降序
+        """
+        if not self._ids or k <= 0:
+            return []
+        query = self._normalize(query)
+        if rows is None:
+            candidates = None
+            scores = self._matrix[:len(self._ids)] @ query
+        else:
+            if len(rows) == 0:
+                return []
+            candidates = rows
+            scores = self._matrix[rows] @ query
+        if k < len(scores):
+            # argpartition找到第k大的分数；与之相等的并列项按行号取最早的，结果与稳定全排序一致
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:k - len(above)]
+            top = np.concatenate([above, ties])
+        else:
+            top = np.arange(len(scores))
+        top = top[np.lexsort((top, -scores[top]))]
+        if candidates is not None:
+            return [(self._ids[candidates[i]], float(scores[i])) for i in top]
+        return [(self._ids[i], float(scores[i])) for i in top]
+
+
+_DATE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})(?: \d{2}:\d{2}:\d{2})?$")
+
+
+class DateIndex:
+    """
+    记忆日期的有序索引：按日序数（date.toordinal）排序的日期列表
+
+    日期字符串只在写入时解析一次，点查询和区间查询通过bisect完成，复杂度O(log n + k)
+    """
+
+    def __init__(self, dates=()):
+        self._ordinals: List[int] = []  # 升序日序数
+        self._dates: List[str] = []  # 与_ordinals一一对应的日期字符串（YYYY-MM-DD）
+        for date_str in dates:
+            self.add(date_str)
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def copy(self) -> "DateIndex":
+        clone = DateIndex()
+        clone._ordinals = list(self._ordinals)
+        clone._dates = list(self._dates)
+        return clone
+
+    @staticmethod
+    def ordinal(date_str: str) -> int:
+        return Date.fromisoformat(date_str).toordinal()
+
+    def add(self, date_str: str) -> None:
+        """登记一个日期（已存在时忽略）"""
+        ordinal = self.ordinal(date_str)
+        pos = bisect.bisect_left(self._ordinals, ordinal)
+        if pos < len(self._ordinals) and self._ordinals[pos] == ordinal:
+            return
+        self._ordinals.insert(pos, ordinal)
+        self._dates.insert(pos, date_str)
+
+    def range(self, start_ordinal: int, end_ordinal: int) -> List[str]:
+        """返回[start, end]闭区间内的日期（升序）"""
+        lo = bisect.bisect_left(self._ordinals, start_ordinal)
+        hi = bisect.bisect_right(self._ordinals, end_ordinal)
+        return self._dates[lo:hi]
+
+    def before(self, ordinal: int) -> List[str]:
+        """返回早于给定日序数的日期（升序）"""
+        return self._dates[:bisect.bisect_left(self._ordinals, ordinal)]
+
+    def discard(self, date_str: str) -> None:
+        """删除一个日期（不存在时忽略）"""
+        pos = bisect.bisect_left(self._ordinals, self.ordinal(date_str))
+        if pos < len(self._dates) and self._dates[pos] == date_str:
+            del self._ordinals[pos]
+            del self._dates[pos]
+
+    def discard_before(self, ordinal: int) -> None:
+        """删除早于给定日序数的日期"""
+        pos = bisect.bisect_left(self._ordinals, ordinal)
+        del self._ordinals[:pos]
+        del self._dates[:pos]
+
+
+class MemoryShard:
+    """
+    单月记忆分片：持有该月的记忆、事件ID和嵌入矩阵
+
+    按月淘汰旧记忆时直接丢弃整个分片，代价只与被删除的记忆数量有关。
+    已发布到MemoryView中的分片不再修改，写入方通过fork()得到副本后修改
+    """
+
+    def __init__(self, month: str):
+        self.month = month  # YYYY-MM
+        self.memories: Dict[str, List[Dict[str, str]]] = {}  # {日期: [记忆对象列表]}
+        self.date_event_ids: Dict[str, List[str]] = {}  # {日期: [事件ID列表]}，与memories[日期]按索引一一对应
+        self.event_index: Dict[str, tuple] = {}  # {事件ID: (日期, 记忆索引)}
+        self.embeddings = EmbeddingMatrix(capacity=16)
+        self.embedding_file: Optional[str] = None  # 最近一次快照写入的向量文件名
+        self.dirty = True  # 上次快照之后向量是否有变化
+
+    def __len__(self) -> int:
+        return len(self.event_index)
+
+    def fork(self) -> "MemoryShard":
+        """写时复制：复制列表与映射（记忆对象本身共享），向量矩阵共享底层数组"""
+        clone = MemoryShard(self.month)
+        clone.memories = {date: list(mem_list) for date, mem_list in self.memories.items()}
+        clone.date_event_ids = {date: list(eids) for date, eids in self.date_event_ids.items()}
+        clone.event_index = dict(self.event_index)
+        clone.embeddings = self.embeddings.fork()
+        clone.embedding_file = self.embedding_file
+        clone.dirty = self.dirty
+        return clone
+
+    def add(self, event_id: str, memory: Dict[str, str]) -> int:
+        """追加一条记忆，返回其在当日列表中的索引"""
+        date = memory["date"]
+        self.memories.setdefault(date, []).append(memory)
+        self.date_event_ids.setdefault(date, []).append(event_id)
+        idx = len(self.memories[date]) - 1
+        self.event_index[event_id] = (date, idx)
+        return idx
+
+    def get(self, event_id: str) -> Optional[Dict[str, str]]:
+        location = self.event_index.get(event_id)
+        if location is None:
+            return None
+        date, idx = location
+        return self.memories[date][idx]
+
+
+class MemoryView:
+    """
+    记忆库的不可变快照：所有读操作都在某个快照上进行，无需加锁
+
+    写入方基于当前快照分叉出受影响的分片，修改完成后一次性替换快照引用（单次属性赋值，原子），
+    读者要么看到写入前的快照，要么看到写入后的快照，不会被写入或持久化阻塞
+    """
+    __slots__ = ("shards", "date_index")
+
+    def __init__(self, shards: Dict[str, MemoryShard], date_index: DateIndex):
+        self.shards = shards  # {月份(XXXX-XX): 分片}
+        self.date_index = date_index  # 记忆日期的有序索引
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    def get(self, event_id: str) -> Optional[Dict[str, str]]:
+        for shard in self.shards.values():
+            memory = shard.get(event_id)
+            if memory is not None:
+                return memory
+        return None
+
+
+def _event_seq(event_id: str) -> int:
+    """事件ID中的自增序号（event_N -> N），即插入顺序"""
+    return int(event_id.rsplit("_", 1)[-1])
+
+
+def _pack_vector(vector: np.ndarray) -> str:
+    """向量编码为base64（小端float32），用于操作日志"""
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def _unpack_vectors(packed: List[str]) -> np.ndarray:
+    return np.stack([np.frombuffer(base64.b64decode(item), dtype="<f4") for item in packed])
+
+
+def _atomic_save_npy(file_path: str, array: np.ndarray) -> None:
+    """原子地写入.npy文件（临时文件 + rename）"""
+    directory = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(file_path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.save(file, array)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class PersonalMemoryManager:
+    """
+    个人记忆库
+
+    记忆按月分片（MemoryShard），检索时跨分片合并结果，按月删除时整片丢弃。
+    读操作在不可变快照（MemoryView）上进行，不加锁；写操作在写锁内分叉受影响的分片，完成后原子替换快照。
+
+    持久化采用 快照 + 操作日志（WAL）：
+    - 快照：memory_file（各分片的记忆与事件ID，JSON） + <base>.emb.<月份>.<代数>.npy（各分片向量矩阵，
+      按内存映射加载；向量没有变化的分片沿用上一次的文件）
+    - 日志：<base>.wal.jsonl，每次添加/删除（按月、按日）追加一行，恢复时重放快照之后的日志
+    日志累计条数达到快照规模时才重写快照，插入为均摊O(1)
+    """
+
     def __init__(self,
                  memory_file: str = os.path.join("memory_file", "personal_memories.json"),
-                 model_path: str = "event/local_models/all-MiniLM-L6-v2"):
+                 model_path: str = "event/local_models/all-MiniLM-L6-v2",
+                 snapshot_every: int = 1000,
+                 wal_fsync: bool = False):
         os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
         self.memory_file = memory_file
+        base = os.path.splitext(memory_file)[0]
+        self.wal_file = base + ".wal.jsonl"  # 操作日志（追加写）
+        self._embedding_prefix = base + ".emb."  # 向量快照：<base>.emb.<日志序号>.npy
+        self.snapshot_every = snapshot_every  # 两次快照之间至少累计的日志条数
+        self.wal_fsync = wal_fsync  # 每次写日志后是否fsync
+        self._wal = None  # 日志文件句柄（懒打开）
+        self._wal_seq = 0  # 最近一条日志的序号
+        self._pending_ops = 0  # 上次快照之后写入日志的操作条数
+        self._snapshot_gen = 0  # 快照代数，用于命名向量文件
         self.model_path = os.path.abspath(model_path)
-        self.memories = {}  # {日期(XX-XX-XX): [记忆对象列表]}
-        self.embeddings = {}  # {事件ID: 向量}
+        self._view = MemoryView({}, DateIndex())  # 当前发布给读者的快照
         self.event_id_counter = 0
-        self.event_id_map = {}  # {事件ID: (日期(XX-XX-XX), 记忆索引)}
-        self._lock = threading.RLock()  # 使用可重入锁，避免递归锁请求导致的死锁
+        self._lock = threading.RLock()  # 写锁（读操作不加锁），使用可重入锁避免递归锁请求导致的死锁
 
         self._ensure_directory_exists()
         self.embedding_model = self._load_local_model()
         self._load_or_init_memory_file()
 
-    def _load_local_model(self) -> SentenceTransformer:
+    @property
+    def shards(self) -> Dict[str, MemoryShard]:
+        """当前快照的分片（只读）"""
+        return self._view.shards
+
+    @property
+    def date_index(self) -> DateIndex:
+        return self._view.date_index
+
+    @property
+    def memories(self) -> Dict[str, List[Dict[str, str]]]:
+        """按日期汇总的全部记忆（由各月分片合并而来）"""
+        merged = {}
+        for shard in self._view.shards.values():
+            merged.update(shard.memories)
+        return merged
+
+    @property
+    def event_id_map(self) -> Dict[str, tuple]:
+        """{事件ID: (日期, 记忆索引)}（由各月分片合并而来）"""
+        merged = {}
+        for shard in self._view.shards.values():
+            merged.update(shard.event_index)
+        return merged
+
+    def _load_local_model(self):
+        """校验本地模型目录，返回进程内共享的编码器（首次编码时才真正加载模型，按配置带持久化缓存）"""
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(
                 f"本地模型目录不存在: {self.model_path}\n"
@@ -79,10 +452,7 @@ class PersonalMemoryManager:
         if missing_files:
             raise FileNotFoundError(f"模型缺少关键文件: {', '.join(missing_files)}")
 
-        try:
-            return SentenceTransformer(self.model_path)
-        except Exception as e:
-            raise RuntimeError(f"模型加载失败: {str(e)}")
+        return get_sentence_encoder(self.model_path)
 
     def _ensure_directory_exists(self) -> None:
         memory_dir = os.path.dirname(self.memory_file)
@@ -106,6 +476,14 @@ class PersonalMemoryManager:
     # 通用日期工具：提取秒级时间中的纯日期（XX-XX-XX）
     # ------------------------------
     def _extract_date(self, time_str: str) -> str:
+        # 快速路径：标准的零填充格式直接截取日期部分（fromisoformat同时校验日期合法性）
+        match = _DATE_PATTERN.match(time_str)
+        if match:
+            try:
+                Date.fromisoformat(match.group(1))
+                return match.group(1)
+            except ValueError:
+                pass
         supported_formats = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d"]
         for fmt in supported_formats:
             try:
@@ -121,78 +499,143 @@ class PersonalMemoryManager:
     # 1. 添加记忆（支持秒级时间输入）
     # ------------------------------
     def add_memory(self, memory: Dict[str, str]) -> str:
-        required_fields = ["date", "topic", "events", "thought"]
-        for field in required_fields:
-            if field not in memory or not memory[field].strip():
-                raise ValueError(f"记忆缺少必填字段或字段为空: {field}")
-
-        raw_time = memory["date"]
-        date = self._extract_date(raw_time)
-        memory["date"] = date  # 覆盖为纯日期存储
-
-        with self._lock:  # 线程安全保护
-            self.event_id_counter += 1
-            event_id = f"event_{self.event_id_counter}"
-
-            if date not in self.memories:
-                self.memories[date] = []
-            memory_index = len(self.memories[date])
-            self.memories[date].append(memory)
+        return self.add_memories([memory])[0]
 
-            self.event_id_map[event_id] = (date, memory_index)
-            self._generate_topic_embedding(event_id, memory["topic"])
+    def add_memories(self, memories: List[Dict[str, str]], batch_size: int = 64) -> List[str]:
+        """
+        批量添加记忆：先校验全部记录，再一次批量编码所有topic、分配ID，最后只持久化一次
 
-            self.save_to_file()
-        return event_id
+        参数:
+            memories: 记忆列表，每条包含date、topic、events、thought
+            batch_size: 编码批大小
 
-    def _generate_topic_embedding(self, event_id: str, topic: str) -> None:
-        self.embeddings[event_id] = self.embedding_model.encode(topic.strip())
+        返回:
+            List[str]: 与输入顺序一致的事件ID列表
+        """
+        required_fields = ["date", "topic", "events", "thought"]
+        dates = []
+        for memory in memories:
+            for field in required_fields:
+                if field not in memory or not memory[field].strip():
+                    raise ValueError(f"记忆缺少必填字段或字段为空: {field}")
+            dates.append(self._extract_date(memory["date"]))
+        if not memories:
+            return []
+
+        # 模型推理放在锁外，批量编码代替逐条encode
+        vectors = np.asarray(self.embedding_model.encode(
+            [memory["topic"].strip() for memory in memories], batch_size=batch_size), dtype=np.float32)
+
+        event_ids = []
+        with self._lock:  # 线程安全保护
+            for memory, date in zip(memories, dates):
+                memory["date"] = date  # 覆盖为纯日期存储
+                self.event_id_counter += 1
+                event_ids.append(f"event_{self.event_id_counter}")
+
+            # 先写日志再修改内存状态
+            self._append_wal({
+                "op": "add",
+                "event_id_counter": self.event_id_counter,
+                "items": [{"event_id": eid, "memory": memory, "embedding": _pack_vector(vector)}
+                          for eid, memory, vector in zip(event_ids, memories, vectors)]
+            })
+            self._apply_add(event_ids, memories, vectors)
+            self._maybe_snapshot(len(event_ids))
+        return event_ids
+
+    def _apply_add(self, event_ids: List[str], memories: List[Dict[str, str]], vectors: np.ndarray) -> None:
+        """在写锁内执行：分叉受影响的分片并写入，最后发布新快照"""
+        view = self._view
+        shards = dict(view.shards)
+        date_index = view.date_index
+        forked: Dict[str, MemoryShard] = {}
+        rows_by_month = defaultdict(list)
+        for row, (event_id, memory) in enumerate(zip(event_ids, memories)):
+            date = memory["date"]
+            month = date[:7]
+            shard = forked.get(month)
+            if shard is None:
+                base = shards.get(month)
+                shard = forked[month] = shards[month] = base.fork() if base is not None else MemoryShard(month)
+            if date not in shard.memories:
+                if date_index is view.date_index:
+                    date_index = date_index.copy()
+                date_index.add(date)
+            shard.add(event_id, memory)
+            rows_by_month[month].append(row)
+
+        for month, rows in rows_by_month.items():
+            forked[month].embeddings.add_batch([event_ids[row] for row in rows], vectors[rows])
+            forked[month].dirty = True
+        self._view = MemoryView(shards, date_index)
 
     # ------------------------------
     # 2. 基础检索：日期检索（支持秒级时间输入）
     # ------------------------------
-    def search_by_date(self, start_time: str, end_time: Optional[str] = None) -> List[Dict[str, str]]:
+    def _dates_in_range(self, view: MemoryView, start_time: str, end_time: Optional[str] = None) -> List[str]:
+        """返回快照中有记忆的、位于[start_time, end_time]内的日期（按时间升序）"""
         # 提取纯日期
         start_date = self._extract_date(start_time)
         end_date = self._extract_date(end_time) if end_time else start_date
 
         # 验证日期逻辑
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-        except ValueError as e:
-            raise ValueError(f"日期解析失败：{str(e)}")
-
-        if start_dt > end_dt:
+        start_ordinal = DateIndex.ordinal(start_date)
+        end_ordinal = DateIndex.ordinal(end_date)
+        if start_ordinal > end_ordinal:
             raise ValueError(f"开始日期 {start_date} 不能晚于结束日期 {end_date}")
 
-        # 筛选记忆
+        # 通过有序日期索引定位区间内的日期
+        return view.date_index.range(start_ordinal, end_ordinal)
+
+    def search_by_date(self, start_time: str, end_time: Optional[str] = None) -> List[Dict[str, str]]:
+        view = self._view  # 读取当前快照，之后的写入不影响本次检索
         memory_array = []
-        for date_str in self.memories:
-            date_dt = datetime.strptime(date_str, "%Y-%m-%d")
-            if start_dt <= date_dt <= end_dt:
-                memory_array.extend(self.memories[date_str])
+        for date_str in self._dates_in_range(view, start_time, end_time):
+            memory_array.extend(view.shards[date_str[:7]].memories[date_str])
         return memory_array
 
+    @staticmethod
+    def _top_k_across_shards(view: MemoryView, query_emb: np.ndarray, top_n: int,
+                             candidates: Dict[str, Optional[List[str]]]) -> List[tuple]:
+        """
+        在快照的多个分片上做top-k检索并合并
+
+        参数:
+            view: 记忆库快照
+            query_emb: 查询向量
+            top_n: 返回数量
+            candidates: {月份: 候选事件ID列表}，None表示该分片全部记忆
+
+        返回:
+            List[tuple]: [(事件ID, 相似度)]，按相似度降序
+        """
+        merged = []
+        for month, event_ids in candidates.items():
+            shard = view.shards.get(month)
+            if shard is None:
+                continue
+            rows = None if event_ids is None else shard.embeddings.rows_for(event_ids)
+            merged.extend(shard.embeddings.top_k(query_emb, top_n, rows))
+        # 分片内的并列项已按插入顺序排列，跨分片按相似度降序、插入顺序升序合并，与单矩阵检索结果一致
+        merged.sort(key=lambda item: (-item[1], _event_seq(item[0])))
+        return merged[:top_n]
+
     # ------------------------------
     # 3. 基础检索：Topic嵌入检索（无日期输入，无需适配）
     # ------------------------------
     def search_by_topic_embedding(self, query_topic: str, top_n: int = 10) -> List[Dict[str, str]]:
         query_emb = self.embedding_model.encode(query_topic.strip())
-        similarity_list = [
-            (eid, np.dot(query_emb, emb) / (np.linalg.norm(query_emb) * np.linalg.norm(emb) + 1e-8))
-            for eid, emb in self.embeddings.items()
-        ]
-        # 按相似度降序排序
-        similarity_list.sort(key=lambda x: x[1], reverse=True)
+        view = self._view
+        # 每个分片一次矩阵-向量乘法 + argpartition取top-k（向量已预先归一化），再跨分片合并
+        similarity_list = self._top_k_across_shards(view, query_emb, top_n, dict.fromkeys(view.shards))
 
         # 提取纯记忆数组
         memory_array = []
-        for eid, _ in similarity_list[:top_n]:
-            if eid not in self.event_id_map:
-                continue
-            date, idx = self.event_id_map[eid]
-            memory_array.append(self.memories[date][idx])
+        for eid, _ in similarity_list:
+            memory = view.get(eid)
+            if memory is not None:
+                memory_array.append(memory)
         return memory_array
 
     # ------------------------------
@@ -215,33 +658,52 @@ class PersonalMemoryManager:
         返回:
             List[Dict[str, str]]: 符合条件的纯记忆单元数组（按相似度降序）
         """
-        # 第一步：筛选指定日期范围内的记忆
-        date_filtered_memories = self.search_by_date(start_time, end_time)
-        if not date_filtered_memories:
+        # 第一步：通过日期索引筛选指定日期范围内的记忆ID（按月份分组）
+        view = self._view
+        candidates = defaultdict(list)
+        for date_str in self._dates_in_range(view, start_time, end_time):
+            candidates[date_str[:7]].extend(view.shards[date_str[:7]].date_event_ids.get(date_str, []))
+        if not candidates:
             return []  # 无符合日期条件的记忆，直接返回空
 
-        # 第二步：为日期筛选后的记忆计算Topic相似度
+        # 第二步：只编码查询本身，候选记忆直接使用add_memory时已存储的向量
         query_emb = self.embedding_model.encode(query_topic.strip())
-        memory_similarity = []
-        for mem in date_filtered_memories:
-            # 用记忆的Topic生成嵌入向量
-            mem_topic_emb = self.embedding_model.encode(mem["topic"].strip())
-            # 计算相似度
-            sim = np.dot(query_emb, mem_topic_emb) / (np.linalg.norm(query_emb) * np.linalg.norm(mem_topic_emb) + 1e-8)
-            memory_similarity.append((mem, float(sim)))
-
-        # 第三步：按相似度降序排序，取前top_n
-        memory_similarity.sort(key=lambda x: x[1], reverse=True)
-        return [mem for mem, _ in memory_similarity[:top_n]]
+
+        # 兼容缺少向量的旧数据：所有分片缺少的向量合并为一次批量补算
+        missing = [(month, eid) for month, eids in candidates.items()
+                   for eid in eids if eid not in view.shards[month].embeddings]
+        if missing:
+            view = self._backfill_embeddings(view, missing)
+
+        # 第三步：在各分片向量矩阵上按候选行做masked top-k，再合并
+        ranked = self._top_k_across_shards(view, query_emb, top_n, candidates)
+        return [memory for memory in (view.get(eid) for eid, _ in ranked) if memory is not None]
+
+    def _backfill_embeddings(self, view: MemoryView, missing: List[tuple]) -> MemoryView:
+        """为缺少向量的记忆补算向量并发布新快照，返回补算后的快照"""
+        topics = [view.shards[month].get(eid)["topic"].strip() for month, eid in missing]
+        vectors = np.asarray(self.embedding_model.encode(topics), dtype=np.float32)
+        with self._lock:
+            current = self._view
+            shards = dict(current.shards)
+            forked: Dict[str, MemoryShard] = {}
+            for row, (month, eid) in enumerate(missing):
+                base = shards.get(month)
+                if base is None or eid not in base.event_index:
+                    continue  # 补算期间已被删除
+                shard = forked.get(month)
+                if shard is None:
+                    shard = forked[month] = shards[month] = base.fork()
+                shard.embeddings.add(eid, vectors[row])
+                shard.dirty = True
+            self._view = MemoryView(shards, current.date_index)
+            return self._view
 
     # ------------------------------
     # 5. 单条检索：ID检索（无日期输入，无需适配）
     # ------------------------------
     def get_memory_by_id(self, event_id: str) -> Optional[Dict[str, str]]:
-        if event_id not in self.event_id_map:
-            return None
-        date, idx = self.event_id_map[event_id]
-        return self.memories[date][idx]
+        return self._view.get(event_id)
 
     # ------------------------------
     # 6. 删除功能：删除i月之前记忆（无时间输入，无需适配）
@@ -253,63 +715,252 @@ class PersonalMemoryManager:
             raise ValueError(f"月份必须1-12，当前输入：{target_month}")
 
         with self._lock:  # 线程安全保护
-            delete_threshold = datetime(target_year, target_month, 1)
-            retained_memories = {}
-            deleted_count = 0
-
-            for date_str, mem_list in self.memories.items():
-                date_dt = datetime.strptime(date_str, "%Y-%m-%d")
-                if date_dt < delete_threshold:
-                    deleted_count += len(mem_list)
-                else:
-                    retained_memories[date_str] = mem_list
-
-            # 同步更新关联数据
-            self.memories = retained_memories
-            retained_eids = set()
-            for date_str, mem_list in self.memories.items():
-                for idx in range(len(mem_list)):
-                    for eid, (d, i) in self.event_id_map.items():
-                        if d == date_str and i == idx:
-                            retained_eids.add(eid)
-                            break
-
-            # 删除无效ID和嵌入向量
-            for eid in list(self.event_id_map.keys()):
-                if eid not in retained_eids:
-                    del self.event_id_map[eid]
-                    if eid in self.embeddings:
-                        del self.embeddings[eid]
+            self._append_wal({"op": "delete_before", "year": target_year, "month": target_month})
+            result = self._apply_delete_before(target_year, target_month)
+            self._maybe_snapshot(1)
+            return result
+
+    def _apply_delete_before(self, target_year: int, target_month: int) -> Dict[str, int]:
+        with self._lock:
+            threshold_month = f"{target_year:04d}-{target_month:02d}"
+            view = self._view
+
+            # 整片丢弃早于目标月份的分片，被删除记忆的ID映射随分片一起丢弃
+            expired = [shard for month, shard in view.shards.items() if month < threshold_month]
+            deleted_count = sum(len(shard) for shard in expired)
+            deleted_date_count = sum(len(shard.memories) for shard in expired)
+            if expired:
+                shards = {month: shard for month, shard in view.shards.items() if month >= threshold_month}
+                date_index = view.date_index.copy()
+                date_index.discard_before(Date(target_year, target_month, 1).toordinal())
+                self._view = MemoryView(shards, date_index)
 
-            self.save_to_file()
             return {
                 "deleted_memory_count": deleted_count,
-                "deleted_date_count": len(self.memories) - len(retained_memories)
+                "deleted_date_count": deleted_date_count
             }
 
     # ------------------------------
-    # 数据持久化
+    # 7. 删除功能：删除某一天的全部记忆（重新生成该日前清理，保证重试不产生重复记忆）
+    # ------------------------------
+    def delete_memories_on_date(self, time_str: str) -> int:
+        date = self._extract_date(time_str)
+        with self._lock:  # 线程安全保护
+            shard = self._view.shards.get(date[:7])
+            if shard is None or date not in shard.memories:
+                return 0
+            self._append_wal({"op": "delete_date", "date": date})
+            deleted_count = self._apply_delete_date(date)
+            self._maybe_snapshot(1)
+            return deleted_count
+
+    def _apply_delete_date(self, date: str) -> int:
+        with self._lock:
+            view = self._view
+            month = date[:7]
+            base = view.shards.get(month)
+            if base is None or date not in base.memories:
+                return 0
+
+            shard = base.fork()
+            event_ids = shard.date_event_ids.pop(date, [])
+            del shard.memories[date]
+            for event_id in event_ids:
+                shard.event_index.pop(event_id, None)
+            shard.embeddings.remove(event_ids)
+            shard.dirty = True
+
+            shards = dict(view.shards)
+            if shard.memories:
+                shards[month] = shard
+            else:
+                del shards[month]
+            date_index = view.date_index.copy()
+            date_index.discard(date)
+            self._view = MemoryView(shards, date_index)
+            return len(event_ids)
+
+    # ------------------------------
+    # 数据持久化：快照 + 操作日志
     # ------------------------------
+    def _append_wal(self, record: Dict[str, Any]) -> None:
+        """追加一条操作日志（调用方持有锁）"""
+        self._wal_seq += 1
+        record["seq"] = self._wal_seq
+        if self._wal is None:
+            self._wal = open(self.wal_file, "ab")
+        self._wal.write(dumps_json(record, compact=True) + b"\n")
+        self._wal.flush()
+        if self.wal_fsync:
+            os.fsync(self._wal.fileno())
+
+    def _maybe_snapshot(self, op_count: int) -> None:
+        self._pending_ops += op_count
+        # 日志量达到快照规模时才重写快照：O(N)的快照代价由至少N次操作分摊
+        if self._pending_ops >= max(self.snapshot_every, len(self._view)):
+            self.save_to_file()
+
+    def _apply_record(self, record: Dict[str, Any]) -> None:
+        if record["op"] == "add":
+            items = record["items"]
+            self._apply_add([item["event_id"] for item in items],
+                            [item["memory"] for item in items],
+                            _unpack_vectors([item["embedding"] for item in items]))
+            self.event_id_counter = max(self.event_id_counter, record["event_id_counter"])
+            self._pending_ops += len(items)
+        elif record["op"] == "delete_before":
+            self._apply_delete_before(record["year"], record["month"])
+            self._pending_ops += 1
+        elif record["op"] == "delete_date":
+            self._apply_delete_date(record["date"])
+            self._pending_ops += 1
+
+    def _replay_wal(self) -> bool:
+        """
+        重放快照之后的操作日志
+
+        返回:
+            bool: 日志末尾是否存在写了一半的记录（崩溃导致）
+        """
+        if not os.path.exists(self.wal_file):
+            return False
+        with open(self.wal_file, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    return True
+                try:
+                    record = loads_json(line)
+                except ValueError:
+                    return True
+                # 快照写入后、日志截断前崩溃时，日志中会残留已包含在快照里的记录
+                if record["seq"] <= self._wal_seq:
+                    continue
+                self._apply_record(record)
+                self._wal_seq = record["seq"]
+        return False
+
+    def _remove_stale_embedding_files(self, keep) -> None:
+        directory = os.path.dirname(self._embedding_prefix) or "."
+        prefix = os.path.basename(self._embedding_prefix)
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".npy") and name not in keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
     def save_to_file(self) -> None:
+        """写入完整快照并截断操作日志（只重写向量有变化的分片的.npy文件）"""
         with self._lock:  # 线程安全保护
-            serializable_embeddings = {k: v.tolist() for k, v in self.embeddings.items()}
+            self._snapshot_gen += 1
+            directory = os.path.dirname(self.memory_file)
+            shards = {}
+            for month, shard in self._view.shards.items():
+                event_ids, matrix = shard.embeddings.export()
+                if shard.dirty or shard.embedding_file is None:
+                    shard.embedding_file = f"{os.path.basename(self._embedding_prefix)}{month}.{self._snapshot_gen}.npy"
+                    _atomic_save_npy(os.path.join(directory, shard.embedding_file), matrix)
+                    shard.dirty = False
+                shards[month] = {
+                    "memories": shard.memories,
+                    "event_ids": shard.date_event_ids,
+                    "embedding_ids": event_ids,
+                    "embedding_file": shard.embedding_file
+                }
             data = {
-                "memories": self.memories,
-                "embeddings": serializable_embeddings,
+                "shards": shards,
                 "event_id_counter": self.event_id_counter,
-                "event_id_map": self.event_id_map
+                "wal_seq": self._wal_seq,
+                "snapshot_gen": self._snapshot_gen
             }
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 快照文件原子替换后，旧向量文件和日志才可以丢弃
+            atomic_write_json(self.memory_file, data, compact=True)
+            self._remove_stale_embedding_files(keep={shard["embedding_file"] for shard in shards.values()})
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+            open(self.wal_file, "wb").close()
+            self._pending_ops = 0
+
+    def _load_legacy(self, data: Dict[str, Any]) -> Dict[str, MemoryShard]:
+        """兼容未分片的旧格式：全部记忆在一个字典中，向量为JSON列表或单个.npy文件"""
+        ids_by_date = defaultdict(dict)
+        for eid, (date_str, idx) in data.get("event_id_map", {}).items():
+            ids_by_date[date_str][idx] = eid
+
+        shards: Dict[str, MemoryShard] = {}
+        for date_str, mem_list in data.get("memories", {}).items():
+            shard = shards.get(date_str[:7])
+            if shard is None:
+                shard = shards[date_str[:7]] = MemoryShard(date_str[:7])
+            for idx, memory in enumerate(mem_list):
+                eid = ids_by_date[date_str].get(idx)
+                if eid is None:
+                    self.event_id_counter += 1
+                    eid = f"event_{self.event_id_counter}"
+                shard.add(eid, memory)
+
+        if "embeddings" in data:
+            stored = data["embeddings"]
+            event_ids = list(stored.keys())
+            matrix = np.array(list(stored.values()), dtype=np.float32)
+        elif data.get("embedding_ids"):
+            event_ids = data["embedding_ids"]
+            matrix = np.load(os.path.join(os.path.dirname(self.memory_file), data["embedding_file"]), mmap_mode="r")
+        else:
+            return shards
+        month_of = {eid: month for month, shard in shards.items() for eid in shard.event_index}
+        rows_by_month = defaultdict(list)
+        for row, eid in enumerate(event_ids):
+            if eid in month_of:
+                rows_by_month[month_of[eid]].append(row)
+        for month, rows in rows_by_month.items():
+            shards[month].embeddings.add_batch([event_ids[row] for row in rows], matrix[rows])
+        return shards
 
     def load_from_file(self) -> None:
+        """加载快照并重放之后的操作日志"""
         with self._lock:  # 线程安全保护
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            self.memories = data.get("memories", {})
-            self.embeddings = {k: np.array(v) for k, v in data.get("embeddings", {}).items()}
+            data = load_json(self.memory_file)
             self.event_id_counter = data.get("event_id_counter", 0)
-            self.event_id_map = data.get("event_id_map", {})
+            self._wal_seq = data.get("wal_seq", 0)
+            self._snapshot_gen = data.get("snapshot_gen", 0)
+            self._pending_ops = 0
+
+            legacy = "shards" not in data
+            if legacy:
+                shards = self._load_legacy(data)
+            else:
+                directory = os.path.dirname(self.memory_file)
+                shards = {}
+                for month, stored in data["shards"].items():
+                    shard = shards[month] = MemoryShard(month)
+                    shard.memories = stored["memories"]
+                    shard.date_event_ids = stored["event_ids"]
+                    for date_str, eids in shard.date_event_ids.items():
+                        for idx, eid in enumerate(eids):
+                            shard.event_index[eid] = (date_str, idx)
+                    if stored["embedding_ids"]:
+                        # 快照中的向量已归一化，直接采用内存映射，检索时按需分页读入
+                        matrix = np.load(os.path.join(directory, stored["embedding_file"]), mmap_mode="r")
+                        shard.embeddings = EmbeddingMatrix.from_snapshot(stored["embedding_ids"], matrix)
+                    shard.embedding_file = stored["embedding_file"]
+                    shard.dirty = False
+            self._view = MemoryView(shards, DateIndex(date_str for shard in shards.values() for date_str in shard.memories))
+
+            torn = self._replay_wal()
+            if legacy or torn:
+                # 旧格式转存为分片格式；或截断残缺的日志尾部，避免后续追加的记录与之粘连
+                self.save_to_file()
+
+    def close(self) -> None:
+        """写入快照（如有未快照的操作）并关闭操作日志"""
+        with self._lock:
+            if self._pending_ops:
+                self.save_to_file()
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
 
 
 # ------------------------------
@@ -325,8 +976,7 @@ if __name__ == "__main__":
         {"date": "2025-11-02 14:30:00", "topic": "工作会议", "events": "项目复盘", "thought": "提前准备议题"},
         {"date": "2025-11-03", "topic": "晚餐", "events": "在家做饭", "thought": "减少外卖"}  # 纯日期输入
     ]
-    for mem in test_memories:
-        memory_manager.add_memory(mem)
+    memory_manager.add_memories(test_memories)
     print("=== 初始化完成：已添加4条记忆 ===")
 
     # 2. 测试「日期检索」（输入秒级时间）
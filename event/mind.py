@@ -5,18 +5,23 @@ import re
 import holidays
 import threading
 import copy
+import hashlib
 import os
 from pyarrow import string
 from utils.IO import *
 from datetime import datetime, timedelta
 from utils.llm_call import *
+from utils.prompt_assembly import assemble_prompt
+from utils.llm_cache import llm_cache_disabled
 from utils.maptool import *
 from event.templates import *
 from event.memory import *
-from event.fuzzy_memory_builder import FuzzyMemoryBuilder
+from event.fuzzy_memory_builder import FuzzyMemoryBuilder, DailySummaryCache
+from event.timeline_index import DailyRecordIndex, TimelineIndex, extract_bottom_level_events
+from event.checkpoint import DayCheckpoint
 from typing import List, Dict, Optional
 class Mind:
-    def __init__(self,file_path, instance_id=0, persona=None, event=None, daily_state=None, persona_address_data=None, daily_draft=None):
+    def __init__(self,file_path, instance_id=0, persona=None, event=None, daily_state=None, persona_address_data=None, daily_draft=None, bootstrap=None):
         self.calendar = {}  # 存储日程数据，格式如{"2025-01-01":["event1","event2"],...}
         self.events = event if event is not None else []
         self.persona = persona if persona is not None else ""
@@ -33,24 +38,30 @@ class Mind:
         self.reflection = ""  # 主要存储对现在和未来的思考
         self.thought = ""  # 记录个人的感受、想法，包括情绪、想法、需求及思考过程中的打算
         self.bottom_events : Optional[List[Dict]] = None
-        # 读取配置文件
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        # 获取地图工具配置
-        map_config = config.get('map_tool', {})
-        map_api_key = map_config.get('api_key', 'f6fa3480d4a0e08cd1243f311fa03582')
-        self.maptools = MapMaintenanceTool(map_api_key, persona_address_data=persona_address_data)
+        self.timeline: Optional[TimelineIndex] = None  # 最底层事件的时间轴索引
+        self.top_timeline: Optional[TimelineIndex] = None  # 最上层事件的时间轴索引
+        # 人物级初始化产物（由MindController创建并在所有区间实例间共享），地图工具也随之共享
+        self.bootstrap = bootstrap
+        if bootstrap is not None:
+            self.maptools = bootstrap.maptools
+        else:
+            self.maptools = PersonaBootstrap.create_map_tool(persona_address_data)
         self.env = ""
         self.file_path = file_path
         self.instance_id = instance_id
         # 存储每日处理的中间输出，用于后续统一提取事件
         self.daily_intermediate_outputs = {}
+        # 本区间的逐日日志（JSONL，首次追加时确定路径）
+        self.journal_file = None
         # Fuzzy memory builder reference
         self.fuzzy_memory_builder = None
         # 新增daily_state属性
         self.daily_state = daily_state if daily_state is not None else []
         # 新增daily_draft属性
         self.daily_draft = daily_draft if daily_draft is not None else []
+        # daily_state/daily_draft的日期索引（首次查询时建立）
+        self.daily_state_index: Optional[DailyRecordIndex] = None
+        self.daily_draft_index: Optional[DailyRecordIndex] = None
         self.persona_address_data = persona_address_data if persona_address_data is not None else []
         
     def save_to_json(self):
@@ -78,9 +89,8 @@ class Mind:
         filename = f"record_thread_{thread_id}.json"
         file_path = os.path.join(record_folder, filename)
         
-        # 保存到同一个文件
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 保存到同一个文件（中间产物，紧凑格式原子写入）
+        atomic_write_json(file_path, data, compact=True)
         print(f"\n=== 数据已保存到 {file_path} ===")
 
     def _get_bottom_level_events(self) -> List[Dict]:
@@ -94,17 +104,7 @@ class Mind:
             #print("已计算过，直接返回缓存")
             return self.bottom_events  # 已计算过，直接返回缓存
 
-        def recursive_extract(events: List[Dict]) -> List[Dict]:
-            result = []
-            for event in events:
-                subevents = event.get("subevent", [])
-                if not subevents:
-                    result.append(event)
-                else:
-                    result.extend(recursive_extract(subevents))
-            return result
-
-        self.bottom_events = recursive_extract(self.events)
+        self.bottom_events = self.extract_bottom_level_events(self.events)
         return self.bottom_events
 
     def update_bottom_level_events(self):
@@ -114,60 +114,38 @@ class Mind:
         返回:
             List[Dict]: 最底层事件列表
         """
-        def recursive_extract(events: List[Dict]) -> List[Dict]:
-            result = []
-            for event in events:
-                subevents = event.get("subevent", [])
-                if not subevents:
-                    result.append(event)
-                else:
-                    result.extend(recursive_extract(subevents))
-            return result
-
-        self.bottom_events = recursive_extract(self.events)
+        self.bottom_events = self.extract_bottom_level_events(self.events)
         return self.bottom_events
+
     @staticmethod
-    def is_date_match(target_date_str: str, event_date_str: str) -> bool:
+    def extract_bottom_level_events(events: List[Dict]) -> List[Dict]:
         """
-        判断事件日期是否包含目标日期（支持单个日期/日期范围）
+        递归提取最底层事件（subevent为空），见event.timeline_index.extract_bottom_level_events
         
         参数:
-            target_date_str: 目标日期（格式：YYYY-MM-DD）
-            event_date_str: 事件日期（格式：YYYY-MM-DD 或 YYYY-MM-DD至YYYY-MM-DD）
+            events: 事件树
         
         返回:
-            bool: 匹配结果（True/False）
+            List[Dict]: 最底层事件列表
         """
-        # 验证目标日期格式，如果包含"至"，则截取至之前的部分
-        if "至" in target_date_str:
-            target_date_str = target_date_str.split("至")[0].strip()
-        
-        try:
-            target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
-        except ValueError:
-            raise ValueError(f"目标日期格式错误：{target_date_str}，需符合YYYY-MM-DD")
+        return extract_bottom_level_events(events)
 
-        # 处理日期范围
-        if "至" in event_date_str:
-            try:
-                start_str, end_str = event_date_str.split("至")
-                start_date = datetime.strptime(start_str.strip(), "%Y-%m-%d").date()
-                end_date = datetime.strptime(end_str.strip(), "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError(f"事件日期格式错误：{event_date_str}，范围需符合YYYY-MM-DD至YYYY-MM-DD")
-            return start_date <= target_date <= end_date
-        # 处理单个日期
-        else:
-            try:
-                event_date = datetime.strptime(event_date_str.strip(), "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError(f"事件日期格式错误：{event_date_str}，单个日期需符合YYYY-MM-DD")
-            return event_date == target_date
+    def _get_timeline(self) -> TimelineIndex:
+        """
+        获取最底层事件的时间轴索引（底层事件重新抽取后自动重建）
+        
+        返回:
+            TimelineIndex: 时间轴索引，无法解析的日期按"2026-01-01"处理
+        """
+        bottom_events = self._get_bottom_level_events()
+        if self.timeline is None or self.timeline.events is not bottom_events:
+            self.timeline = TimelineIndex(bottom_events, default_date="2026-01-01")
+        return self.timeline
 
     def filter_by_date(self, target_date: str) -> List[Dict]:
 
         """
-        筛选指定日期的最底层事件
+        筛选指定日期的最底层事件（事件任一时间项的起始日期为目标日期）
         
         参数:
             target_date: 目标日期（格式：YYYY-MM-DD）
@@ -175,97 +153,7 @@ class Mind:
         返回:
             List[Dict]: 匹配的事件列表
         """
-        # 步骤1：获取所有底层事件（自动缓存）
-        bottom_events = self._get_bottom_level_events()
-
-        def extract_start_date(date_str: str) -> str:
-            """
-            从时间字符串中提取起始日期，兼容多种格式：
-            1. 时间区间（如"2025-01-01 07:30:00至2025-01-01 08:45:00"）
-            2. 单个时间（如"2025-01-01 07:30:00"或"2025-01-01"）
-            3. 带中文时段的时间（如"2025-01-01 上午"或"2025-01-01 下午"）
-            4. 短年份格式（如"5-03-23" → "2025-03-23"）
-
-            参数:
-                date_str: 输入的时间字符串（支持含"至"的区间和不含"至"的单个时间）
-
-            返回:
-                str: 提取的起始日期，格式固定为"YYYY-MM-DD"；提取失败时返回默认日期"2026-01-01"
-            """
-            import re
-            #print("date_str:", date_str)
-            # 步骤1：分割字符串，提取起始时间部分（含"至"则取左边，不含则取全部）
-            if "至" in date_str:
-                # 分割"至"，取左侧的起始时间（如"2025-01-01 07:30:00"）
-                start_time_part = date_str.split("至")[0].strip()
-            else:
-                # 无"至"，整个字符串即为起始时间（如"2025-01-01 07:30:00"或"2025-01-01"）
-                start_time_part = date_str.strip()
-
-            # 增强鲁棒性：去除所有中文和无关字符
-            # 只保留数字、字母、空格和日期分隔符（- : .）
-            start_time_part = re.sub(r'[^0-9a-zA-Z\s\-:\.]', '', start_time_part)
-            # 去除多余空格
-            start_time_part = ' '.join(start_time_part.split())
-            
-            # 特殊处理：检查是否为短年份格式（如"5-03-23" → "2025-03-23"）
-            date_part = start_time_part.split()[0] if ' ' in start_time_part else start_time_part
-            if '-' in date_part:
-                parts = date_part.split('-')
-                if len(parts) == 3:
-                    # 检查是否为短年份格式（如"5-03-23"）
-                    if len(parts[0]) <= 2 and len(parts[1]) <= 2 and len(parts[2]) <= 2:
-                        # 假设格式为 YYYY-MM-DD 但年份只有1-2位
-                        # 补全年份为4位（20xx）
-                        year = parts[0].zfill(2)
-                        if len(year) == 2:
-                            year = "20" + year
-                        month = parts[1].zfill(2)
-                        day = parts[2].zfill(2)
-                        
-                        # 重新组合日期部分
-                        new_date_part = f"{year}-{month}-{day}"
-                        
-                        # 替换原始日期部分
-                        if ' ' in start_time_part:
-                            start_time_part = new_date_part + start_time_part[len(date_part):]
-                        else:
-                            start_time_part = new_date_part
-
-            # 步骤2：解析起始时间部分，提取纯日期（支持多种子格式）
-            supported_formats = [
-                "%Y-%m-%d %H:%M:%S",  # 带秒级时间的格式（如"2025-01-01 07:30:00"）
-                "%Y-%m-%d",  # 纯日期格式（如"2025-01-01"）
-                "%Y-%m-%d %H:%M",     # 带分钟级时间的格式（如"2025-01-01 07:30"）
-                "%Y-%m-%d %H"         # 带小时级时间的格式（如"2025-01-01 07"）
-            ]
-
-            for fmt in supported_formats:
-                try:
-                    # 解析时间后，按"YYYY-MM-DD"格式返回起始日期
-                    start_datetime = datetime.strptime(start_time_part, fmt)
-                    return start_datetime.strftime("%Y-%m-%d")
-                except ValueError:
-                    # 一种格式解析失败，尝试下一种
-                    continue
-
-            # 所有格式都解析失败时，返回默认日期"2026-01-01"
-            return "2026-01-01"
-        # 步骤2：筛选匹配日期的事件
-        matched = []
-        for event in bottom_events:
-            # 统一处理date为数组或单个字符串的情况，转为可迭代对象
-            date_values = event.get("date", [])
-            if not isinstance(date_values, list):
-                date_values = [date_values]  # 若为单个字符串，转为单元素列表
-
-            for date_str in date_values:
-                date_str = extract_start_date(date_str)
-                if self.is_date_match(target_date, date_str):
-                    matched.append(event)
-                    break # 避免同一事件因多个日期重复加入
-
-        return matched
+        return self._get_timeline().starting_on(target_date)
     def initialize(self, event, persona, date, daily_state=None, daily_draft=None):
         """
         初始化Mind对象
@@ -288,55 +176,25 @@ class Mind:
         self.daily_draft = daily_draft if daily_draft is not None else []
         if daily_draft is None:
             print("未提供daily_draft，将使用默认值。")
-        # 初始化FuzzyMemoryBuilder
-        self.fuzzy_memory_builder = FuzzyMemoryBuilder.get_instance(event, persona, self.file_path)
-        
-        # 检查fuzzymemory文件是否存在，如果不存在则生成
-        year = int(date[:4])
-        monthly_file = os.path.join(self.file_path, "monthly_summaries.json")
-        cumulative_file = os.path.join(self.file_path, "cumulative_summaries.json")
-        
-        if not (os.path.exists(monthly_file) and os.path.exists(cumulative_file)):
-            print(f"未找到fuzzymemory文件，开始生成{year}年的月度总结和累积总结...")
-            self.fuzzy_memory_builder.build_all_summaries(year)
-            print("fuzzymemory生成完成！")
+        # 人物级初始化产物：fuzzymemory、底层事件、cognition和context对同一人物只计算一次
+        if self.bootstrap is None or self.bootstrap.persona is not persona:
+            self.bootstrap = PersonaBootstrap(persona, event, self.persona_address_data, self.file_path, maptools=self.maptools)
+        bootstrap = self.bootstrap.prepare(date)
+        self.fuzzy_memory_builder = bootstrap.fuzzy_memory_builder
+        if bootstrap.events is event:
+            self.bottom_events = bootstrap.bottom_events
+            self.timeline = bootstrap.timeline
         else:
-            print("fuzzymemory文件已存在，直接加载...")
-            self.fuzzy_memory_builder.load_summaries()
-
-        self.update_bottom_level_events()
+            self.update_bottom_level_events()
 
         # 初始化长期记忆和短期记忆
         self.long_memory = self.get_fuzzy_long_memory(date)
         mem = ""
         self.update_short_memory("",self.get_next_n_day(date,-1))
 
-        # 生成cognition和context
-        t1 = '''
-        请你基于下面的个人画像和详细地址信息，以第一人称视角描述你对自己的自我认知，包括1）个人基本信息。2）工作的主要特征、内容、方式、习惯、主要人物。3）家庭的主要特征、内容、方式、习惯、主要人物。4）其他生活的主要特征、内容、方式、习惯、主要人物。5）平常工作日的常见安排，目前的主要每天安排。描述要全面覆盖个人信息，地址相关数据请优先参考详细地址信息而非画像信息。
-        
-        个人画像：{persona}
-        详细地址信息：{persona_address_data}
-        '''
-
-        t2 = '''
-        请你基于下面的个人画像，设计一句让大模型扮演该角色的context，以”你是一位“开头。不超过50个字，只保留重要信息。
-        个人画像：{persona}
-        '''
-
-        prompt = t1.format(persona=self.persona, persona_address_data=self.persona_address_data)
-        res = self.llm_call_s(prompt)
-        #print(res)
-        self.cognition = res
-
-        prompt = t2.format(persona=self.persona)
-        res = self.llm_call_s(prompt)
-        #print(res)
-        self.context = res
-        
-        # 初始化persona_withoutrl
-        self.persona_withoutrl = persona.copy()  # 创建副本以避免修改原始persona
-        del self.persona_withoutrl["relation"]  # 在副本上删除relation键
+        self.cognition = bootstrap.cognition
+        self.context = bootstrap.context
+        self.persona_withoutrl = copy.deepcopy(bootstrap.persona_withoutrl)
 
     def load_from_json(self, event, persona):
         """
@@ -399,19 +257,6 @@ class Mind:
         except ValueError:
             return "日期格式错误，请使用'YYYY-MM-DD'格式"
 
-    def parse_date(self,date_str):
-        """解析日期字符串，返回(开始日期, 结束日期)的datetime元组"""
-        date_format = "%Y-%m-%d"
-        if "至" in date_str:
-            start_str, end_str = date_str.split("至")
-            start_date = datetime.strptime(start_str.strip(), date_format)
-            end_date = datetime.strptime(end_str.strip(), date_format)
-        else:
-            single_date = datetime.strptime(date_str.strip(), date_format)
-            start_date = single_date
-            end_date = single_date
-        return (start_date, end_date)
-
     def filter_events_by_start_range(self,events_data, start_range_str, end_range_str):
         """
         筛选事件开始时间在[start_range, end_range]范围内的最上层事件
@@ -420,62 +265,6 @@ class Mind:
         :param end_range_str: 筛选的结束时间（格式"YYYY-MM-DD"）
         :return: 符合条件的事件列表
         """
-        def extract_start_date(date_str: str) -> str:
-            """
-            从时间字符串中提取起始日期，兼容多种格式：
-            1. 时间区间（如"2025-01-01 07:30:00至2025-01-01 08:45:00"）
-            2. 单个时间（如"2025-01-01 07:30:00"或"2025-01-01"）
-            3. 带中文时段的时间（如"2025-01-01 上午"或"2025-01-01 下午"）
-
-            参数:
-                date_str: 输入的时间字符串（支持含"至"的区间和不含"至"的单个时间）
-
-            返回:
-                str: 提取的起始日期，格式固定为"YYYY-MM-DD"
-
-            异常:
-                ValueError: 输入字符串不符合支持的时间格式时抛出
-            """
-            import re
-            
-            # 步骤1：分割字符串，提取起始时间部分（含"至"则取左边，不含则取全部）
-            if "至" in date_str:
-                # 分割"至"，取左侧的起始时间（如"2025-01-01 07:30:00"）
-                start_time_part = date_str.split("至")[0].strip()
-            else:
-                # 无"至"，整个字符串即为起始时间（如"2025-01-01 07:30:00"或"2025-01-01"）
-                start_time_part = date_str.strip()
-
-            # 增强鲁棒性：去除所有中文和无关字符
-            # 只保留数字、字母、空格和日期分隔符（- : .）
-            start_time_part = re.sub(r'[^0-9a-zA-Z\s\-:\.]', '', start_time_part)
-            # 去除多余空格
-            start_time_part = ' '.join(start_time_part.split())
-            
-            # 步骤2：解析起始时间部分，提取纯日期（支持多种子格式）
-            supported_formats = [
-                "%Y-%m-%d %H:%M:%S",  # 带秒级时间的格式（如"2025-01-01 07:30:00"）
-                "%Y-%m-%d",  # 纯日期格式（如"2025-01-01"）
-                "%Y-%m-%d %H:%M",     # 带分钟级时间的格式（如"2025-01-01 07:30"）
-                "%Y-%m-%d %H"         # 带小时级时间的格式（如"2025-01-01 07"）
-            ]
-
-            for fmt in supported_formats:
-                try:
-                    # 解析时间后，按"YYYY-MM-DD"格式返回起始日期
-                    start_datetime = datetime.strptime(start_time_part, fmt)
-                    return start_datetime.strftime("%Y-%m-%d")
-                except ValueError:
-                    # 一种格式解析失败，尝试下一种
-                    continue
-
-            # 所有格式都解析失败时，抛出明确错误
-            raise ValueError(
-                f"时间格式不支持！请输入以下格式之一：\n"
-                f"1. 时间区间（如'2025-01-01 07:30:00至2025-01-01 08:45:00'）\n"
-                f"2. 单个时间（如'2025-01-01 07:30:00'或'2025-01-01'）\n"
-                f"当前输入：{date_str}"
-            )
         date_format = "%Y-%m-%d"
         try:
             # 解析用户输入的时间范围
@@ -487,17 +276,10 @@ class Mind:
         if start_range > end_range:
             raise ValueError("开始时间不能晚于结束时间")
 
-        matched_events = []
-        for event in events_data:
-            event_dates = event.get("date", [])
-            for date_str in event_dates:
-                date_str = extract_start_date(date_str)
-                event_start, _ = self.parse_date(date_str)  # 只关注事件的开始时间
-                # 检查事件开始时间是否在用户指定的范围内
-                if start_range <= event_start <= end_range:
-                    matched_events.append(event)
-                    break  # 一个事件只要有一个日期项符合就保留
-        return matched_events
+        # 事件列表只会被整体替换（event_schedule/event_add返回新列表），按列表对象缓存索引
+        if self.top_timeline is None or self.top_timeline.events is not events_data:
+            self.top_timeline = TimelineIndex(events_data)
+        return self.top_timeline.starting_between(start_range_str, end_range_str)
 
     def get_event_by_id(self, target_event_id: str) -> List[Dict]:
         """
@@ -571,6 +353,18 @@ class Mind:
         except ValueError:
             raise ValueError(f"日期格式错误：{date_str}，请使用YYYY-MM-DD格式（例如'2025-01-01'）")
 
+    def _get_daily_state_index(self) -> DailyRecordIndex:
+        """daily_state的日期索引（daily_state被替换后自动重建）"""
+        if self.daily_state_index is None or self.daily_state_index.source is not self.daily_state:
+            self.daily_state_index = DailyRecordIndex(self.daily_state)
+        return self.daily_state_index
+
+    def _get_daily_draft_index(self) -> DailyRecordIndex:
+        """daily_draft的日期索引（daily_draft被替换后自动重建）"""
+        if self.daily_draft_index is None or self.daily_draft_index.source is not self.daily_draft:
+            self.daily_draft_index = DailyRecordIndex(self.daily_draft)
+        return self.daily_draft_index
+
     def get_plan(self,date):#今日行动的详细信息+未来行动的粗略信息
         res = {"今日事件":"","未来一周背景":""}
         id_set = set()
@@ -593,10 +387,7 @@ class Mind:
             
             # 新增今日安排参考字段
             if self.daily_state:
-                for daily_item in self.daily_state:
-                    if daily_item.get("date") == date:
-                        data1["今日安排参考"] = daily_item
-                        break
+                data1["今日安排参考"] = self._get_daily_state_index().get(date, "")
             
             return data1
         res["今日事件"] = getdata(date)
@@ -639,10 +430,7 @@ class Mind:
                 
                 # 新增今日安排参考字段
                 if self.daily_state:
-                    for daily_item in self.daily_state:
-                        if daily_item.get("date") == date:
-                            data1["今日安排参考"] = daily_item
-                            break
+                    data1["今日安排参考"] = self._get_daily_state_index().get(date, "")
                 
                 return data1
 
@@ -680,15 +468,12 @@ class Mind:
                 print(f"警告: 年月 {year_month} 的数据在文件中不存在")
                 return {}
 
-            # 在对应的月份数据中查找指定日期
-            month_data = data[year_month]
-
-            for day_data in month_data:
-                # print(day_data)
-                if day_data.get("date") == target_date_str:
-                        return day_data
+            # 按日期索引查找指定日期
+            day_data = self._get_daily_draft_index().get(target_date_str)
+            if day_data is not None:
+                return day_data
 
-                # 如果指定日期不存在，返回空字典
+            # 如果指定日期不存在，返回空字典
             print(f"警告: 日期 {target_date_str} 的数据在文件中不存在")
             return {}
         except json.JSONDecodeError:
@@ -835,15 +620,15 @@ class Mind:
         更新短期记忆，插入今日事件并检索相关历史事件
         
         参数:
-            dailyevent: 今日事件内容
+            dailyevent: 今日事件内容（单条记忆或记忆列表）
             date: 当前日期字符串（格式：YYYY-MM-DD）
         
         返回:
             None: 直接更新实例的short_memory属性
         """
-        # 记忆库插入今天事件
+        # 记忆库插入今天事件（批量编码、一次持久化）
         if dailyevent!="":
-            self.mem_module.add_memory(dailyevent)
+            self.mem_module.add_memories(dailyevent if isinstance(dailyevent, list) else [dailyevent])
         # 检索明天相关事件
         def get_target_dates(date_str: str, date_format: str = "%Y-%m-%d") -> List[str]:
             """
@@ -986,15 +771,15 @@ class Mind:
         更新短期记忆，插入今日事件并检索相关历史事件
 
         参数:
-            dailyevent: 今日事件内容
+            dailyevent: 今日事件内容（单条记忆或记忆列表）
             date: 当前日期字符串（格式：YYYY-MM-DD）
 
         返回:
             None: 直接更新实例的short_memory属性
         """
-        # 记忆库插入今天事件
+        # 记忆库插入今天事件（批量编码、一次持久化）
         if dailyevent != "":
-            self.mem_module.add_memory(dailyevent)
+            self.mem_module.add_memories(dailyevent if isinstance(dailyevent, list) else [dailyevent])
 
         # 检索明天相关事件
         def get_target_dates(date_str: str, date_format: str = "%Y-%m-%d") -> List[str]:
@@ -1173,27 +958,102 @@ class Mind:
             # 获取累积记忆
             cumulative_memory = self.fuzzy_memory_builder.get_memory_up_to_month(date)
             
-            # 2. 获取当月从1日到目标日期的事件并生成总结
-            start_of_month = datetime(year, month, 1).strftime("%Y-%m-%d")
-            end_of_month = datetime(year, month, day).strftime("%Y-%m-%d")
+            # 2. 当月1日到目标日期的总结（按日滚动缓存，已有前几日的总结时只补充新增日期的事件）
+            monthly_summary = self.get_month_to_date_summary(year, month, day)
             
-            # 提取当月到目标日期的事件
-            events_this_month = []
-            for d in range(1, day + 1):
-                current_date = datetime(year, month, d).strftime("%Y-%m-%d")
-                events_this_month.extend(self.filter_by_date(current_date))
+            # 3. 合并累积记忆和当月总结
+            if monthly_summary:
+                combined_memory = f"{cumulative_memory}\n\n{year}年{month}月1日到{day}日的重要事件：\n{monthly_summary}"
+            else:
+                combined_memory = cumulative_memory
             
-            # 如果有当月事件，生成总结
-            monthly_summary = ""
-            if events_this_month:
-                # 构建事件描述字符串
-                events_desc = "\n".join([
-                    f"- {event.get('name', '未命名事件')}: {event.get('description', '无描述')} ({event.get('date', [''])[0]})"
-                    for event in events_this_month
-                ])
+            return combined_memory
+            
+        except Exception as e:
+            print(f"获取模糊长期记忆时出错：{e}")
+            # 出错时返回空记忆
+            return ""
+
+    @staticmethod
+    def _format_events_desc(events):
+        return "\n".join([
+            f"- {event.get('name', '未命名事件')}: {event.get('description', '无描述')} ({event.get('date', [''])[0]})"
+            for event in events
+        ])
+
+    def get_month_to_date_summary(self, year, month, day):
+        """
+        获取当月1日到指定日的事件总结
+
+        总结按 (人物, 月份, 日) 缓存在DailySummaryCache中（多个Mind实例共享并持久化）：
+        - 当日已有总结且事件未变化时直接返回
+        - 同月已有更早某日的总结时，只把之后新增日期的事件交给LLM，在原总结基础上更新
+        - 否则按当月1日到指定日的全部事件生成
+
+        参数:
+            year: 年份
+            month: 月份
+            day: 日
+
+        返回:
+            str: 总结内容，当月没有事件时返回空字符串
+        """
+        cache = DailySummaryCache.get_instance(self.file_path)
+        persona_desc = json.dumps(self.persona, ensure_ascii=False, indent=2)
+
+        # 逐日提取事件，并计算1日到每一日的累计事件摘要（用于判断缓存是否仍然有效）
+        events_by_day = {}
+        digests = {}
+        digest = hashlib.sha1(persona_desc.encode("utf-8")).hexdigest()
+        for d in range(1, day + 1):
+            current_date = datetime(year, month, d).strftime("%Y-%m-%d")
+            events_by_day[current_date] = self.filter_by_date(current_date)
+            day_events = json.dumps(events_by_day[current_date], ensure_ascii=False, sort_keys=True, default=str)
+            digest = hashlib.sha1((digest + day_events).encode("utf-8")).hexdigest()
+            digests[current_date] = digest
+        target = datetime(year, month, day).strftime("%Y-%m-%d")
+
+        with cache.date_lock(target):
+            cached = cache.get(target, digests[target])
+            if cached is not None:
+                return cached
+
+            previous = cache.latest_before(target, digests)
+            if previous is not None and previous[1]:
+                previous_date, previous_summary = previous
+                new_events = [event for d, events in events_by_day.items() if d > previous_date for event in events]
+                if not new_events:
+                    monthly_summary = previous_summary
+                else:
+                    previous_day = int(previous_date[8:])
+                    prompt = f"""
+                你是一位记忆专家，请基于以下个人画像、{year}年{month}月1日到{previous_day}日的已有总结，以及{previous_day + 1}日到{day}日的新增事件，更新为{year}年{month}月1日到{day}日的总结，仅聚焦于以下信息：
                 
-                # 使用LLM生成当月总结
-                prompt = f"""
+                1. 个人近期（特别是前一日和当日）主要做了什么
+                2. 个人当前所在的位置等状态信息（如是否在居住地,目前在关注什么,是否受什么影响）
+                3. 近期事件对当日生活的影响
+                4. 当下的状态及受之前哪些事件的影响
+                
+                个人画像：{persona_desc}
+                
+                {year}年{month}月1日到{previous_day}日的已有总结：
+                {previous_summary}
+                
+                {year}年{month}月{previous_day + 1}日到{day}日的新增事件：
+                {self._format_events_desc(new_events)}
+                
+                输出要求：
+                - 第一人称
+                - 极度精简，仅保留核心信息
+                - 忽略无关细节，只关注上述重点
+                - 直接呈现关键内容，无冗余描述
+                """
+                    monthly_summary = llm_call(prompt, self.context)
+            else:
+                events_this_month = [event for events in events_by_day.values() for event in events]
+                monthly_summary = ""
+                if events_this_month:
+                    prompt = f"""
                 你是一位记忆专家，请基于以下个人画像和{year}年{month}月1日到{day}日的事件，仅聚焦于以下信息进行总结：
                 
                 1. 个人近期（特别是前一日和当日）主要做了什么
@@ -1201,10 +1061,10 @@ class Mind:
                 3. 近期事件对当日生活的影响
                 4. 当下的状态及受之前哪些事件的影响
                 
-                个人画像：{json.dumps(self.persona, ensure_ascii=False, indent=2)}
+                个人画像：{persona_desc}
                 
                 {year}年{month}月1日到{day}日的事件：
-                {events_desc}
+                {self._format_events_desc(events_this_month)}
                 
                 输出要求：
                 - 第一人称
@@ -1212,21 +1072,11 @@ class Mind:
                 - 忽略无关细节，只关注上述重点
                 - 直接呈现关键内容，无冗余描述
                 """
-                
-                monthly_summary = llm_call(prompt, self.context)
-            
-            # 3. 合并累积记忆和当月总结
-            if monthly_summary:
-                combined_memory = f"{cumulative_memory}\n\n{year}年{month}月1日到{day}日的重要事件：\n{monthly_summary}"
-            else:
-                combined_memory = cumulative_memory
-            
-            return combined_memory
-            
-        except Exception as e:
-            print(f"获取模糊长期记忆时出错：{e}")
-            # 出错时返回空记忆
-            return ""
+                    monthly_summary = llm_call(prompt, self.context)
+
+            if monthly_summary or not any(events_by_day.values()):
+                cache.put(target, digests[target], monthly_summary)
+        return monthly_summary
 
     def map(self,pt):
         #获取真实poi数据和通行信息
@@ -1348,9 +1198,8 @@ class Mind:
                 "reflection": reflection
             }
             
-            # 8. 保存当前状态
-            self.save_to_json()
-            self.save_intermediate_outputs()
+            # 8. 追加当日中间输出和状态到本区间的逐日日志
+            self.append_day_journal(date)
             #self._save_events_to_file()
             
             self._log_event(f"\n=== {date} 的事件生成完成 ===")
@@ -1408,9 +1257,8 @@ class Mind:
                 "reflection": reflection
             }
 
-            # 8. 保存当前状态
-            self.save_to_json()
-            self.save_intermediate_outputs()
+            # 8. 追加当日中间输出和状态到本区间的逐日日志
+            self.append_day_journal(date)
             # self._save_events_to_file()
 
             self._log_event(f"\n=== {date} 的事件生成完成 ===")
@@ -1420,6 +1268,67 @@ class Mind:
             import traceback
             traceback.print_exc()
             return False
+    def get_day_state(self) -> Dict:
+        """
+        返回逐日生成之间需要延续的Mind状态（写入本区间的逐日日志，用于断点续跑）
+        
+        返回:
+            Dict: {"thought", "long_memory", "short_memory"}
+        """
+        return {"thought": self.thought, "long_memory": self.long_memory, "short_memory": self.short_memory}
+
+    def restore_day_state(self, state: Dict) -> None:
+        """
+        恢复某日生成结束时的Mind状态（断点续跑时跳过已完成的日期）
+        
+        参数:
+            state: get_day_state返回的状态
+        """
+        self.thought = state.get("thought", self.thought)
+        self.long_memory = state.get("long_memory", self.long_memory)
+        self.short_memory = state.get("short_memory", self.short_memory)
+        self.reflection = state.get("reflection", self.reflection)
+        self.env = state.get("env", self.env)
+
+    def get_journal_file(self, interval_start):
+        """
+        返回本区间的逐日日志路径（只由人物ID和区间起始日决定，重新运行时追加到同一文件）
+        
+        参数:
+            interval_start: 区间起始日期（格式：YYYY-MM-DD）
+        
+        返回:
+            str: 日志文件路径
+        """
+        return os.path.join(self.file_path, "intermediate_output", f"intermediate_outputs_{self.instance_id}_{interval_start}.jsonl")
+
+    def append_day_journal(self, date):
+        """
+        向本区间的逐日日志追加一行：当日中间输出和当日结束时的状态
+        
+        日志为JSONL，位于 <数据目录>/intermediate_output/intermediate_outputs_<人物ID>_<区间起始日>.jsonl，
+        新建时首行为区间头（画像、context、cognition），之后每天一行；只追加不重写，写入量随天数线性增长。
+        同一日期重复出现时（重新生成）以最后一行为准。断点续跑和EventFormatter都从这里读取当日数据。
+        
+        参数:
+            date: 日期字符串（格式：YYYY-MM-DD）
+        
+        返回:
+            str: 日志文件路径
+        """
+        records = []
+        if self.journal_file is None:
+            self.journal_file = self.get_journal_file(getattr(self, "current_date", None) or date)
+        if not os.path.exists(self.journal_file) or os.path.getsize(self.journal_file) == 0:
+            records.append({"type": "header", "persona": self.persona, "context": self.context, "cognition": self.cognition})
+        state = self.get_day_state()
+        state["reflection"] = self.reflection
+        state["env"] = self.env
+        records.append({"type": "day", "date": date, "outputs": self.daily_intermediate_outputs[date], "state": state})
+        append_jsonl(self.journal_file, records)
+        print(f"\n=== {date} 的中间输出已追加到 {self.journal_file} ===")
+        return self.journal_file
+
     def save_intermediate_outputs(self):
         """
         保存所有每日中间输出到JSON文件
@@ -1438,9 +1347,8 @@ class Mind:
         filename = f"intermediate_outputs_thread_{thread_id}.json"
         file_path = os.path.join(intermediate_folder, filename)
         
-        # 保存到同一个文件
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(self.daily_intermediate_outputs, f, ensure_ascii=False, indent=2)
+        # 保存到同一个文件（中间产物，紧凑格式原子写入）
+        atomic_write_json(file_path, self.daily_intermediate_outputs, compact=True)
         print(f"\n=== 中间输出已保存到 {file_path} ===")
         return filename
     
@@ -1514,13 +1422,13 @@ class Mind:
         返回:
             str: 主观思考内容
         """
-        prompt = template_daily_event_subjective_plan.format(
-            cognition=self.cognition,
+        prompt = assemble_prompt(
+            template_daily_event_subjective_plan,
+            {"cognition": self.cognition, "persona": self.persona},
             memory='这是长期记忆:'+self.long_memory + '这是短期记忆:'+self.short_memory,
             thought=self.thought,
             plan=plan,
-            date=self.get_date_string(date),
-            persona=self.persona
+            date=self.get_date_string(date)
         )
         #print( prompt)
         thought = self.llm_call_s(prompt, 0)
@@ -1539,12 +1447,13 @@ class Mind:
         返回:
             str: 客观事件内容
         """
-        prompt = template_daily_event_objective_optimize.format(
+        prompt = assemble_prompt(
+            template_daily_event_objective_optimize,
+            {"persona": self.cognition},
             event=event,
             plan=plan,
             memory=self.long_memory + self.short_memory,
-            date=self.get_date_string(date),
-            persona=self.cognition
+            date=self.get_date_string(date)
         )
         events = self.llm_call_s(prompt, 0)
         self._log_event("客观生成-----------------------------------------------------------------------")
@@ -1576,7 +1485,11 @@ class Mind:
                 }
                 simplified_address_data.append(simplified_address)
         
-        prompt = template_event_traffic_adjust.format(poi=poi_data, event=event, daily_event_reference=daily_event_reference,history=history,persona=self.cognition,persona_address_data=simplified_address_data)
+        prompt = assemble_prompt(
+            template_event_traffic_adjust,
+            {"persona": self.cognition, "persona_address_data": simplified_address_data},
+            poi=poi_data, event=event, daily_event_reference=daily_event_reference, history=history
+        )
         #print(prompt)
         adjusted_events = self.llm_call_s(prompt, 0)
         self._log_event("轨迹调整-----------------------------------------------------------------------")
@@ -1596,7 +1509,9 @@ class Mind:
         返回:
             dict: 提取的事件数据
         """
-        prompt = template_event_format_sequence.format(
+        prompt = assemble_prompt(
+            template_event_format_sequence,
+            None,
             content=events,
             poi=poi_data + "家庭住址：上海市浦东新区张杨路123号，工作地点：上海市浦东新区世纪大道88号",
             date=self.get_date_string(date)
@@ -1622,8 +1537,9 @@ class Mind:
         返回:
             dict: 反思数据
         """
-        prompt = template_daily_reflection.format(
-            cognition=self.cognition,
+        prompt = assemble_prompt(
+            template_daily_reflection,
+            {"cognition": self.cognition},
             memory=self.long_memory + self.short_memory,
             content=events,
             plan=plan,
@@ -1656,8 +1572,9 @@ class Mind:
         for i in range(1, 3):
             history_data += self.mem_module.search_by_date(self.get_next_n_day(date, -i))
         
-        prompt = template_update_long_term_memory.format(
-            cognition=self.cognition,
+        prompt = assemble_prompt(
+            template_update_long_term_memory,
+            {"cognition": self.cognition},
             memory=self.long_memory,
             plan=plan,
             history=history_data,
@@ -1684,8 +1601,7 @@ class Mind:
         """
         保存事件到文件
         """
-        with open(self.file_path+"event_update.json", "w", encoding="utf-8") as f:
-            json.dump(self.events, f, ensure_ascii=False, indent=2)
+        atomic_write_json(self.file_path+"event_update.json", self.events)
             
 
 
@@ -1726,12 +1642,118 @@ def iterate_dates(start_date: str, end_date: str) -> List[str]:
 
     return date_list
 
+class PersonaBootstrap:
+    """
+    人物级初始化产物，同一人物的所有区间Mind实例共享（只读）
+
+    包括：地图工具（含地址索引与查询缓存）、fuzzymemory月度/累积总结、最底层事件及其时间轴索引、
+    去掉relation的画像、cognition和context。cognition和context需要调用大模型，
+    结果按画像和地址数据的摘要持久化到 persona_bootstrap.json，重新运行时直接复用。
+
+    参数:
+        persona: 人物画像数据
+        events: 事件数据
+        persona_address_data: 详细地址数据
+        file_path: 人物数据目录
+        maptools: 已有的地图工具，为None时按config.json创建
+    """
+
+    t1 = '''
+        请你基于下面的个人画像和详细地址信息，以第一人称视角描述你对自己的自我认知，包括1）个人基本信息。2）工作的主要特征、内容、方式、习惯、主要人物。3）家庭的主要特征、内容、方式、习惯、主要人物。4）其他生活的主要特征、内容、方式、习惯、主要人物。5）平常工作日的常见安排，目前的主要每天安排。描述要全面覆盖个人信息，地址相关数据请优先参考详细地址信息而非画像信息。
+        
+        个人画像：{persona}
+        详细地址信息：{persona_address_data}
+        '''
+
+    t2 = '''
+        请你基于下面的个人画像，设计一句让大模型扮演该角色的context，以”你是一位“开头。不超过50个字，只保留重要信息。
+        个人画像：{persona}
+        '''
+
+    def __init__(self, persona, events, persona_address_data, file_path, maptools=None):
+        self.persona = persona
+        self.events = events
+        self.persona_address_data = persona_address_data if persona_address_data is not None else []
+        self.file_path = file_path
+        self.cache_file = os.path.join(file_path, "persona_bootstrap.json")
+        self.maptools = maptools if maptools is not None else self.create_map_tool(self.persona_address_data)
+        self.persona_withoutrl = {key: value for key, value in persona.items() if key != "relation"}
+        self.bottom_events: Optional[List[Dict]] = None
+        self.timeline: Optional[TimelineIndex] = None
+        self.fuzzy_memory_builder = None
+        self.cognition = None
+        self.context = None
+        self._summary_years = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create_map_tool(persona_address_data):
+        """按config.json的map_tool配置创建地图工具"""
+        with open('config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        map_config = config.get('map_tool', {})
+        map_api_key = map_config.get('api_key', 'f6fa3480d4a0e08cd1243f311fa03582')
+        return MapMaintenanceTool(map_api_key, persona_address_data=persona_address_data)
+
+    def _digest(self):
+        """画像和地址数据的摘要，任一变化时持久化的cognition/context失效"""
+        data = json.dumps([self.persona, self.persona_address_data], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def prepare(self, date):
+        """
+        计算尚未计算的初始化产物（线程安全，重复调用只在首次计算）
+
+        参数:
+            date: 模拟开始日期，格式为"YYYY-MM-DD"，用于确定fuzzymemory的年份
+
+        返回:
+            PersonaBootstrap: self
+        """
+        with self._lock:
+            year = int(date[:4])
+            if year not in self._summary_years:
+                # 检查fuzzymemory文件是否存在，如果不存在则生成
+                self.fuzzy_memory_builder = FuzzyMemoryBuilder.get_instance(self.events, self.persona, self.file_path)
+                monthly_file = os.path.join(self.file_path, "monthly_summaries.json")
+                cumulative_file = os.path.join(self.file_path, "cumulative_summaries.json")
+                if not (os.path.exists(monthly_file) and os.path.exists(cumulative_file)):
+                    print(f"未找到fuzzymemory文件，开始生成{year}年的月度总结和累积总结...")
+                    self.fuzzy_memory_builder.build_all_summaries(year)
+                    print("fuzzymemory生成完成！")
+                else:
+                    print("fuzzymemory文件已存在，直接加载...")
+                    self.fuzzy_memory_builder.load_summaries()
+                self._summary_years.add(year)
+
+            if self.bottom_events is None:
+                self.bottom_events = Mind.extract_bottom_level_events(self.events)
+                self.timeline = TimelineIndex(self.bottom_events, default_date="2026-01-01")
+
+            if self.cognition is None:
+                digest = self._digest()
+                cached = read_json_file(self.cache_file) if os.path.exists(self.cache_file) else None
+                if cached and cached.get("digest") == digest:
+                    self.cognition = cached.get("cognition", "")
+                    self.context = cached.get("context", "")
+                else:
+                    # 与逐实例初始化时一致：生成时尚无context
+                    prompt = self.t1.format(persona=self.persona, persona_address_data=self.persona_address_data)
+                    cognition = llm_call(prompt, "")
+                    prompt = self.t2.format(persona=self.persona)
+                    context = llm_call(prompt, "")
+                    self.cognition, self.context = cognition, context
+                    if not write_json_file(self.cache_file, {"digest": digest, "cognition": cognition, "context": context}):
+                        print(f"保存人物初始化结果失败：{self.cache_file}")
+        return self
+
+
 class MindController:
     """
     Mind类的并行化控制器，用于管理多个Mind实例的并行执行
     """
         
-    def __init__(self, event_file='event.json', persona_file='persona.json', data_dir='data/2025-12-07', daily_state_file='daily_state.json', instance_id=0, loc_data='location.json'):
+    def __init__(self, event_file='event.json', persona_file='persona.json', data_dir='data/2025-12-07', daily_state_file='daily_state.json', instance_id=0, loc_data='location.json', checkpoint_file=None):
         """
         初始化MindController实例
         
@@ -1741,9 +1763,14 @@ class MindController:
             data_dir: 数据存储目录
             daily_state_file: 每日状态数据文件路径
             instance_id: 人物实例ID，用于确保每个人只有一个memory文件
+            checkpoint_file: 逐日完成日志（JSONL）路径，为None时不记录、不续跑
         """
         self.data_dir = data_dir
         self.instance_id = instance_id
+        # 逐日完成日志：已完成的日期在重新运行时跳过
+        self.checkpoint = DayCheckpoint(checkpoint_file, instance_id) if checkpoint_file else None
+        self.bootstrap = None
+        self._bootstrap_lock = threading.Lock()
         # 从文件加载初始数据
         from utils.IO import read_json_file
         try:
@@ -1778,7 +1805,19 @@ class MindController:
         """
         # 使用人物的instance_id作为标识，确保每个人只有一个memory文件
         # 不再使用thread_id，避免每个线程创建一个独立的memory文件
-        return Mind(file_path=self.data_dir, instance_id=self.instance_id, persona=self.persona, event=self.events, daily_state={},persona_address_data=self.loc_data,daily_draft=self.daily_state)
+        return Mind(file_path=self.data_dir, instance_id=self.instance_id, persona=self.persona, event=self.events, daily_state={},persona_address_data=self.loc_data,daily_draft=self.daily_state,bootstrap=self.get_bootstrap())
+
+    def get_bootstrap(self):
+        """
+        获取人物级初始化产物（首次调用时创建），所有区间的Mind实例共享
+        
+        返回:
+            PersonaBootstrap: 初始化产物
+        """
+        with self._bootstrap_lock:
+            if self.bootstrap is None:
+                self.bootstrap = PersonaBootstrap(self.persona, self.events, self.loc_data, self.data_dir)
+            return self.bootstrap
     
     def run_daily_event_with_threading(self, start_date, end_date, max_workers=5, interval_days=2):
         """
@@ -1807,27 +1846,60 @@ class MindController:
         # 结果列表
         results = []
 
+        # 人物级初始化只做一次，各区间共享（避免每个区间重复调用大模型生成cognition和context）
+        self.get_bootstrap().prepare(start_date)
+
         # 定义区间处理函数
         def process_interval(interval_dates):
             """处理单个日期区间，区间内串行执行"""
+            interval_results = []
+            checkpoint = self.checkpoint
+            if checkpoint is not None and all(checkpoint.completed(date) for date in interval_dates):
+                print(f"  区间 {interval_dates[0]} 到 {interval_dates[-1]} 已全部完成，跳过")
+                return [(date, True, None, None) for date in interval_dates]
+
             # 为每个区间创建独立的Mind实例，避免共享状态
             mind_instance = self.create_mind_instance()
             # 正确初始化Mind实例，传入事件数据、人物画像和起始日期
             mind_instance.initialize(self.events, self.persona, interval_dates[0], None,self.daily_state)
-            interval_results = []
             
             print(f"  开始处理区间：{interval_dates[0]} 到 {interval_dates[-1]}")
             
             # 区间内串行执行
             for date in interval_dates:
-                try:
-                    success = mind_instance.daily_event_gen1(date)
+                day = checkpoint.completed(date) if checkpoint is not None else None
+                if day is not None:
+                    # 已完成的日期：从区间逐日日志恢复当日结束时的状态，不重新生成
+                    mind_instance.restore_day_state(day.get("state", {}))
                     interval_results.append((date, True, None, None))
+                    continue
+                if checkpoint is not None:
+                    # 上次运行可能在写入当日记忆之后失败或中断，先删除该日记忆，避免重新生成后记忆重复
+                    deleted = mind_instance.mem_module.delete_memories_on_date(date)
+                    if deleted:
+                        print(f"    {date} 重新生成前删除上次写入的 {deleted} 条记忆")
+                try:
+                    if checkpoint is not None and checkpoint.failed(date):
+                        # 上次运行该日失败：跳过LLM响应缓存，避免再次拿到同一份解析失败的响应
+                        with llm_cache_disabled():
+                            success = mind_instance.daily_event_gen1(date)
+                    else:
+                        success = mind_instance.daily_event_gen1(date)
+                    if success:
+                        interval_results.append((date, True, None, None))
+                    else:
+                        interval_results.append((date, False, "GenerationError", f"{date} 的事件生成失败"))
                 except Exception as e:
+                    success = False
                     error_type = type(e).__name__
                     error_msg = str(e)
                     print(f"    处理日期 {date} 时出错 ({error_type}): {error_msg}")
                     interval_results.append((date, False, error_type, error_msg))
+                if checkpoint is not None:
+                    if success:
+                        checkpoint.mark_done(date, mind_instance.journal_file)
+                    else:
+                        checkpoint.mark_failed(date, interval_results[-1][3])
             
             print(f"  区间处理完成：{interval_dates[0]} 到 {interval_dates[-1]}")
             return interval_results
@@ -6,7 +6,9 @@ from pyarrow import string
 from utils.IO import *
 from datetime import datetime, timedelta
 from utils.llm_call import *
+from utils.prompt_assembly import assemble_prompt
 from event.memory import *
+from event.timeline_index import DailyRecordIndex, TimelineIndex, extract_bottom_level_events
 import random
 from typing import List, Dict, Optional, Tuple
 class Data_extract:
@@ -16,7 +18,10 @@ class Data_extract:
         self.persona_withoutrl = ""
         self.context = "你是一位手机数据专家和深度用户"
         self.atomic_events : Optional[List[Dict]] = None
+        self.timeline: Optional[TimelineIndex] = None  # 最底层事件的时间轴索引
+        self.timeline_source = None  # 建索引时的事件列表
         self.daily_draft = {}
+        self.daily_draft_index: Optional[DailyRecordIndex] = None  # daily_draft的日期索引
 
     def _get_bottom_level_events(self) -> List[Dict]:
         """
@@ -26,133 +31,22 @@ class Data_extract:
         if self.atomic_events is not None:
             return self.atomic_events  # 已计算过，直接返回缓存
 
-        def recursive_extract(events: List[Dict]) -> List[Dict]:
-            result = []
-            for event in events:
-                subevents = event.get("subevent", [])
-                if not subevents:
-                    result.append(event)
-                else:
-                    result.extend(recursive_extract(subevents))
-            return result
-
-        self.bottom_events = recursive_extract(self.events)
+        self.bottom_events = extract_bottom_level_events(self.events)
         return self.bottom_events
     def update_bottom_level_events(self):
-        def recursive_extract(events: List[Dict]) -> List[Dict]:
-            result = []
-            for event in events:
-                subevents = event.get("subevent", [])
-                if not subevents:
-                    result.append(event)
-                else:
-                    result.extend(recursive_extract(subevents))
-            return result
-
-        self.bottom_events = recursive_extract(self.events)
+        self.bottom_events = extract_bottom_level_events(self.events)
         return self.bottom_events
-    @staticmethod
-    def is_date_match(target_date_str: str, event_date_str: str) -> bool:
-        """
-        【静态方法】判断事件日期是否包含目标日期（支持单个日期/日期范围）
-        :param target_date_str: 目标日期（格式：YYYY-MM-DD）
-        :param event_date_str: 事件日期（格式：YYYY-MM-DD 或 YYYY-MM-DD至YYYY-MM-DD）
-        :return: 匹配结果（True/False）
-        """
-        # 验证目标日期格式
-        try:
-            target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
-        except ValueError:
-            raise ValueError(f"目标日期格式错误：{target_date_str}，需符合YYYY-MM-DD")
-
-        # 处理日期范围
-        if "至" in event_date_str:
-            try:
-                start_str, end_str = event_date_str.split("至")
-                start_date = datetime.strptime(start_str.strip(), "%Y-%m-%d").date()
-                end_date = datetime.strptime(end_str.strip(), "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError(f"事件日期格式错误：{event_date_str}，范围需符合YYYY-MM-DD至YYYY-MM-DD")
-            return start_date <= target_date <= end_date
-        # 处理单个日期
-        else:
-            try:
-                event_date = datetime.strptime(event_date_str.strip(), "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError(f"事件日期格式错误：{event_date_str}，单个日期需符合YYYY-MM-DD")
-            return event_date == target_date
-
     def filter_by_date(self, target_date: str) -> List[Dict]:
         """
         【核心接口方法】筛选指定日期的最底层事件
         :param target_date: 目标日期（格式：YYYY-MM-DD）
         :return: 匹配的事件列表
         """
-        # 步骤1：获取所有底层事件（自动缓存）
-        bottom_events = self._get_bottom_level_events()
-
-        def extract_start_date(date_str: str) -> str:
-            """
-            从时间字符串中提取起始日期，兼容两种格式：
-            1. 时间区间（如"2025-01-01 07:30:00至2025-01-01 08:45:00"）
-            2. 单个时间（如"2025-01-01 07:30:00"或"2025-01-01"）
-
-            参数:
-                date_str: 输入的时间字符串（支持含"至"的区间和不含"至"的单个时间）
-
-            返回:
-                str: 提取的起始日期，格式固定为"YYYY-MM-DD"
-
-            异常:
-                ValueError: 输入字符串不符合支持的时间格式时抛出
-            """
-            # 步骤1：分割字符串，提取起始时间部分（含"至"则取左边，不含则取全部）
-            if "至" in date_str:
-                # 分割"至"，取左侧的起始时间（如"2025-01-01 07:30:00"）
-                start_time_part = date_str.split("至")[0].strip()
-            else:
-                # 无"至"，整个字符串即为起始时间（如"2025-01-01 07:30:00"或"2025-01-01"）
-                start_time_part = date_str.strip()
-
-            # 步骤2：解析起始时间部分，提取纯日期（支持两种子格式）
-            supported_formats = [
-                "%Y-%m-%d %H:%M:%S",  # 带秒级时间的格式（如"2025-01-01 07:30:00"）
-                "%Y-%m-%d",  # 纯日期格式（如"2025-01-01"）
-                "%Y-%m-%d %H:%M",
-                "%Y-%m-%d %H"
-            ]
-
-            for fmt in supported_formats:
-                try:
-                    # 解析时间后，按"YYYY-MM-DD"格式返回起始日期
-                    start_datetime = datetime.strptime(start_time_part, fmt)
-                    return start_datetime.strftime("%Y-%m-%d")
-                except ValueError:
-                    # 一种格式解析失败，尝试下一种
-                    continue
-
-            # 所有格式都解析失败时，抛出明确错误
-            raise ValueError(
-                f"时间格式不支持！请输入以下格式之一：\n"
-                f"1. 时间区间（如'2025-01-01 07:30:00至2025-01-01 08:45:00'）\n"
-                f"2. 单个时间（如'2025-01-01 07:30:00'或'2025-01-01'）\n"
-                f"当前输入：{date_str}"
-            )
-        # 步骤2：筛选匹配日期的事件
-        matched = []
-        for event in bottom_events:
-            # 统一处理date为数组或单个字符串的情况，转为可迭代对象
-            date_values = event.get("date", [])
-            if not isinstance(date_values, list):
-                date_values = [date_values]  # 若为单个字符串，转为单元素列表
-
-            for date_str in date_values:
-                date_str = extract_start_date(date_str)
-                if self.is_date_match(target_date, date_str):
-                    matched.append(event)
-                    break # 避免同一事件因多个日期重复加入
-
-        return matched
+        # 时间轴索引按事件列表缓存，load_from_json替换事件后自动重建
+        if self.timeline is None or self.timeline_source is not self.events:
+            self.timeline = TimelineIndex(self.update_bottom_level_events())
+            self.timeline_source = self.events
+        return self.timeline.starting_on(target_date)
     def load_from_json(self,event,persona,daily_draft={}):
 
             self.persona = persona
@@ -185,15 +79,14 @@ class Data_extract:
                 print(f"警告: 年月 {year_month} 的数据在文件中不存在")
                 return {}
 
-            # 在对应的月份数据中查找指定日期
-            month_data = data[year_month]
-
-            for day_data in month_data:
-                # print(day_data)
-                if day_data.get("date") == target_date_str:
-                    return day_data
+            # 按日期索引查找指定日期（daily_draft被替换后自动重建索引）
+            if self.daily_draft_index is None or self.daily_draft_index.source is not data:
+                self.daily_draft_index = DailyRecordIndex(data)
+            day_data = self.daily_draft_index.get(target_date_str)
+            if day_data is not None:
+                return day_data
 
-                # 如果指定日期不存在，返回空字典
+            # 如果指定日期不存在，返回空字典
             print(f"警告: 日期 {target_date_str} 的数据在文件中不存在")
             return {}
         except json.JSONDecodeError:
@@ -686,7 +579,7 @@ def phone_gen(date,contact,file_path,a,b,c,d):
         res.append(res1[i])
         print(res1[i]['event_id'])
     #callrecord+message
-    prompt = phone_event_MSM_template.format(event=res, contacts=contact, persona=extool.persona_withoutrl)
+    prompt = assemble_prompt(phone_event_MSM_template, {"contacts": contact, "persona": extool.persona_withoutrl}, event=res)
     res = llm_call(prompt, extool.context)
     print(res)
     res = remove_json_wrapper(res)
@@ -694,7 +587,7 @@ def phone_gen(date,contact,file_path,a,b,c,d):
     data = json.loads(res)
     c += data
     #gallery
-    prompt = phone_event_Gallery_template.format(event=res, persona=extool.persona)
+    prompt = assemble_prompt(phone_event_Gallery_template, {"persona": extool.persona}, event=res)
     resx = llm_call(prompt, extool.context)
     print(resx)
     resx = remove_json_wrapper(resx)
@@ -702,7 +595,7 @@ def phone_gen(date,contact,file_path,a,b,c,d):
     data = json.loads(resx)
     a+=data
     #push
-    prompt = phone_event_Push_template.format(event=res,contacts=contact,persona=extool.persona_withoutrl,msm=resx)
+    prompt = assemble_prompt(phone_event_Push_template, {"contacts": contact, "persona": extool.persona_withoutrl}, event=res, msm=resx)
     res = llm_call(prompt, extool.context)
     print(res)
     res = remove_json_wrapper(res)
@@ -710,7 +603,7 @@ def phone_gen(date,contact,file_path,a,b,c,d):
     data = json.loads(res)
     b += data
     #calendar+note
-    prompt = phone_event_Calendar_template.format(event=res,back = get_daily_events_with_subevent(extool.events,date),persona=extool.persona_withoutrl)
+    prompt = assemble_prompt(phone_event_Calendar_template, {"persona": extool.persona_withoutrl}, event=res, back=get_daily_events_with_subevent(extool.events,date))
     res = llm_call(prompt,extool.context)
     print(res)
     res = remove_json_wrapper(res)
@@ -721,14 +614,10 @@ def phone_gen(date,contact,file_path,a,b,c,d):
     phone_data_dir = os.path.join(file_path, "phone_data")
     os.makedirs(phone_data_dir, exist_ok=True)
     
-    with open(os.path.join(phone_data_dir, "event_note.json"), "w", encoding="utf-8") as f:
-        json.dump(d, f, ensure_ascii=False, indent=2)
-    with open(os.path.join(phone_data_dir, "event_call.json"), "w", encoding="utf-8") as f:
-        json.dump(c, f, ensure_ascii=False, indent=2)
-    with open(os.path.join(phone_data_dir, "event_gallery.json"), "w", encoding="utf-8") as f:
-        json.dump(a, f, ensure_ascii=False, indent=2)
-    with open(os.path.join(phone_data_dir, "event_push.json"), "w", encoding="utf-8") as f:
-        json.dump(b, f, ensure_ascii=False, indent=2)
+    atomic_write_json(os.path.join(phone_data_dir, "event_note.json"), d)
+    atomic_write_json(os.path.join(phone_data_dir, "event_call.json"), c)
+    atomic_write_json(os.path.join(phone_data_dir, "event_gallery.json"), a)
+    atomic_write_json(os.path.join(phone_data_dir, "event_push.json"), b)
 
     return
 
@@ -1593,10 +1482,10 @@ class CommunicationOperationGenerator:
             mid = (len(res) + 1) // 2  # 向上取整（如5→3，4→2）
             # mid = len(arr) // 2  # 向下取整（如5→2，4→2，后半部分多1个）
             res1,res2 = res[:mid], res[mid:]
-            prompt = event_classify.format(daily_events=res1, persona=extool.persona)
+            prompt = assemble_prompt(event_classify, {"persona": extool.persona}, daily_events=res1)
             a = llm_call(prompt)
             print(a)
-            prompt = event_classify.format(daily_events=res2, persona=extool.persona)
+            prompt = assemble_prompt(event_classify, {"persona": extool.persona}, daily_events=res2)
             b = llm_call(prompt)
             print(b)
             resx1 = self.generate_llm_instructions(a)
@@ -1681,13 +1570,13 @@ class CommunicationOperationGenerator:
 
 请基于{{操作指令}}：{instructions}、{{联系人列表}}：{contacts}、{{当日事件}}：{daily_events}生成具体通信操作。
 '''
-            prompt = template.format(daily_events=res1, contacts=contact, instructions=resx1)
+            prompt = assemble_prompt(template, {"contacts": contact}, daily_events=res1, instructions=resx1)
             res = llm_call(prompt, extool.context)
             print(res)
             res = remove_json_wrapper(res, "array")
             data = json.loads(res)
             c += data
-            prompt = template.format(daily_events=res2, contacts=contact, instructions=resx2)
+            prompt = assemble_prompt(template, {"contacts": contact}, daily_events=res2, instructions=resx2)
             res = llm_call(prompt, extool.context)
             print(res)
             res = remove_json_wrapper(res, "array")
@@ -1921,7 +1810,7 @@ class NoteCalendarOperationGenerator:
 ### 六、个人画像
 {persona}
 '''
-            prompt = template.format(instruct=instruction,event=res,persona=extool.persona)
+            prompt = assemble_prompt(template, {"persona": extool.persona}, instruct=instruction, event=res)
             res = llm_call(prompt)
             print(res)
             res = remove_json_wrapper(res,"array")
@@ -2043,7 +1932,7 @@ class GalleryOperationGenerator:
 
 请基于<当日事件>：{daily_events}、<个人画像>：{persona}，严格按上述要求逐事件输出概率建模结果。
         '''
-        prompt = template.format(daily_events = res, persona = extool.persona)
+        prompt = assemble_prompt(template, {"persona": extool.persona}, daily_events=res)
         print(prompt)
         a = llm_call(prompt)
         print(a)
@@ -2188,7 +2077,7 @@ class GalleryOperationGenerator:
 
 请基于<事件生成指令>：{instruct}、<当日事件>：{event}、<个人画像>：{persona}严格按上述要求生成图片数据。
     '''
-        prompt = template.format(instruct=instruction, event=res, persona=extool.persona)
+        prompt = assemble_prompt(template, {"persona": extool.persona}, instruct=instruction, event=res)
         res = llm_call(prompt)
         print(res)
         res = remove_json_wrapper(res, "array")
@@ -2870,7 +2759,7 @@ class FitnessHealthOperationGenerator:
         '''
         
         # 格式化prompt
-        prompt = template.format(daily_events=daily_events, persona=extool.persona, status=status)
+        prompt = assemble_prompt(template, {"persona": extool.persona}, daily_events=daily_events, status=status)
         print("运动健康数据生成prompt:", prompt)
         
         # 调用LLM生成数据
@@ -2988,7 +2877,7 @@ class ChatOperationGenerator:
         '''
         
         # 格式化概率分析prompt
-        prob_prompt = prob_template.format(daily_events=daily_events, persona=extool.persona)
+        prob_prompt = assemble_prompt(prob_template, {"persona": extool.persona}, daily_events=daily_events)
         print("对话需求概率分析prompt:", prob_prompt)
         
         # 调用LLM分析概率
@@ -3222,7 +3111,7 @@ class PushOperationGenerator:
 
 请基于<当日事件>：{daily_events}、<个人画像>：{persona}、<短信数据>：{sms_data}，严格按上述要求逐事件输出概率建模结果。
             '''
-        prompt = template.format(daily_events=res, persona=extool.persona,sms_data = "")
+        prompt = assemble_prompt(template, {"persona": extool.persona}, daily_events=res, sms_data="")
         print(prompt)
         a = llm_call(prompt)
         print(a)
@@ -3320,7 +3209,7 @@ class PushOperationGenerator:
 
 请基于<概率建模结果>：{instruct}、<当日事件>：{event}、<个人画像>：{persona}、<短信数据>：{sms_data}，严格按上述要求生成推送数据。
         '''
-        prompt = template.format(instruct=instruction, event=res, persona=extool.persona,sms_data = '')
+        prompt = assemble_prompt(template, {"persona": extool.persona}, instruct=instruction, event=res, sms_data='')
         res = llm_call(prompt)
         print(res)
         res = remove_json_wrapper(res,'array')
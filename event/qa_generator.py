@@ -24,23 +24,21 @@ class QAGenerator:
         # 获取phone_data_dir路径
         self.phone_data_dir = os.path.join(data_path, "phone_data")
         
-        # 初始化各个生成器
-        self.single_hop_generator = QASingleGenerator(phone_data_dir=self.phone_data_dir)
-        self.multi_hop_generator = QAMutiGenerator(phone_data_dir=self.phone_data_dir)
-        self.reasoning_generator = QAReasoningGenerator(phone_data_dir=self.phone_data_dir)
+        # 初始化各个生成器（数据统一由load_data_from_path加载）
+        self.single_hop_generator = QASingleGenerator()
+        self.multi_hop_generator = QAMutiGenerator()
+        self.reasoning_generator = QAReasoningGenerator()
         
         # 为每个生成器设置更新flag
         self.single_hop_generator._data_updated = False
         self.multi_hop_generator._data_updated = False
         self.reasoning_generator._data_updated = False
         
-        # 加载数据到各个生成器
+        # 只从磁盘加载一次，其余生成器共享同一份数据（原先每个生成器各加载两次）
         self.single_hop_generator.load_data_from_path(data_path)
-        self.multi_hop_generator.load_data_from_path(data_path)
-        self.reasoning_generator.load_data_from_path(data_path)
-        
-        # 初始同步一次所有数据
-        self._share_phone_data()
+        self._share_loaded_data(self.single_hop_generator, [self.multi_hop_generator, self.reasoning_generator])
+        # 推理生成器的事件树来自process/event_decompose_dfs.json，覆盖共享的event_tree.json
+        self.reasoning_generator.load_event_tree(data_path)
         
    
     
@@ -130,6 +128,27 @@ class QAGenerator:
             print(f"Themes文件不存在: {themes_file_path}")
             return []
     
+    def _share_loaded_data(self, source, targets):
+        """
+        将source已加载的用户数据共享给targets（只读数据共享引用，手机数据与id计数器按_share_phone_data的方式浅拷贝）
+        事件树：单跳与多跳生成器都来自event_tree.json，共享同一份；推理生成器使用process/event_decompose_dfs.json，
+        共享后由其load_event_tree重新加载
+
+        Args:
+            source: 已调用load_data_from_path的生成器
+            targets: 需要共享数据的生成器列表
+        """
+        for target in targets:
+            target.persona_data = source.persona_data
+            target.event_tree = source.event_tree
+            target.daily_event = source.daily_event
+            target.draft_event = source.draft_event
+            target.special_event = source.special_event
+            target.unique_events = source.unique_events
+            target.phone_data_dir = source.phone_data_dir
+            target.phonedata = source.phonedata.copy()
+            target.phone_id_counters = source.phone_id_counters.copy()
+
     def _share_phone_data(self):
         """
         根据更新flag判断哪个生成器的数据发生了变化，并将其数据同步到其他生成器
@@ -5,7 +5,8 @@ from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import threading
 
-from utils.llm_call import llm_call
+from utils.llm_call import llm_call, MAX_CONCURRENCY
+from utils.IO import load_json_records
 from event.template3 import (
     MULTI_HOP_FROM_EVENT_TREE_TEMPLATE, 
     MULTI_HOP_QUESTION_TEMPLATE,
@@ -230,8 +231,8 @@ class QAMutiGenerator:
                 data_type = filename[:-5]  # 移除.json扩展名作为数据类型
                 
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data_list = json.load(f)
+                    # 记录需全部保留（追加新操作后写回），不做投影/过滤
+                    data_list = load_json_records(file_path)
                     
                     # 为每条记录添加phone_id字段，并维护计数器
                     if isinstance(data_list, list):
@@ -712,7 +713,7 @@ class QAMutiGenerator:
         start_time = time.time()
         
         # 使用ThreadPoolExecutor并行生成每个月的问题
-        with concurrent.futures.ThreadPoolExecutor(max_workers=24) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
             # 提交所有月份的任务
             future_to_month = {
                 executor.submit(self.generate_pattern_recognition_and_habit_analysis_questions, month, num_questions_per_month): month
@@ -793,7 +794,7 @@ class QAMutiGenerator:
         start_time = time.time()
         
         # 使用ThreadPoolExecutor并行生成每个月的问题
-        with concurrent.futures.ThreadPoolExecutor(max_workers=24) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
             # 提交所有月份的任务
             future_to_month = {
                 executor.submit(self.generate_multi_hop_questions_from_draft, month, num_questions_per_month): month
@@ -1598,8 +1599,7 @@ class QAMutiGenerator:
         # 加载每日事件数据
         daily_event_path = os.path.join(data_path, "daily_event.json")
         if os.path.exists(daily_event_path):
-            with open(daily_event_path, 'r', encoding='utf-8') as f:
-                self.daily_event = json.load(f)
+            self.daily_event = load_json_records(daily_event_path)
         
         # 加载草稿事件数据
         draft_event_path = os.path.join(data_path, "daily_draft.json")
@@ -5,6 +5,8 @@ from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 
 from event.mind import llm_call
+from utils.llm_call import MAX_CONCURRENCY
+from utils.IO import load_json_records
 from event.template3 import (
     PATTERN_RECOGNITION_TEMPLATE,
     CAUSAL_REASONING_TEMPLATE,
@@ -61,16 +63,12 @@ class QAReasoningGenerator:
                 self.persona_data = json.load(f)
         
         # 加载事件树数据
-        event_tree_path = os.path.join(data_path, "process/event_decompose_dfs.json")
-        if os.path.exists(event_tree_path):
-            with open(event_tree_path, 'r', encoding='utf-8') as f:
-                self.event_tree = json.load(f)
+        self.load_event_tree(data_path)
         
         # 加载每日事件数据
         daily_event_path = os.path.join(data_path, "daily_event.json")
         if os.path.exists(daily_event_path):
-            with open(daily_event_path, 'r', encoding='utf-8') as f:
-                self.daily_event = json.load(f)
+            self.daily_event = load_json_records(daily_event_path)
         
         # 加载草稿事件数据
         draft_event_path = os.path.join(data_path, "daily_draft.json")
@@ -91,6 +89,18 @@ class QAReasoningGenerator:
         if os.path.exists(phone_data_path):
             self.load_phone_data_from_dir(phone_data_path)
     
+    def load_event_tree(self, data_path: str):
+        """
+        加载推理生成器使用的事件树（process/event_decompose_dfs.json，与单跳/多跳生成器的event_tree.json不同）
+        
+        Args:
+            data_path: 数据文件路径
+        """
+        event_tree_path = os.path.join(data_path, "process/event_decompose_dfs.json")
+        if os.path.exists(event_tree_path):
+            with open(event_tree_path, 'r', encoding='utf-8') as f:
+                self.event_tree = json.load(f)
+    
     def generate_reasoning_questions_by_themes(self, themes: List[Dict[str, Any]], num_questions_per_theme: int = 2) -> List[Dict[str, Any]]:
         """
         根据输入的theme数组生成推理问题，输出只保留问题列表，不包含主题信息
@@ -133,7 +143,7 @@ class QAReasoningGenerator:
         # 使用线程池并行处理所有主题
         all_questions = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=24) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
             # 提交所有主题的处理任务
             future_to_theme = {executor.submit(generate_questions_for_theme, theme): theme for theme in themes}
             
@@ -197,7 +207,7 @@ class QAReasoningGenerator:
         # 使用线程池并行处理所有事件ID组
         all_questions = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=24) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
             # 提交所有事件ID组的处理任务
             future_to_group = {executor.submit(generate_questions_for_group, event_ids): event_ids for event_ids in event_id_groups}
             
@@ -1071,8 +1081,8 @@ class QAReasoningGenerator:
                 data_type = filename[:-5]  # 移除.json扩展名作为数据类型
                 
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data_list = json.load(f)
+                    # 记录需全部保留（追加新操作后写回），不做投影/过滤
+                    data_list = load_json_records(file_path)
                     
                     # 为每条记录添加phone_id字段，并维护计数器
                     if isinstance(data_list, list):
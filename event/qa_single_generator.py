@@ -10,6 +10,7 @@ import random
 from typing import Dict, List, Any
 from event.template3 import PERSONA_QUESTION_TEMPLATE, EVENT_QUESTION_TEMPLATE, PHONE_OPERATIONS_REGENERATION_TEMPLATE, EVENT_INFERENCE_JUDGMENT_TEMPLATE, QUESTION_SCREENING_OPTIMIZATION_TEMPLATE, USER_SUMMARY_TOPICS_TEMPLATE, PERSONA_BASED_SMS_QUESTION_TEMPLATE
 from utils.llm_call import llm_call
+from utils.IO import load_json_records
 
 
 class QASingleGenerator:
@@ -70,8 +71,7 @@ class QASingleGenerator:
         # 加载每日事件数据
         daily_event_path = os.path.join(data_path, "daily_event.json")
         if os.path.exists(daily_event_path):
-            with open(daily_event_path, 'r', encoding='utf-8') as f:
-                self.daily_event = json.load(f)
+            self.daily_event = load_json_records(daily_event_path)
         
         # 加载草稿事件数据
         draft_event_path = os.path.join(data_path, "daily_draft.json")
@@ -499,8 +499,8 @@ class QASingleGenerator:
                 data_type = filename[:-5]  # 移除.json扩展名作为数据类型
                 
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data_list = json.load(f)
+                    # 记录需全部保留（追加新操作后写回），不做投影/过滤
+                    data_list = load_json_records(file_path)
                     
                     # 为每条记录添加phone_id字段，并维护计数器
                     if isinstance(data_list, list):
@@ -9,6 +9,7 @@ from concurrent.futures import ProcessPoolExecutor, as_completed, ThreadPoolExec
 from utils.IO import *
 from datetime import datetime, timedelta
 from utils.llm_call import *
+from utils.llm_cache import llm_cache_disabled
 from event.templates import *
 from event.template_s import *
 import re
@@ -5081,17 +5082,23 @@ class Scheduler:
         # 计算合适的线程数，最多24个线程
         max_workers = self.max_workers  # 最多24个线程，或等于月份数（如果月份数更少）
         
-        def execute_parallel_months(months_to_process):
-            """并行执行指定月份的处理"""
+        def execute_parallel_months(months_to_process, bypass_cache=False):
+            """并行执行指定月份的处理（重试时跳过LLM响应缓存，避免再次拿到同一份失败结果）"""
             temp_results = {}
             all_event_updates = []  # 收集所有线程的事件更新操作
+
+            def run_month(month, analysis_results):
+                if bypass_cache:
+                    with llm_cache_disabled():
+                        return process_monthly_refine(month, analysis_results, refined_timeline, persona)
+                return process_monthly_refine(month, analysis_results, refined_timeline, persona)
             
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
                 # 提交任务
                 futures = []
                 for month in months_to_process:
                     analysis_results = monthly_analysis_results[month]
-                    future = executor.submit(process_monthly_refine, month, analysis_results, refined_timeline, persona)
+                    future = executor.submit(run_month, month, analysis_results)
                     futures.append(future)
                 
                 # 收集结果
@@ -5121,7 +5128,7 @@ class Scheduler:
             print("正在重新并行处理这些月份...")
             
             # 第二次执行：仅处理失败的月份
-            retry_results, retry_event_updates = execute_parallel_months(failed_months)
+            retry_results, retry_event_updates = execute_parallel_months(failed_months, bypass_cache=True)
             
             # 合并重试结果
             all_refine_results.update(retry_results)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+事件时间轴索引
+
+事件的date字段（单个时间、"至"连接的时间区间、带中文时段或短年份的时间）在建索引时只解析一次，
+转换为按天计的序数区间 [开始, 结束] 并按开始日排序，之后的查询只做二分：
+- starting_between(a, b)：开始日在 [a, b] 内的事件，O(log n + k)
+- active_on(d)：区间覆盖d的事件，O(log n + k + w)，w为开始日落在 [d - 最长跨度, d] 内的条目数
+
+索引不复制事件，查询结果按事件在原列表中的顺序返回（同一事件只返回一次），建好后只读，可在线程间共享。
+
+extract_bottom_level_events 是Mind和Data_extract共用的最底层事件抽取（时间轴索引建立在其结果上）。
+
+DailyRecordIndex 把按月组织的每日草稿（daily_draft）或每日状态列表（daily_state）按日期建成字典，
+逐日查询由线性扫描变为O(1)。
+"""
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date as Date, datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+_DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",  # 带秒级时间的格式（如"2025-01-01 07:30:00"）
+    "%Y-%m-%d",           # 纯日期格式（如"2025-01-01"）
+    "%Y-%m-%d %H:%M",     # 带分钟级时间的格式（如"2025-01-01 07:30"）
+    "%Y-%m-%d %H"         # 带小时级时间的格式（如"2025-01-01 07"）
+]
+
+
+def parse_time_point(text: str) -> Optional[Date]:
+    """
+    解析单个时间点，返回其日期
+
+    兼容"2025-01-01 07:30:00"、"2025-01-01"、"2025-01-01 上午"（去除中文等无关字符）
+    以及短年份"5-03-23"（补全为"2025-03-23"）
+
+    参数:
+        text: 时间字符串
+
+    返回:
+        Optional[Date]: 日期，无法解析时返回None
+    """
+    # 只保留数字、字母、空格和日期分隔符（- : .），并合并多余空格
+    text = " ".join(re.sub(r'[^0-9a-zA-Z\s\-:\.]', '', text).split())
+    if not text:
+        return None
+    date_part, _, time_part = text.partition(" ")
+    parts = date_part.split("-")
+    if len(parts) == 3 and all(len(p) <= 2 for p in parts):
+        year = parts[0].zfill(2)
+        date_part = f"20{year}-{parts[1].zfill(2)}-{parts[2].zfill(2)}"
+        text = f"{date_part} {time_part}" if time_part else date_part
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_date_interval(date_str: str) -> Optional[Tuple[int, int]]:
+    """
+    解析事件的date字符串为按天计的序数区间
+
+    参数:
+        date_str: 单个时间或"开始至结束"的时间区间
+
+    返回:
+        Optional[Tuple[int, int]]: (开始日序数, 结束日序数)，开始时间无法解析时返回None；
+        结束时间缺失、无法解析或早于开始时间时按开始日处理
+    """
+    start_str, sep, end_str = date_str.partition("至")
+    start = parse_time_point(start_str)
+    if start is None:
+        return None
+    end = parse_time_point(end_str) if sep else None
+    if end is None or end < start:
+        end = start
+    return start.toordinal(), end.toordinal()
+
+
+def date_to_ordinal(date_str: str) -> int:
+    """
+    将查询日期转换为序数（含"至"时取左侧）
+
+    参数:
+        date_str: 日期字符串（格式：YYYY-MM-DD）
+
+    返回:
+        int: 日期序数
+
+    异常:
+        ValueError: 日期格式错误
+    """
+    if "至" in date_str:
+        date_str = date_str.split("至")[0].strip()
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date().toordinal()
+    except ValueError:
+        raise ValueError(f"目标日期格式错误：{date_str}，需符合YYYY-MM-DD")
+
+
+def extract_bottom_level_events(events: List[Dict]) -> List[Dict]:
+    """
+    递归提取最底层事件（subevent为空），按事件树的先序顺序返回
+
+    参数:
+        events: 事件树
+
+    返回:
+        List[Dict]: 最底层事件列表（原事件对象，不复制）
+    """
+    result = []
+    for event in events:
+        subevents = event.get("subevent", [])
+        if not subevents:
+            result.append(event)
+        else:
+            result.extend(extract_bottom_level_events(subevents))
+    return result
+
+
+class TimelineIndex:
+    """
+    事件时间轴索引
+
+    参数:
+        events: 事件列表（通常是最底层事件），每个事件的date为字符串或字符串列表
+        default_date: date无法解析时使用的日期（格式：YYYY-MM-DD）
+        strict: default_date为None时，True表示遇到无法解析的date抛出ValueError，False表示忽略该时间项
+    """
+
+    def __init__(self, events: List[Dict], default_date: Optional[str] = None, strict: bool = True):
+        self.events = events
+        entries = []
+        for position, event in enumerate(events):
+            date_values = event.get("date", [])
+            if not isinstance(date_values, list):
+                date_values = [date_values]  # 若为单个字符串，转为单元素列表
+            for date_str in date_values:
+                interval = parse_date_interval(date_str) if isinstance(date_str, str) else None
+                if interval is None:
+                    if default_date is None:
+                        if strict:
+                            raise ValueError(f"事件日期格式错误：{date_str}")
+                        continue
+                    ordinal = date_to_ordinal(default_date)
+                    interval = (ordinal, ordinal)
+                entries.append((interval[0], interval[1], position))
+        entries.sort()
+        self._starts = [entry[0] for entry in entries]
+        self._ends = [entry[1] for entry in entries]
+        self._positions = [entry[2] for entry in entries]
+        self._max_span = max((end - start for start, end, _ in entries), default=0)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def _collect(self, positions) -> List[Dict]:
+        """按原列表顺序返回事件（去重）"""
+        return [self.events[position] for position in sorted(set(positions))]
+
+    def starting_between(self, start_date: str, end_date: str) -> List[Dict]:
+        """
+        筛选开始日在 [start_date, end_date] 内的事件
+
+        参数:
+            start_date: 开始日期（格式：YYYY-MM-DD）
+            end_date: 结束日期（格式：YYYY-MM-DD）
+
+        返回:
+            List[Dict]: 匹配的事件列表
+        """
+        lo = bisect_left(self._starts, date_to_ordinal(start_date))
+        hi = bisect_right(self._starts, date_to_ordinal(end_date))
+        return self._collect(self._positions[lo:hi])
+
+    def starting_on(self, target_date: str) -> List[Dict]:
+        """筛选开始日为target_date的事件"""
+        return self.starting_between(target_date, target_date)
+
+    def active_on(self, target_date: str) -> List[Dict]:
+        """
+        筛选时间区间覆盖target_date的事件
+
+        参数:
+            target_date: 目标日期（格式：YYYY-MM-DD）
+
+        返回:
+            List[Dict]: 匹配的事件列表
+        """
+        day = date_to_ordinal(target_date)
+        lo = bisect_left(self._starts, day - self._max_span)
+        hi = bisect_right(self._starts, day)
+        return self._collect(self._positions[i] for i in range(lo, hi) if self._ends[i] >= day)
+
+
+class DailyRecordIndex:
+    """
+    每日记录的日期索引
+
+    参数:
+        records: 按月组织的每日草稿 {"YYYY-MM": [{"date": "YYYY-MM-DD", ...}, ...]}，
+                 或每日记录列表 [{"date": "YYYY-MM-DD", ...}, ...]
+
+    按月组织时只在日期所属月份的列表中查找；同一日期有多条记录时取第一条（与逐条扫描一致）。
+    返回的是原记录对象本身，不做复制。
+    """
+
+    def __init__(self, records: Union[Dict[str, List[Dict]], List[Dict], None]):
+        self.source = records
+        self.by_date: Dict[str, Dict] = {}
+        if isinstance(records, dict):
+            for year_month, month_data in records.items():
+                if isinstance(month_data, list):
+                    self._add(month_data, year_month)
+        elif isinstance(records, list):
+            self._add(records)
+
+    def _add(self, items: List[Dict], year_month: Optional[str] = None) -> None:
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            date = item.get("date")
+            if not isinstance(date, str) or (year_month is not None and "-".join(date.split("-")[:2]) != year_month):
+                continue
+            self.by_date.setdefault(date, item)
+
+    def get(self, date: str, default=None):
+        """返回指定日期的记录，不存在时返回default"""
+        return self.by_date.get(date, default)
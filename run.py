@@ -4,6 +4,9 @@ import time
 import argparse
 import subprocess
 import json
+import atexit
+
+from utils.llm_metrics import metrics_path_from_config, print_llm_metrics_summary
 
 def merge_qa_files(base_path):
     """
@@ -332,6 +335,9 @@ if __name__ == '__main__':
     
     # 解析命令行参数
     args = parse_args()
+
+    # 退出时汇总本次运行（含各子进程）的LLM调用指标
+    atexit.register(print_llm_metrics_summary, metrics_path_from_config(), since=time.time())
     
     # 检查对应文件夹中是否存在daily_draft.json文件
     daily_draft_path = os.path.join(args.base_path, 'daily_draft.json')
@@ -5,6 +5,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from event.phone_data_gen import *
 from event.phone_data_gen import PhoneEventMatcher
+from utils.IO import atomic_write_json, load_json, loads_json
 
 
 def run_communication_task(date, contact, file_path, initial_data):
@@ -199,8 +200,7 @@ def process_phone_data(file_path):
         file_path_old = os.path.join(phone_data_dir, filename)
 
         # 读取原始数据
-        with open(file_path_old, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_json(file_path_old)
 
         # 特殊处理event_perception.json文件
         if filename == "event_perception.json":
@@ -215,8 +215,7 @@ def process_phone_data(file_path):
             # 保存为新文件perception.json
             new_filename = "perception.json"
             new_file_path = os.path.join(phone_data_dir, new_filename)
-            with open(new_file_path, 'w', encoding='utf-8') as f:
-                json.dump(sorted_data, f, ensure_ascii=False, indent=2)
+            atomic_write_json(new_file_path, sorted_data)
 
             print(f"✅ 生成新文件：{new_filename}，共 {len(sorted_data)} 条记录")
         else:
@@ -259,8 +258,7 @@ def process_phone_data(file_path):
                 # 保存新文件
                 new_filename = f"{data_type}.json"
                 new_file_path = os.path.join(phone_data_dir, new_filename)
-                with open(new_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(sorted_data, f, ensure_ascii=False, indent=2)
+                atomic_write_json(new_file_path, sorted_data)
 
                 print(f"✅ 生成新文件：{new_filename}，共 {len(sorted_data)} 条记录")
 
@@ -355,7 +353,7 @@ def parallel_process_dates(start_time, end_time, contact, file_path, initial_a,
                 with open(file_path, "r", encoding="utf-8") as f:
                     file_content = f.read().strip()
                     if file_content:
-                        existing_data = json.loads(file_content)
+                        existing_data = loads_json(file_content)
                     else:
                         existing_data = []
 
@@ -368,16 +366,14 @@ def parallel_process_dates(start_time, end_time, contact, file_path, initial_a,
                 merged_data = data
 
             # 写入合并后的数据
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(merged_data, f, ensure_ascii=False, indent=2)
+            atomic_write_json(file_path, merged_data)
 
             print(f"✅ 数据成功写入文件：{filename}")
             print(f"   共写入 {len(merged_data)} 条数据")
         except json.JSONDecodeError as e:
             print(f"❌ 文件 {filename} JSON格式错误，将覆盖原有文件：{str(e)}")
             # 如果JSON格式错误，使用新数据覆盖
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            atomic_write_json(file_path, data)
         except Exception as e:
             print(f"❌ 写入文件 {filename} 时出错：{str(e)}")
 
@@ -462,7 +458,7 @@ def parallel_process_perception_only(start_time, end_time, contact, file_path, i
             with open(perception_file_path, "r", encoding="utf-8") as f:
                 file_content = f.read().strip()
                 if file_content:
-                    existing_data = json.loads(file_content)
+                    existing_data = loads_json(file_content)
                 else:
                     existing_data = []
 
@@ -475,16 +471,14 @@ def parallel_process_perception_only(start_time, end_time, contact, file_path, i
             merged_data = all_perception_data
 
         # 写入合并后的数据
-        with open(perception_file_path, "w", encoding="utf-8") as f:
-            json.dump(merged_data, f, ensure_ascii=False, indent=2)
+        atomic_write_json(perception_file_path, merged_data)
 
         print(f"✅ 感知数据成功写入文件：{perception_file_path}")
         print(f"   共写入 {len(merged_data)} 条数据")
     except json.JSONDecodeError as e:
         print(f"❌ JSON格式错误，将覆盖原有文件：{str(e)}")
         # 如果JSON格式错误，使用新数据覆盖
-        with open(perception_file_path, "w", encoding="utf-8") as f:
-            json.dump(all_perception_data, f, ensure_ascii=False, indent=2)
+        atomic_write_json(perception_file_path, all_perception_data)
     except Exception as e:
         print(f"❌ 写入感知数据文件时出错：{str(e)}")
 
@@ -532,8 +526,7 @@ if __name__ == "__main__":
         # 创建phone_data文件夹（如果不存在）
         phone_data_dir = os.path.join(file_path, "phone_data")
         os.makedirs(phone_data_dir, exist_ok=True)
-        with open(os.path.join(phone_data_dir, "contact.json"), "w", encoding="utf-8") as f:
-            json.dump(contact, f, ensure_ascii=False, indent=2)
+        atomic_write_json(os.path.join(phone_data_dir, "contact.json"), contact)
 
     a = []
     b = []
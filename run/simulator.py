@@ -38,8 +38,8 @@ format_events = args.format_events  # 是否格式化事件
 max_workers = args.max_workers  # 最大并行线程数
 interval_days = args.interval_days  # 每个线程处理的天数
 
-# 中断保存文件路径
-INTERRUPT_FILE = file_path + "process/interrupt_state.json"
+# 逐日完成日志（断点续跑）：已完成的日期重新运行时跳过，只重试失败或未完成的日期
+INTERRUPT_FILE = file_path + "process/day_checkpoint.jsonl"
 
 
 # 日志函数
@@ -90,8 +90,7 @@ if generate_data:
                     # 添加到事件数组
                     events_array.append(event_info)
         # 将事件数组写入输出JSON文件
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(events_array, f, ensure_ascii=False, indent=2)
+        atomic_write_json(output_file, events_array)
 
         print(f"转换完成！共转换了 {len(events_array)} 个事件。")
         print(f"结果已保存到：{output_file}")
@@ -126,7 +125,8 @@ if generate_data:
         event_file=adjusted_events_path,
         daily_state_file=file_path + 'daily_draft.json',
         instance_id=args.instance_id,
-        loc_data=file_path + 'location.json'
+        loc_data=file_path + 'location.json',
+        checkpoint_file=INTERRUPT_FILE
     )
 
     # 3.2 执行多线程并行处理
@@ -152,6 +152,7 @@ if generate_data:
     failed_dates = [result[0] for result in results if not result[1]]
     if failed_dates:
         log(f"\n失败的日期: {', '.join(failed_dates)}")
+        log(f"重新运行将跳过已完成的日期，只重试失败或未完成的日期（完成日志：{INTERRUPT_FILE}）")
 
     end_time_generate = time.time()
     execution_times['data_generate'] = end_time_generate - start_time_generate
@@ -6,6 +6,8 @@ import json
 import pypinyin
 import shutil
 import argparse
+
+from utils.llm_metrics import metrics_path_from_config, print_llm_metrics_summary
 # 获取项目根目录并加入 sys.path
 sys.path.append('D:\pyCharmProjects\pythonProject4')
 
@@ -239,6 +241,9 @@ def main():
     else:
         print(f"❌ 部分人物处理失败!")
     print(f"{'='*80}")
+
+    # 汇总整个批次的LLM调用指标（按调用点统计耗时、token和费用）
+    print_llm_metrics_summary(metrics_path_from_config(), since=total_start_time)
     
     return 0 if success_count == len(personas) else 1
 
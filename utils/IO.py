@@ -1,4 +1,270 @@
+import gzip
 import json
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时回退到标准库json
+    orjson = None
+
+_GZIP_MAGIC = b"\x1f\x8b"
+# 临时文件默认权限为0600，rename前按当前umask恢复为普通文件权限
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def dumps_json(data, compact=False):
+    """
+    将数据序列化为UTF-8编码的JSON字节串（优先使用orjson）
+
+    参数:
+        data: 要序列化的数据
+        compact (bool): True时输出紧凑格式（用于中间产物），False时缩进2格
+
+    返回:
+        bytes: JSON字节串（保留中文字符）
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, option=option)
+        except TypeError:
+            # orjson不支持的类型（如超过64位的整数）交给标准库处理
+            pass
+    if compact:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+    return text.encode("utf-8")
+
+
+def loads_json(raw):
+    """
+    解析JSON字节串或字符串（优先使用orjson）
+
+    参数:
+        raw (bytes/str): JSON内容
+
+    返回:
+        dict/list: 解析后的数据
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    return json.loads(raw)
+
+
+def load_json(file_path):
+    """
+    读取JSON文件（自动识别gzip压缩），出错时直接抛出异常
+
+    参数:
+        file_path (str): JSON文件的路径
+
+    返回:
+        dict/list: 解析后的JSON数据
+    """
+    with open(file_path, 'rb') as file:
+        raw = file.read()
+    if raw[:2] == _GZIP_MAGIC:
+        raw = gzip.decompress(raw)
+    return loads_json(raw)
+
+
+def _open_text(file_path):
+    """以文本方式打开文件，自动识别gzip压缩"""
+    with open(file_path, 'rb') as file:
+        magic = file.read(2)
+    if magic == _GZIP_MAGIC:
+        return gzip.open(file_path, 'rt', encoding='utf-8')
+    return open(file_path, 'r', encoding='utf-8')
+
+
+def iter_json_array(file_path, fields=None, where=None, chunk_size=1 << 20):
+    """
+    流式读取顶层为数组的JSON文件，逐条产出记录，不把整个文件读入内存
+
+    参数:
+        file_path (str): JSON文件的路径（支持gzip压缩）
+        fields (list): 字段投影，只保留这些字段（记录为dict时生效），None表示保留全部
+        where (callable): 过滤函数，接收完整记录，返回True时产出（在投影之前执行）
+        chunk_size (int): 每次读取的字符数
+
+    返回:
+        generator: 逐条产出的记录
+
+    用法:
+        for op in iter_json_array(path, fields=["datetime", "event_id"],
+                                  where=lambda r: r.get("datetime", "").startswith("2025-03")):
+            ...
+    """
+    decoder = json.JSONDecoder()
+    fields = list(fields) if fields is not None else None
+    with _open_text(file_path) as file:
+        buffer = file.read(chunk_size)
+        eof = len(buffer) < chunk_size
+        pos = 0
+
+        def skip(chars):
+            nonlocal pos
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+
+        skip(" \t\r\n﻿")
+        if pos >= len(buffer):
+            return
+        if buffer[pos] != '[':
+            raise json.JSONDecodeError("顶层不是JSON数组", buffer, pos)
+        pos += 1
+
+        while True:
+            skip(" \t\r\n,")
+            # 缓冲区耗尽或可能截断在记录中间时补充读取
+            while pos >= len(buffer) and not eof:
+                buffer = buffer[pos:] + file.read(chunk_size)
+                pos = 0
+                eof = len(buffer) < chunk_size
+                skip(" \t\r\n,")
+            if pos >= len(buffer):
+                raise json.JSONDecodeError("JSON数组未闭合", buffer, pos)
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                # 记录恰好结束在缓冲区末尾时（如数字被截断）需要读到分隔符后再确认
+                if end >= len(buffer) and not eof:
+                    raise ValueError
+            except ValueError:
+                if eof:
+                    raise
+                more = file.read(chunk_size)
+                eof = len(more) < chunk_size
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            pos = end
+            if where is not None and not where(record):
+                continue
+            if fields is not None and isinstance(record, dict):
+                record = {key: record[key] for key in fields if key in record}
+            yield record
+            # 丢弃已解析的部分，保持缓冲区大小有界
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def load_json_records(file_path, fields=None, where=None):
+    """
+    读取JSON文件：顶层为数组时流式解析（可投影/过滤，只物化需要的记录），否则整体读取。出错时直接抛出异常
+
+    参数:
+        file_path (str): JSON文件的路径
+        fields (list): 字段投影，仅对数组中的dict记录生效
+        where (callable): 记录过滤函数，仅对数组生效
+
+    返回:
+        list/dict: 记录列表，或顶层不是数组时的原始数据
+    """
+    with _open_text(file_path) as file:
+        head = file.read(64).lstrip(" \t\r\n﻿")
+    if head.startswith('['):
+        return list(iter_json_array(file_path, fields=fields, where=where))
+    return load_json(file_path)
+
+
+def atomic_write_json(file_path, data, compact=False, compress=None, fsync=False):
+    """
+    原子地写入JSON文件：先写同目录下的临时文件，再rename覆盖目标文件，
+    进程崩溃时目标文件要么是旧内容要么是完整的新内容，不会出现写了一半的文件。出错时直接抛出异常
+
+    参数:
+        file_path (str): JSON文件的路径
+        data (dict/list): 要写入的数据
+        compact (bool): 是否使用紧凑格式（中间产物使用，体积更小、序列化更快）
+        compress (bool): 是否gzip压缩，默认按文件扩展名（.gz）判断
+        fsync (bool): rename前是否fsync，需要抵御断电时开启
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if compress is None:
+        compress = file_path.endswith(".gz")
+
+    payload = dumps_json(data, compact=compact)
+    if compress:
+        payload = gzip.compress(payload, compresslevel=6)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(file_path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(payload)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def append_jsonl(file_path, records, fsync=False):
+    """
+    向JSONL文件追加记录（每条记录一行，紧凑格式）。出错时直接抛出异常
+
+    参数:
+        file_path (str): JSONL文件的路径
+        records (list): 要追加的记录
+        fsync (bool): 写入后是否fsync，需要抵御断电时开启
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    payload = b"".join(dumps_json(record, compact=True) + b"\n" for record in records)
+    with open(file_path, 'ab+') as file:
+        # 上次写入中断留下的半行单独成行，避免与新记录粘连
+        if file.tell() > 0:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                payload = b"\n" + payload
+        file.write(payload)
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def read_jsonl(file_path):
+    """
+    按顺序读取JSONL文件中的全部记录。写入中断留下的半行（末尾无换行符或无法解析的行）被跳过
+
+    参数:
+        file_path (str): JSONL文件的路径
+
+    返回:
+        list: 记录列表，文件不存在时返回空列表
+    """
+    if not os.path.exists(file_path):
+        return []
+    records = []
+    with open(file_path, 'rb') as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            if not line.strip():
+                continue
+            try:
+                records.append(loads_json(line))
+            except ValueError:
+                continue
+    return records
 
 
 def read_json_file(file_path):
@@ -12,15 +278,11 @@ def read_json_file(file_path):
         dict/list: 解析后的JSON数据，如果出错则返回None
     """
     try:
-        # 打开并读取JSON文件
-        with open(file_path, 'r', encoding='utf-8') as file:
-            # 解析JSON数据
-            json_data = json.load(file)
-            return json_data
+        return load_json(file_path)
 
     except FileNotFoundError:
         print(f"错误: 文件 '{file_path}' 不存在")
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, UnicodeDecodeError, gzip.BadGzipFile):
         print(f"错误: 文件 '{file_path}' 不是有效的JSON格式")
     except Exception as e:
         print(f"读取文件时发生错误: {str(e)}")
@@ -28,28 +290,21 @@ def read_json_file(file_path):
     return None
 
 
-def write_json_file(file_path, data):
+def write_json_file(file_path, data, compact=False, compress=None):
     """
-    将数据写入JSON文件
+    将数据原子地写入JSON文件
 
     参数:
         file_path (str): JSON文件的路径
         data (dict/list): 要写入的数据
+        compact (bool): 是否使用紧凑格式
+        compress (bool): 是否gzip压缩，默认按文件扩展名（.gz）判断
 
     返回:
         bool: 如果写入成功则返回True，否则返回False
     """
     try:
-        # 创建文件所在目录（如果不存在）
-        import os
-        directory = os.path.dirname(file_path)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory, exist_ok=True)
-            
-        # 打开并写入JSON文件
-        with open(file_path, 'w', encoding='utf-8') as file:
-            # 将数据写入文件，使用indent=2增加可读性，ensure_ascii=False保留中文字符
-            json.dump(data, file, ensure_ascii=False, indent=2)
+        atomic_write_json(file_path, data, compact=compact, compress=compress)
         return True
 
     except PermissionError:
@@ -57,4 +312,4 @@ def write_json_file(file_path, data):
     except Exception as e:
         print(f"写入文件时发生错误: {str(e)}")
 
-    return False
\ No newline at end of file
+    return False
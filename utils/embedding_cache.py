@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+文本嵌入的持久化缓存（跨运行、跨模块、跨进程共享）
+
+缓存键为 (模型标识, 规范化文本) 的SHA-256。向量存放在内存映射的原始float32文件中，随条目增加按倍数扩容
+（原地延长文件，其他进程发现容量变大时重新映射），最多max_entries条；
+SQLite索引记录 键 -> 槽位 与最近访问时间，meta表记录维度、已分配容量和条目上限；
+写满后按最近访问时间淘汰一批最旧的条目，腾出的槽位复用。
+
+每个槽位另有一个64位标签（取自键的哈希），读取时校验标签，
+避免读到被其他进程淘汰并覆盖的槽位。
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+LAYOUT_VERSION = 2  # 1：按max_entries一次性创建的.npy文件；2：按需扩容的原始内存映射文件
+INITIAL_CAPACITY = 1024  # 向量文件首次创建时的容量（条）
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：NFKC、去除首尾空白、连续空白合并为一个空格"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    """
+    内存映射向量文件 + SQLite索引 的嵌入缓存（线程安全，多进程可共享同一目录）
+
+    参数:
+        directory: 缓存目录
+        model_id: 模型标识（不同模型/后端的向量互不混用）
+        max_entries: 缓存容量上限（条），向量文件随条目增加扩容到此上限
+        evict_fraction: 写满时一次淘汰的比例，避免每次写入都触发淘汰
+    """
+
+    def __init__(self, directory: str, model_id: str, max_entries: int = 200000, evict_fraction: float = 0.05):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.evict_batch = max(1, int(max_entries * evict_fraction))
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^\w.-]+", "_", model_id)
+        self.index_path = os.path.join(directory, f"{slug}.sqlite")
+        self.vectors_path = os.path.join(directory, f"{slug}.vectors.f32")
+        self.tags_path = os.path.join(directory, f"{slug}.tags.i64")
+        self._legacy_paths = [os.path.join(directory, f"{slug}.vectors.npy"), os.path.join(directory, f"{slug}.tags.npy")]
+        self._vectors: Optional[np.memmap] = None
+        self._tags: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER, accessed REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._check_layout()
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._open_vectors()
+
+    def _key(self, text: str) -> tuple:
+        """返回(缓存键, 槽位标签)"""
+        digest = hashlib.sha256(f"{self.model_id}\0{normalize_text(text)}".encode("utf-8")).digest()
+        return digest.hex(), int.from_bytes(digest[:8], "little", signed=True) | 1
+
+    def _meta(self, name: str) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name=?", (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, **values) -> None:
+        self._conn.executemany("INSERT OR REPLACE INTO meta(name, value) VALUES (?, ?)", list(values.items()))
+
+    def _reset(self) -> None:
+        """在写事务内清空缓存（索引与向量文件）"""
+        self._conn.execute("DELETE FROM entries")
+        self._conn.execute("DELETE FROM free_slots")
+        self._conn.execute("DELETE FROM meta")
+        self._vectors = self._tags = None
+        for path in [self.vectors_path, self.tags_path] + self._legacy_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _check_layout(self) -> None:
+        """
+        在写事务内校验已保存的缓存布局：
+        - 旧版布局、或向量文件与meta记录的维度/容量不一致时重建缓存
+        - 条目上限与配置不同时采用配置值；上限调小时删除超出新上限的槽位中的条目
+        """
+        dim = self._meta("dim")
+        if dim is not None:
+            capacity = self._meta("capacity")
+            consistent = (self._meta("layout") == LAYOUT_VERSION and capacity is not None
+                          and os.path.exists(self.vectors_path) and os.path.exists(self.tags_path)
+                          and os.path.getsize(self.vectors_path) >= capacity * dim * 4
+                          and os.path.getsize(self.tags_path) >= capacity * 8)
+            if not consistent:
+                print(f"嵌入缓存 {self.index_path} 的布局与向量文件不一致或为旧版本，重建缓存")
+                self._reset()
+                dim = None
+        stored_max = self._meta("max_entries")
+        if dim is not None and stored_max is not None and self.max_entries < stored_max:
+            # 超出新上限的槽位不再使用（文件不缩小，避免其他进程的映射越界）
+            self._conn.execute("DELETE FROM entries WHERE slot >= ?", (self.max_entries,))
+            self._conn.execute("DELETE FROM free_slots WHERE slot >= ?", (self.max_entries,))
+            self._set_meta(next_slot=min(self._meta("next_slot"), self.max_entries))
+        if stored_max != self.max_entries:
+            self._set_meta(max_entries=self.max_entries)
+
+    @staticmethod
+    def _extend_file(path: str, size: int) -> None:
+        """把文件原地延长到size字节（新增部分为0），已有映射和inode不变"""
+        with open(path, "ab") as file:
+            if file.tell() < size:
+                file.truncate(size)
+
+    def _open_vectors(self) -> bool:
+        """映射向量文件（维度在第一次写入时确定）；其他进程扩容后按新容量重新映射"""
+        dim = self._meta("dim")
+        if dim is None:
+            return False
+        capacity = self._meta("capacity")
+        if self._vectors is None or self._vectors.shape != (capacity, dim):
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._tags.flush()
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+            self._tags = np.memmap(self.tags_path, dtype=np.int64, mode="r+", shape=(capacity,))
+        return True
+
+    def _create_vectors(self, dim: int) -> None:
+        """在写事务内创建向量文件（其他进程可能已先创建）"""
+        if self._meta("dim") is None:
+            capacity = min(self.max_entries, INITIAL_CAPACITY)
+            self._extend_file(self.vectors_path, capacity * dim * 4)
+            self._extend_file(self.tags_path, capacity * 8)
+            self._set_meta(layout=LAYOUT_VERSION, dim=dim, capacity=capacity, max_entries=self.max_entries, next_slot=0)
+        elif self._meta("dim") != dim:
+            raise ValueError(f"嵌入维度 {dim} 与缓存记录的维度 {self._meta('dim')} 不一致: {self.index_path}")
+        self._open_vectors()
+
+    def _grow(self, size: int) -> None:
+        """在写事务内把向量文件扩容到至少size条（按倍数增长，不超过max_entries）"""
+        capacity = self._meta("capacity")
+        if size <= capacity:
+            return
+        dim = self._meta("dim")
+        capacity = min(max(size, capacity * 2), max(self.max_entries, size))
+        self._extend_file(self.vectors_path, capacity * dim * 4)
+        self._extend_file(self.tags_path, capacity * 8)
+        self._set_meta(capacity=capacity)
+        self._open_vectors()
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        批量查询
+
+        返回:
+            Dict[int, np.ndarray]: {texts中的下标: 向量}，只包含命中的条目
+        """
+        found = {}
+        with self._lock:
+            if not texts or not self._open_vectors():
+                self.misses += len(texts)
+                return found
+            keys = [self._key(text) for text in texts]
+            slots = {}
+            unique = list({key for key, _ in keys})
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                slots.update(rows)
+            for i, (key, tag) in enumerate(keys):
+                slot = slots.get(key)
+                # 槽位超出本进程的映射时（其他进程刚扩容）按未命中处理
+                if slot is None or slot >= len(self._tags) or self._tags[slot] != tag:
+                    continue
+                vector = np.array(self._vectors[slot])
+                if self._tags[slot] == tag:  # 复制期间槽位未被覆盖
+                    found[i] = vector
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE entries SET accessed=? WHERE key=?",
+                                       [(now, keys[i][0]) for i in found])
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def _allocate(self, count: int) -> List[int]:
+        """在写事务内分配槽位：空闲槽位 -> 未使用的尾部槽位 -> 淘汰最久未访问的条目"""
+        slots = [row[0] for row in self._conn.execute("SELECT slot FROM free_slots LIMIT ?", (count,))]
+        self._conn.executemany("DELETE FROM free_slots WHERE slot=?", [(slot,) for slot in slots])
+        if len(slots) < count:
+            next_slot = self._meta("next_slot")
+            take = max(0, min(count - len(slots), self.max_entries - next_slot))
+            self._grow(next_slot + take)
+            slots.extend(range(next_slot, next_slot + take))
+            self._conn.execute("UPDATE meta SET value=? WHERE name='next_slot'", (next_slot + take,))
+        if len(slots) < count:
+            need = count - len(slots)
+            victims = self._conn.execute("SELECT key, slot FROM entries ORDER BY accessed ASC LIMIT ?",
+                                         (max(need, self.evict_batch),)).fetchall()
+            self._conn.executemany("DELETE FROM entries WHERE key=?", [(key,) for key, _ in victims])
+            for _, slot in victims:
+                self._tags[slot] = 0
+            slots.extend(slot for _, slot in victims[:need])
+            self._conn.executemany("INSERT OR IGNORE INTO free_slots(slot) VALUES (?)",
+                                   [(slot,) for _, slot in victims[need:]])
+        return slots
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """批量写入（已存在的键跳过）"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not texts:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._create_vectors(vectors.shape[1])
+                pending = {}
+                for text, vector in zip(texts, vectors):
+                    key, tag = self._key(text)
+                    pending.setdefault(key, (tag, vector))
+                keys = list(pending)
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    for (key,) in self._conn.execute(
+                            f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk):
+                        pending.pop(key, None)
+                items = list(pending.items())[:self.max_entries]
+                slots = self._allocate(len(items))
+                now = time.time()
+                for (key, (tag, vector)), slot in zip(items, slots):
+                    self._tags[slot] = 0
+                    self._vectors[slot] = vector
+                    self._tags[slot] = tag
+                self._conn.executemany("INSERT INTO entries(key, slot, accessed) VALUES (?,?,?)",
+                                       [(key, slot, now) for (key, _), slot in zip(items, slots)])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        """返回条目数与本进程的命中/未命中次数"""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": count, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._tags.flush()
+            self._conn.close()
+
+
+class CachedEncoder:
+    """
+    带持久化缓存的编码器包装，接口与SentenceTransformer.encode一致：
+    命中的文本直接读缓存，未命中的文本去重后合并为一次encode调用，结果写回缓存
+
+    参数:
+        encoder: 被包装的编码器（如EmbeddingModelHandle）
+        cache: EmbeddingCache
+        cache_factory: 无参函数，首次编码时调用以创建缓存（缓存的模型标识取决于实际加载的编码器时使用），
+                       与cache二选一
+    """
+
+    def __init__(self, encoder, cache: Optional[EmbeddingCache] = None, cache_factory=None):
+        self.encoder = encoder
+        self._cache = cache
+        self._cache_factory = cache_factory
+        self._cache_lock = threading.Lock()
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        if self._cache is None:
+            with self._cache_lock:
+                if self._cache is None:
+                    self._cache = self._cache_factory()
+        return self._cache
+
+    def encode(self, sentences, batch_size: int = 64, **kwargs) -> np.ndarray:
+        if kwargs:
+            # 非默认编码参数可能改变输出，不走缓存
+            return self.encoder.encode(sentences, batch_size=batch_size, **kwargs)
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return self.encoder.encode(texts, batch_size=batch_size)
+
+        found = self.cache.get_many(texts)
+        missing = {}
+        for i, text in enumerate(texts):
+            if i not in found:
+                missing.setdefault(normalize_text(text), []).append(i)
+        if missing:
+            # 同一规范化文本只编码一次（取第一次出现的原文）
+            originals = [texts[rows[0]] for rows in missing.values()]
+            encoded = np.asarray(self.encoder.encode(originals, batch_size=batch_size), dtype=np.float32)
+            self.cache.put_many(originals, encoded)
+            for vector, rows in zip(encoded, missing.values()):
+                for i in rows:
+                    found[i] = vector
+
+        vectors = np.stack([found[i] for i in range(len(texts))]).astype(np.float32, copy=False)
+        return vectors[0] if single else vectors
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_id: str, directory: str = "embedding_cache", max_entries: int = 200000) -> EmbeddingCache:
+    """获取（必要时创建）进程内共享的嵌入缓存，同一目录下同一模型只有一个实例"""
+    name = f"{os.path.abspath(directory)}|{model_id}"
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = EmbeddingCache(directory, model_id, max_entries=max_entries)
+        return cache
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+进程级嵌入模型注册表
+
+同一进程内每个嵌入模型只加载一次：首次encode时才加载（懒加载），之后所有
+PersonalMemoryManager / MemoryModule / Mind实例共享同一个模型句柄。
+
+句柄的encode经过微批处理队列：后台线程每次取出队列中所有待处理的请求，
+合并为一次前向计算再按请求拆分结果，并发调用方因此共享前向计算。
+"""
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+
+_embedding_config: Optional[Dict] = None
+
+
+def get_embedding_config(config_file: str = "config.json") -> Dict:
+    """读取config.json的embedding配置（首次调用时读取）"""
+    global _embedding_config
+    if _embedding_config is None:
+        try:
+            with open(config_file, "r", encoding="utf-8") as f:
+                _embedding_config = json.load(f).get("embedding", {})
+        except (OSError, json.JSONDecodeError):
+            _embedding_config = {}
+    return _embedding_config
+
+
+def load_sentence_transformer(model_path: str):
+    """默认加载器：sentence-transformers模型（延迟导入，未使用嵌入时不引入torch）"""
+    from sentence_transformers import SentenceTransformer
+    try:
+        return SentenceTransformer(model_path)
+    except Exception as e:
+        raise RuntimeError(f"模型加载失败: {str(e)}")
+
+
+class EmbeddingModelHandle:
+    """
+    线程安全的嵌入模型句柄
+
+    参数:
+        name: 模型标识（注册表键）
+        loader: 加载函数，返回带有encode(texts, batch_size=..., **kwargs)方法的模型对象
+        max_batch_size: 一次前向计算合并的最大文本数
+        max_wait: 收集请求的等待窗口（秒）；为0时只合并已在队列中的请求，空闲时不增加延迟
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], max_batch_size: int = 256, max_wait: float = 0.0):
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._loader = loader
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.forward_passes = 0  # 实际执行的前向计算次数（用于观察合并效果）
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        """底层模型（首次访问时加载）"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = self._loader()
+                    print(f"嵌入模型 {self.name} 加载完成，耗时 {time.perf_counter() - started:.2f}s")
+        return self._model
+
+    def preload(self) -> "EmbeddingModelHandle":
+        """立即加载模型（如在工作进程启动时预热）"""
+        _ = self.model
+        return self
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 64, **kwargs) -> np.ndarray:
+        """
+        编码文本，接口与SentenceTransformer.encode一致
+
+        参数:
+            sentences: 单个文本或文本列表
+            batch_size: 模型内部的批大小
+            **kwargs: 透传给模型encode的参数（参数相同的请求才会合并）
+
+        返回:
+            np.ndarray: 单个文本返回一维向量，列表返回(len, dim)矩阵
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.asarray(self.model.encode([], batch_size=batch_size, **kwargs))
+
+        future = Future()
+        self._queue.put((texts, batch_size, kwargs, future))
+        self._ensure_worker()
+        vectors = future.result()
+        return vectors[0] if single else vectors
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"embedding-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[tuple]:
+        """阻塞取出一个请求，再收集队列中的后续请求（不超过max_batch_size个文本）"""
+        batch = [self._queue.get()]
+        count = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # 透传参数不同的请求不能合并到同一次前向计算
+            groups: Dict[tuple, List[tuple]] = {}
+            for item in batch:
+                key = tuple(sorted((k, repr(v)) for k, v in item[2].items()))
+                groups.setdefault(key, []).append(item)
+            for items in groups.values():
+                self._forward(items)
+
+    def _forward(self, items: List[tuple]) -> None:
+        texts = [text for item in items for text in item[0]]
+        try:
+            vectors = np.asarray(self.model.encode(texts, batch_size=max(item[1] for item in items), **items[0][2]))
+            self.forward_passes += 1
+        except BaseException as e:
+            for item in items:
+                item[3].set_exception(e)
+            return
+        offset = 0
+        for item in items:
+            item[3].set_result(vectors[offset:offset + len(item[0])])
+            offset += len(item[0])
+
+
+_registry: Dict[str, EmbeddingModelHandle] = {}
+_cached_encoders: Dict[str, Any] = {}  # {句柄名: CachedEncoder}
+_registry_lock = threading.Lock()
+
+
+def get_embedding_model(name: str, loader: Optional[Callable[[], Any]] = None, **handle_options) -> EmbeddingModelHandle:
+    """
+    获取（必要时注册）嵌入模型句柄，同名模型在进程内只有一个句柄
+
+    参数:
+        name: 模型标识，默认加载器下即模型路径
+        loader: 无参加载函数，默认 load_sentence_transformer(name)
+        **handle_options: 首次注册时传给EmbeddingModelHandle的参数（max_batch_size、max_wait）
+
+    返回:
+        EmbeddingModelHandle: 模型句柄（尚未加载，首次encode时加载）
+    """
+    with _registry_lock:
+        handle = _registry.get(name)
+        if handle is None:
+            handle = EmbeddingModelHandle(name, loader or (lambda: load_sentence_transformer(name)), **handle_options)
+            _registry[name] = handle
+        return handle
+
+
+def clear_embedding_models() -> None:
+    """清空注册表（释放模型占用的内存）"""
+    with _registry_lock:
+        _registry.clear()
+        _cached_encoders.clear()
+
+
+def get_sentence_encoder(model_path: str):
+    """
+    按config.json的embedding配置获取句向量编码器
+
+    embedding.backend:
+    - torch（默认）：SentenceTransformer fp32推理
+    - onnx_int8：onnxruntime int8动态量化推理（utils/onnx_embedding.py），首次使用时导出并做一致性校验，
+      依赖缺失或校验不通过时回退到torch
+
+    embedding.cache.enabled 为true时，编码器外包一层持久化缓存（utils/embedding_cache.py），
+    编码过的文本在之后的运行中直接读取缓存
+
+    参数:
+        model_path: sentence-transformers模型目录
+
+    返回:
+        EmbeddingModelHandle / CachedEncoder: 进程内共享的编码器，接口与SentenceTransformer.encode一致
+    """
+    config = get_embedding_config()
+    backend = config.get("backend", "torch")
+    if backend == "onnx_int8":
+        onnx_dir = config.get("onnx_dir") or model_path.rstrip("/\\") + "-onnx"
+
+        def loader():
+            from utils.onnx_embedding import load_onnx_encoder
+            encoder = load_onnx_encoder(model_path, onnx_dir, num_threads=config.get("num_threads", 0),
+                                        parity_threshold=config.get("parity_threshold", 0.99))
+            return encoder if encoder is not None else load_sentence_transformer(model_path)
+
+        handle = get_embedding_model(f"onnx_int8:{model_path}", loader=loader)
+    else:
+        if backend != "torch":
+            print(f"警告: 未知的嵌入后端 {backend}，使用 torch")
+            backend = "torch"
+        handle = get_embedding_model(model_path)
+
+    cache_config = config.get("cache", {})
+    if not cache_config.get("enabled", False):
+        return handle
+    from utils.embedding_cache import CachedEncoder, get_embedding_cache
+
+    def open_cache():
+        # 缓存按实际加载的编码器区分：onnx_int8不可用而回退到fp32时，向量写入torch的缓存，不与int8向量混用
+        loaded_backend = backend
+        if backend == "onnx_int8":
+            from utils.onnx_embedding import OnnxSentenceEncoder
+            if not isinstance(handle.model, OnnxSentenceEncoder):
+                loaded_backend = "torch"
+        model_id = f"{loaded_backend}:{os.path.basename(os.path.normpath(model_path))}"
+        return get_embedding_cache(model_id, directory=cache_config.get("dir", "embedding_cache"),
+                                   max_entries=cache_config.get("max_entries", 200000))
+
+    with _registry_lock:
+        encoder = _cached_encoders.get(handle.name)
+        if encoder is None:
+            if backend == "onnx_int8":
+                # 是否回退只有加载后才知道，首次编码时再确定缓存
+                encoder = CachedEncoder(handle, cache_factory=open_cache)
+            else:
+                encoder = CachedEncoder(handle, open_cache())
+            _cached_encoders[handle.name] = encoder
+        return encoder
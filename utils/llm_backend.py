@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+可插拔的LLM后端：在线(live) / 录制(record) / 回放(replay)
+
+- live:   直接请求服务端
+- record: 请求服务端，同时把响应、usage和耗时追加写入录制包（JSONL）
+- replay: 完全离线，从录制包按请求键返回响应；录制包中没有的请求由合成响应器生成，
+          并按配置模拟网络延迟，用于在无网络环境下复现流水线的CPU侧性能
+
+后端工作在 AsyncLLMClient 的传输层，因此并发调度、重试、请求合并、缓存和遥测在三种模式下行为一致。
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.llm_cache import make_cache_key
+from utils.llm_metrics import extract_usage
+
+
+def _request_key(kwargs: Dict) -> str:
+    """根据请求参数计算与响应缓存一致的请求键"""
+    messages = kwargs.get("messages", [])
+    context = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    prompt = next((m["content"] for m in messages if m.get("role") == "user"), "")
+    return make_cache_key(kwargs.get("model", ""), context, prompt, kwargs.get("response_format"))
+
+
+def _make_response(content: str, usage: Optional[Dict] = None):
+    """构造与ChatCompletion结构兼容的轻量响应对象"""
+    usage = usage or {}
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            prompt_cache_hit_tokens=usage.get("cached_tokens", 0)
+        )
+    )
+
+
+class LiveBackend:
+    """在线后端：直接调用服务端"""
+    mode = "live"
+
+    async def create(self, live_create: Callable[..., Awaitable], **kwargs):
+        return await live_create(**kwargs)
+
+
+class RecordBackend:
+    """
+    录制后端：调用服务端并把每次响应追加写入录制包
+
+    参数:
+        bundle_path: 录制包路径（JSONL，每行一条响应）
+    """
+    mode = "record"
+
+    def __init__(self, bundle_path: str):
+        self.bundle_path = bundle_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(bundle_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def create(self, live_create: Callable[..., Awaitable], **kwargs):
+        started = time.perf_counter()
+        response = await live_create(**kwargs)
+        entry = {
+            "key": _request_key(kwargs),
+            "model": kwargs.get("model", ""),
+            "response": response.choices[0].message.content,
+            "latency": round(time.perf_counter() - started, 4),
+            "usage": extract_usage(response)
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.bundle_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return response
+
+
+class ReplayBackend:
+    """
+    回放后端：离线返回录制包中的响应
+
+    同一请求键录制了多条响应时按出现顺序轮流返回（保留随机阶段的多样性）；
+    录制包中没有的请求交给合成响应器。
+
+    参数:
+        bundle_path: 录制包路径
+        latency: 模拟延迟（秒）；为"recorded"时使用录制时的实际耗时，录制包外的请求使用synthetic_latency
+        synthetic_latency: 合成响应的基础延迟（秒）
+        jitter: 延迟的随机抖动比例（0~1）
+        synthetic_fallback: 未命中时是否使用合成响应；False时抛出KeyError
+    """
+    mode = "replay"
+
+    def __init__(self, bundle_path: str, latency="recorded", synthetic_latency: float = 0.5,
+                 jitter: float = 0.0, synthetic_fallback: bool = True):
+        self.bundle_path = bundle_path
+        self.latency = latency
+        self.synthetic_latency = synthetic_latency
+        self.jitter = jitter
+        self.synthetic_fallback = synthetic_fallback
+        self.entries: Dict[str, List[Dict]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.bundle_path):
+            print(f"警告: 回放录制包不存在 {self.bundle_path}，所有请求将使用合成响应")
+            return
+        with open(self.bundle_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.entries[entry["key"]].append(entry)
+        print(f"已加载回放录制包 {self.bundle_path}，共 {sum(len(v) for v in self.entries.values())} 条响应")
+
+    def _delay(self, recorded: Optional[float]) -> float:
+        if self.latency == "recorded" and recorded is not None:
+            base = recorded
+        elif isinstance(self.latency, (int, float)):
+            base = float(self.latency)
+        else:
+            base = self.synthetic_latency
+        if self.jitter:
+            base *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(0.0, base)
+
+    @staticmethod
+    def synthesize(kwargs: Dict) -> str:
+        """
+        合成响应：JSON格式请求返回空对象，其余返回带请求键前缀的占位文本（内容确定，便于复现）
+        """
+        if kwargs.get("response_format", {}) and kwargs["response_format"].get("type") == "json_object":
+            return "{}"
+        return f"[synthetic:{_request_key(kwargs)[:12]}]"
+
+    async def create(self, live_create: Callable[..., Awaitable], **kwargs):
+        key = _request_key(kwargs)
+        recorded = self.entries.get(key)
+        if recorded:
+            # 事件循环单线程执行，游标无需加锁
+            entry = recorded[self._cursor[key] % len(recorded)]
+            self._cursor[key] += 1
+            self.hits += 1
+            await asyncio.sleep(self._delay(entry.get("latency")))
+            return _make_response(entry["response"], entry.get("usage"))
+        self.misses += 1
+        if not self.synthetic_fallback:
+            raise KeyError(f"回放录制包中不存在该请求: {key}")
+        await asyncio.sleep(self._delay(None))
+        return _make_response(self.synthesize(kwargs))
+
+
+def create_backend(backend_config: Optional[Dict] = None):
+    """
+    根据配置创建后端
+
+    参数:
+        backend_config: 如{"mode": "replay", "bundle": "llm_bundle/responses.jsonl", "latency": "recorded"}
+
+    返回:
+        LiveBackend / RecordBackend / ReplayBackend
+    """
+    backend_config = backend_config or {}
+    mode = os.environ.get("LLM_BACKEND_MODE", backend_config.get("mode", "live"))
+    bundle = os.environ.get("LLM_BACKEND_BUNDLE",
+                            backend_config.get("bundle", os.path.join("llm_bundle", "responses.jsonl")))
+    if mode == "record":
+        return RecordBackend(bundle)
+    if mode == "replay":
+        return ReplayBackend(
+            bundle,
+            latency=backend_config.get("latency", "recorded"),
+            synthetic_latency=backend_config.get("synthetic_latency", 0.5),
+            jitter=backend_config.get("jitter", 0.0),
+            synthetic_fallback=backend_config.get("synthetic_fallback", True)
+        )
+    if mode != "live":
+        raise ValueError(f"未知的LLM后端模式: {mode}，可选 live / record / replay")
+    return LiveBackend()
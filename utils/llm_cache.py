@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+LLM响应的持久化缓存（基于SQLite，按内容寻址）
+
+缓存键由 模型 + 系统上下文 + 提示词 + response_format 计算哈希得到，所有 llm_call* 入口共用。
+支持按条目年龄和总大小淘汰，进程崩溃后重跑同一人物时可以直接命中已付费的响应。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# 当前线程/协程是否临时关闭缓存（用于必须保持随机性的阶段）
+_cache_disabled: ContextVar[bool] = ContextVar("llm_cache_disabled", default=False)
+
+
+@contextmanager
+def llm_cache_disabled():
+    """
+    在with块内关闭LLM响应缓存（仅作用于当前线程/协程，线程池中的任务需在任务内部使用）
+
+    用法:
+        with llm_cache_disabled():
+            res = llm_call(prompt)
+    """
+    token = _cache_disabled.set(True)
+    try:
+        yield
+    finally:
+        _cache_disabled.reset(token)
+
+
+def is_cache_disabled() -> bool:
+    """当前上下文是否关闭了缓存"""
+    return _cache_disabled.get()
+
+
+def make_cache_key(model: str, context: str, prompt: str, response_format: Optional[Dict] = None) -> str:
+    """
+    计算缓存键：对(模型, 系统上下文, 提示词, 返回格式)做SHA-256
+
+    返回:
+        str: 64位十六进制哈希
+    """
+    payload = json.dumps(
+        [model, context, prompt, response_format],
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite实现的LLM响应缓存（线程安全）
+
+    参数:
+        path: 数据库文件路径
+        max_size_mb: 缓存总大小上限（MB），超出后按最近访问时间淘汰
+        max_age_days: 条目最长保留天数，<=0表示不按年龄淘汰
+        evict_interval: 每写入多少条检查一次淘汰
+    """
+
+    def __init__(self, path: str, max_size_mb: float = 1024, max_age_days: float = 30, evict_interval: int = 200):
+        self.path = path
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 86400
+        self.evict_interval = evict_interval
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+            "created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """命中返回缓存的响应文本，未命中或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created = row
+            if self.max_age_seconds > 0 and now - created > self.max_age_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key=?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed=? WHERE key=?", (now, key))
+        return response
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """写入一条响应（同键覆盖）"""
+        if response is None:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, model, response, size, created, accessed) VALUES (?,?,?,?,?,?)",
+                (key, model, response, size, now, now)
+            )
+            self._puts_since_evict += 1
+            need_evict = self._puts_since_evict >= self.evict_interval
+        if need_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        执行淘汰：先删除过期条目，再按最近访问时间从旧到新删除直至总大小不超过上限
+
+        返回:
+            int: 删除的条目数
+        """
+        deleted = 0
+        with self._lock:
+            self._puts_since_evict = 0
+            if self.max_age_seconds > 0:
+                cur = self._conn.execute("DELETE FROM responses WHERE created < ?",
+                                         (time.time() - self.max_age_seconds,))
+                deleted += cur.rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if self.max_bytes > 0 and total > self.max_bytes:
+                excess = total - self.max_bytes
+                victims = []
+                cur = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC")
+                for key, size in cur:
+                    victims.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                cur.close()
+                self._conn.executemany("DELETE FROM responses WHERE key=?", victims)
+                deleted += len(victims)
+        return deleted
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        """返回条目数和总字节数"""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": count, "bytes": total}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
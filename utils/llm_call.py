@@ -1,10 +1,14 @@
 # Please install OpenAI SDK first: `pip3 install openai`
 import os
+import sys
 import json
+import time
 import threading
-from datetime import datetime
 
-from openai import OpenAI
+from utils.llm_client import AsyncLLMClient, RetryPolicy
+from utils.llm_backend import create_backend
+from utils.llm_cache import LLMResponseCache, make_cache_key, is_cache_disabled
+from utils.llm_metrics import LLMMetricsSink, extract_usage
 
 # 读取配置文件
 with open('config.json', 'r', encoding='utf-8') as f:
@@ -14,269 +18,331 @@ with open('config.json', 'r', encoding='utf-8') as f:
 llm_config = config.get('llm', {})
 API_KEY = llm_config.get('api_key', '')
 BASE_URL = llm_config.get('base_url', 'https://api.deepseek.com')
+# 全局并发上限（所有生成器共享）及按模型的并发上限
+MAX_CONCURRENCY = llm_config.get('max_concurrency', 64)
+MODEL_CONCURRENCY = llm_config.get('model_concurrency', {})
+# 重试与自适应并发配置
+RETRY_CONFIG = llm_config.get('retry', {})
+ADAPTIVE_CONFIG = llm_config.get('adaptive_concurrency', {})
+# 响应缓存配置
+CACHE_CONFIG = llm_config.get('cache', {})
+# 默认不缓存的调用方（按"模块"或"模块.函数"前缀匹配）：采样生成的阶段需要保持随机性，
+# 失败后重跑也必须重新请求，否则会拿回同一个解析失败的响应
+DEFAULT_CACHE_EXCLUDED_CALLERS = [
+    "event.mind",                      # 逐日事件生成
+    "event.phone_data_gen",            # 手机数据生成
+    "persona.persona_gen",             # 人物画像生成
+    "event.qa_single_generator",       # QA生成
+    "event.qa_muti_generator",
+    "event.qa_reasoning_generator",
+]
+# 调用遥测配置
+METRICS_CONFIG = llm_config.get('metrics', {})
+METRICS_FILE_PATH = METRICS_CONFIG.get('path', os.path.join('llm_metrics', 'llm_calls.jsonl'))
+# 请求后端配置（live / record / replay，可用环境变量LLM_BACKEND_MODE覆盖）
+BACKEND_CONFIG = llm_config.get('backend', {})
 
-_client = None
-_client_lock = threading.Lock()
+CHAT_MODEL = "deepseek-chat"
+REASON_MODEL = "deepseek-reasoner"
+JSON_FORMAT = {'type': 'json_object'}
 
-# 获取全局唯一的 OpenAI 客户端实例（线程安全）
-def _get_thread_client():
+
+def _get_client():
+    """
+    获取全局唯一的异步LLM客户端实例（线程安全）
+    所有调用共享同一个事件循环和并发调度器，避免在高并发场景下各模块各自开线程/连接
+    """
+    return AsyncLLMClient.get_instance(
+        api_key=API_KEY,
+        base_url=BASE_URL,
+        max_concurrency=MAX_CONCURRENCY,
+        model_limits=MODEL_CONCURRENCY,
+        retry_policy=RetryPolicy(
+            max_retries=RETRY_CONFIG.get('max_retries', 6),
+            base_delay=RETRY_CONFIG.get('base_delay', 1.0),
+            max_delay=RETRY_CONFIG.get('max_delay', 60.0)
+        ),
+        adaptive=ADAPTIVE_CONFIG,
+        backend=_get_backend()
+    )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _get_backend():
     """
-    获取全局唯一的 OpenAI 客户端实例（线程安全）
-    避免在高并发及线程频繁创建/销毁场景下的httpx连接和SSL FD泄漏
+    获取全局唯一的请求后端（线程安全）
+    record模式下所有请求都经过服务端以保证录制完整；replay模式下完全离线，且不读写响应缓存，
+    避免合成响应污染真实缓存
     """
-    global _client
-    if _client is None:
-        with _client_lock:
-            if _client is None:
-                _client = OpenAI(
-                    api_key=API_KEY,
-                    base_url=BASE_URL
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(BACKEND_CONFIG)
+    return _backend
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache():
+    """
+    获取全局唯一的响应缓存实例（线程安全），配置中关闭缓存时返回None
+    """
+    global _cache
+    if not CACHE_CONFIG.get('enabled', True) or _get_backend().mode == 'replay':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache(
+                    path=CACHE_CONFIG.get('path', os.path.join('llm_cache', 'llm_responses.sqlite')),
+                    max_size_mb=CACHE_CONFIG.get('max_size_mb', 1024),
+                    max_age_days=CACHE_CONFIG.get('max_age_days', 30)
                 )
-    return _client
+    return _cache
+
+
+_metrics_sink = None
+_metrics_lock = threading.Lock()
+
+
+def _get_metrics_sink():
+    """
+    获取全局唯一的调用指标写入器（线程安全），配置中关闭遥测时返回None
+    """
+    global _metrics_sink
+    if not METRICS_CONFIG.get('enabled', True):
+        return None
+    if _metrics_sink is None:
+        with _metrics_lock:
+            if _metrics_sink is None:
+                _metrics_sink = LLMMetricsSink(METRICS_FILE_PATH, METRICS_CONFIG.get('prices', {}))
+    return _metrics_sink
+
+
+def _caller_name():
+    """
+    定位llm_call*的实际调用方，返回"模块.函数"（跳过本模块、asyncio调度帧及llm_call_s这类薄封装）
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        if module != __name__ and not module.startswith('asyncio') and not code.co_name.startswith('llm_call'):
+            qualname = getattr(code, 'co_qualname', code.co_name)
+            return f"{module}.{qualname}"
+        frame = frame.f_back
+    return "?"
+
+
+def _request_key_for(model, prompt, context, response_format, cache, caller=None):
+    """
+    计算本次调用的请求键，同时用于响应缓存和在途请求合并；
+    调用方关闭缓存、处于llm_cache_disabled()块内或命中exclude_callers时返回None（保持随机性，不缓存也不合并）
+    """
+    if not cache or is_cache_disabled():
+        return None
+    excluded = CACHE_CONFIG.get('exclude_callers', DEFAULT_CACHE_EXCLUDED_CALLERS)
+    if excluded:
+        caller = caller or _caller_name()
+        if any(caller == item or caller.startswith(item + '.') for item in excluded):
+            return None
+    return make_cache_key(model, context, prompt, response_format)
 
 # 默认系统上下文
 DEFAULT_CONTEXT = "你是一个人物分析师、故事创作者、数据补全与清洗专家。"
 
-# 日志文件路径
-LOG_FILE_PATH = "llm_call_log.txt"
+def _build_messages(prompt, context):
+    # 创建独立的消息列表，不使用任何历史记录
+    return [
+        {"role": "system", "content": context},
+        {"role": "user", "content": prompt}
+    ]
+
+
+class _CallState:
+    """一次llm_call*调用的上下文：请求键、缓存及遥测所需信息"""
+
+    def __init__(self, func_name, model, prompt, context, response_format, cache, record):
+        self.func_name = func_name
+        self.model = model
+        self.prompt = prompt
+        self.context = context
+        self.response_format = response_format
+        self.record = record
+        self.caller = _caller_name()
+        self.started = time.perf_counter()
+        self.request_key = _request_key_for(model, prompt, context, response_format, cache, self.caller)
+        self.response_cache = _get_cache() if self.request_key is not None else None
+
+    def messages(self):
+        return _build_messages(self.prompt, self.context)
+
+    def lookup(self):
+        """查询响应缓存，命中时记录遥测并返回缓存内容，否则返回None"""
+        if self.response_cache is None or _get_backend().mode == 'record':
+            return None
+        cached = self.response_cache.get(self.request_key)
+        if cached is not None:
+            self._emit(cache_hit=True)
+        return cached
+
+    def complete(self, result):
+        """处理客户端返回的ChatResult：写缓存、记录遥测，返回响应文本"""
+        response_content = result.response.choices[0].message.content
+        if self.response_cache is not None:
+            self.response_cache.put(self.request_key, self.model, response_content)
+        self._emit(retries=result.retries, coalesced=result.coalesced, **extract_usage(result.response))
+        return response_content
+
+    def fail(self, error):
+        """记录失败调用的遥测"""
+        self._emit(retries=getattr(error, 'llm_retries', 0), error=type(error).__name__)
+
+    def _emit(self, **fields):
+        sink = _get_metrics_sink()
+        if sink is None:
+            return
+        fields.setdefault("cache_hit", False)
+        sink.record(
+            caller=self.caller,
+            func=self.func_name,
+            model=self.model,
+            latency=round(time.perf_counter() - self.started, 4),
+            prompt_chars=len(self.prompt),
+            **fields
+        )
+
+
+def _chat(func_name, model, prompt, context, response_format=None, cache=True, record=0):
+    """
+    同步调用的公共实现：先查响应缓存，未命中再提交到全局异步客户端并阻塞等待结果
+    （同时在途的相同请求只发起一次网络调用），每次调用写一条遥测记录
+
+    :param func_name: 入口函数名（用于日志）
+    :param model: 模型名称
+    :param prompt: 用户提示词
+    :param context: 系统角色上下文
+    :param response_format: 可选的返回格式约束
+    :param cache: 是否使用响应缓存
+    :param record: 保留参数（调用记录统一写入JSONL遥测）
+    :return: LLM响应内容
+    """
+    state = _CallState(func_name, model, prompt, context, response_format, cache, record)
+    cached = state.lookup()
+    if cached is not None:
+        return cached
+    try:
+        # 相同请求键的并发调用在客户端内合并为一次网络请求
+        result = _get_client().chat(model, state.messages(), response_format, dedupe_key=state.request_key)
+    except Exception as e:
+        state.fail(e)
+        raise
+    return state.complete(result)
 
-# 确保日志文件目录存在
-log_dir = os.path.dirname(LOG_FILE_PATH)
-if log_dir:  # 只有当目录名不为空时才创建目录
-    os.makedirs(log_dir, exist_ok=True)
+
+async def _achat(func_name, model, prompt, context, response_format=None, cache=True, record=0):
+    """
+    异步调用的公共实现：与_chat共用同一个客户端、并发调度器、响应缓存、在途请求合并和遥测
+    """
+    state = _CallState(func_name, model, prompt, context, response_format, cache, record)
+    cached = state.lookup()
+    if cached is not None:
+        return cached
+    try:
+        result = await _get_client().achat(model, state.messages(), response_format, dedupe_key=state.request_key)
+    except Exception as e:
+        state.fail(e)
+        raise
+    return state.complete(result)
 
 
-def llm_call(prompt, context="你是一个人物分析师、故事创作者、数据补全与清洗专家。",record=0):
+def llm_call(prompt, context="你是一个人物分析师、故事创作者、数据补全与清洗专家。",record=0,cache=True):
     """
     调用LLM聊天模型（不保留对话历史）
     
     :param prompt: 用户提示词
     :param context: 系统角色上下文
+    :param cache: 是否使用响应缓存（需要保持随机性的调用传False）
     :return: LLM响应内容
     """
-    # 创建独立的消息列表，不使用任何历史记录
-    messages = [
-        {"role": "system", "content": context},
-        {"role": "user", "content": prompt}
-    ]
-    
-    # 记录调用信息
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"\n{'-'*50}\n"  
-    log_entry += f"时间: {timestamp}\n"
-    log_entry += f"函数: llm_call\n"
-    log_entry += f"模型: deepseek-chat\n"
-    log_entry += f"上下文: {context[:100]}...\n" if len(context) > 100 else f"上下文: {context}\n"
-    log_entry += f"提示词: {prompt[:100]}...\n" if len(prompt) > 100 else f"提示词: {prompt}\n"
-    
-    # 获取全局唯一的OpenAI客户端实例
-    client = _get_thread_client()
-    
-    # 调用LLM
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        stream=False
-    )
-    
-    assistant_message = response.choices[0].message
-    response_content = assistant_message.content
-    
-    # 记录响应
-    log_entry += f"响应: {response_content[:100]}...\n"
-    log_entry += f"{'='*50}\n"
-    
-    # 写入日志文件（线程安全）
-    # with log_lock:
-    #     with open(LOG_FILE_PATH, "a", encoding="utf-8") as f:
-    #         f.write(log_entry)
-    
-    return response_content
+    return _chat("llm_call", CHAT_MODEL, prompt, context, cache=cache, record=record)
 
 
-def llm_call_reason(prompt, context="你是一个人物分析师、故事创作者、数据补全与清洗专家。",record=0):
+def llm_call_reason(prompt, context="你是一个人物分析师、故事创作者、数据补全与清洗专家。",record=0,cache=True):
     """
     调用LLM推理模型（不保留对话历史）
     
     :param prompt: 用户提示词
     :param context: 系统角色上下文
+    :param cache: 是否使用响应缓存（需要保持随机性的调用传False）
     :return: LLM响应内容
     """
-    # 创建独立的消息列表，不使用任何历史记录
-    messages = [
-        {"role": "system", "content": context},
-        {"role": "user", "content": prompt}
-    ]
-    
-    # 记录调用信息
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"\n{'-'*50}\n"  
-    log_entry += f"时间: {timestamp}\n"
-    log_entry += f"函数: llm_call_reason\n"
-    log_entry += f"模型: deepseek-reasoner\n"
-    log_entry += f"上下文: {context[:100]}...\n" if len(context) > 100 else f"上下文: {context}\n"
-    log_entry += f"提示词: {prompt[:100]}...\n" if len(prompt) > 100 else f"提示词: {prompt}\n"
-    
-    # 获取全局唯一的OpenAI客户端实例
-    client = _get_thread_client()
-    
-    # 调用LLM
-    response = client.chat.completions.create(
-        model="deepseek-reasoner",
-        messages=messages,
-        stream=False
-    )
-    
-    response_content = response.choices[0].message.content
-    
-    # 记录响应
-    log_entry += f"响应: {response_content}\n"
-    log_entry += f"{'='*50}\n"
-    
-    # # 写入日志文件
-    # with open(LOG_FILE_PATH, "a", encoding="utf-8") as f:
-    #     f.write(log_entry)
-    
-    return response_content
+    return _chat("llm_call_reason", REASON_MODEL, prompt, context, cache=cache, record=record)
 
 
-def llm_call_j(prompt,record=0):
+def llm_call_j(prompt,record=0,cache=True):
     """
     调用LLM聊天模型并要求返回JSON格式（不保留对话历史）
     
     :param prompt: 用户提示词
+    :param cache: 是否使用响应缓存（需要保持随机性的调用传False）
     :return: LLM响应的JSON内容
     """
-    context = "你是一个人物分析师、故事创作者、数据补全与清洗专家。"
-    # 创建独立的消息列表，不使用任何历史记录
-    messages = [
-        {"role": "system", "content": context},
-        {"role": "user", "content": prompt}
-    ]
-    
-    # 记录调用信息
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"\n{'-'*50}\n"  
-    log_entry += f"时间: {timestamp}\n"
-    log_entry += f"函数: llm_call_j\n"
-    log_entry += f"模型: deepseek-chat\n"
-    log_entry += f"上下文: {context[:100]}...\n" if len(context) > 100 else f"上下文: {context}\n"
-    log_entry += f"提示词: {prompt[:100]}...\n" if len(prompt) > 100 else f"提示词: {prompt}\n"
-    
-    # 获取全局唯一的OpenAI客户端实例
-    client = _get_thread_client()
-    
-    # 调用LLM，增加response_format参数以确保返回JSON格式
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        stream=False,
-        response_format={'type': 'json_object'}
-    )
-    
-    assistant_message = response.choices[0].message
-    response_content = assistant_message.content
-    
-    # 记录响应
-    log_entry += f"响应: {response_content[:100]}...\n" if len(response_content) > 100 else f"响应: {response_content}\n"
-    log_entry += f"{'='*50}\n"
-    
-    # # 写入日志文件（线程安全）
-    # with log_lock:
-    #     with open(LOG_FILE_PATH, "a", encoding="utf-8") as f:
-    #         f.write(log_entry)
-    
-    return response_content
+    return _chat("llm_call_j", CHAT_MODEL, prompt, DEFAULT_CONTEXT, JSON_FORMAT, cache=cache, record=record)
 
 
-def llm_call_reason_j(prompt,record=0):
+def llm_call_reason_j(prompt,record=0,cache=True):
     """
     调用LLM推理模型并要求返回JSON格式（不保留对话历史）
     
     :param prompt: 用户提示词
+    :param cache: 是否使用响应缓存（需要保持随机性的调用传False）
     :return: LLM响应的JSON内容
     """
-    context = "你是一个人物分析师、故事创作者、数据补全与清洗专家。"
-    # 创建独立的消息列表，不使用任何历史记录
-    messages = [
-        {"role": "system", "content": context},
-        {"role": "user", "content": prompt}
-    ]
-    
-    # 记录调用信息
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"\n{'-'*50}\n"  
-    log_entry += f"时间: {timestamp}\n"
-    log_entry += f"函数: llm_call_reason_j\n"
-    log_entry += f"模型: deepseek-reasoner\n"
-    log_entry += f"上下文: {context[:100]}...\n" if len(context) > 100 else f"上下文: {context}\n"
-    log_entry += f"提示词: {prompt[:100]}...\n" if len(prompt) > 100 else f"提示词: {prompt}\n"
-    
-    # 获取全局唯一的OpenAI客户端实例
-    client = _get_thread_client()
-    
-    # 调用LLM，增加response_format参数以确保返回JSON格式
-    response = client.chat.completions.create(
-        model="deepseek-reasoner",
-        messages=messages,
-        stream=False,
-        response_format={'type': 'json_object'}
-    )
-    
-    response_content = response.choices[0].message.content
-    
-    # 记录响应
-    log_entry += f"响应: {response_content}\n"
-    log_entry += f"{'='*50}\n"
-    
-    # # 写入日志文件
-    # with open(LOG_FILE_PATH, "a", encoding="utf-8") as f:
-    #     f.write(log_entry)
-    
-    return response_content
+    return _chat("llm_call_reason_j", REASON_MODEL, prompt, DEFAULT_CONTEXT, JSON_FORMAT, cache=cache, record=record)
 
 
-def llm_call_skip(prompt, context="你是一个人物分析师、故事创作者、数据补全与清洗专家。",record=0):
+def llm_call_skip(prompt, context="你是一个人物分析师、故事创作者、数据补全与清洗专家。",record=0,cache=True):
     """
     调用LLM模型（不保留对话历史）
     
     :param prompt: 用户提示词
     :param context: 系统角色上下文
+    :param cache: 是否使用响应缓存（需要保持随机性的调用传False）
     :return: LLM响应内容
     """
-    # 创建独立的消息列表，不使用任何历史记录
-    messages = [
-        {"role": "system", "content": context},
-        {"role": "user", "content": prompt}
-    ]
-    
-    # 记录调用信息
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"\n{'-'*50}\n"  
-    log_entry += f"时间: {timestamp}\n"
-    log_entry += f"函数: llm_call_skip\n"
-    log_entry += f"模型: deepseek-chat\n"
-    log_entry += f"上下文: {context[:100]}...\n" if len(context) > 100 else f"上下文: {context}\n"
-    log_entry += f"提示词: {prompt[:100]}...\n" if len(prompt) > 100 else f"提示词: {prompt}\n"
-    
-    # 获取当前线程的OpenAI客户端实例
-    client = _get_thread_client()
-    
-    # 调用LLM
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        stream=False
-    )
-    
-    response_content = response.choices[0].message.content
-    
-    # 记录响应
-    log_entry += f"响应: {response_content[:100]}...\n" if len(response_content) > 100 else f"响应: {response_content}\n"
-    log_entry += f"{'='*50}\n"
-    
-    # # 写入日志文件
-    # with open(LOG_FILE_PATH, "a", encoding="utf-8") as f:
-    #     f.write(log_entry)
-    
-    return response_content
\ No newline at end of file
+    return _chat("llm_call_skip", CHAT_MODEL, prompt, context, cache=cache, record=record)
+
+
+# ------------------------------
+# 异步接口：供asyncio原生的调用方直接await，与同步接口共享全局并发上限
+# ------------------------------
+async def allm_call(prompt, context=DEFAULT_CONTEXT, record=0, cache=True):
+    """llm_call的异步版本"""
+    return await _achat("llm_call", CHAT_MODEL, prompt, context, cache=cache, record=record)
+
+
+async def allm_call_reason(prompt, context=DEFAULT_CONTEXT, record=0, cache=True):
+    """llm_call_reason的异步版本"""
+    return await _achat("llm_call_reason", REASON_MODEL, prompt, context, cache=cache, record=record)
+
+
+async def allm_call_j(prompt, record=0, cache=True):
+    """llm_call_j的异步版本"""
+    return await _achat("llm_call_j", CHAT_MODEL, prompt, DEFAULT_CONTEXT, JSON_FORMAT, cache=cache, record=record)
+
+
+async def allm_call_reason_j(prompt, record=0, cache=True):
+    """llm_call_reason_j的异步版本"""
+    return await _achat("llm_call_reason_j", REASON_MODEL, prompt, DEFAULT_CONTEXT, JSON_FORMAT, cache=cache, record=record)
+
+
+async def allm_call_skip(prompt, context=DEFAULT_CONTEXT, record=0, cache=True):
+    """llm_call_skip的异步版本"""
+    return await _achat("llm_call_skip", CHAT_MODEL, prompt, context, cache=cache, record=record)
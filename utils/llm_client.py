@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+异步LLM客户端层
+
+进程内只维护一个后台事件循环线程和一个 AsyncOpenAI 客户端，所有生成器的LLM请求
+（无论来自同步的 llm_call* 还是异步的 allm_call*）都提交到这里，由全局并发调度器
+统一限流：一个进程级总并发上限 + 按模型的并发上限。
+瞬时错误（429/5xx/连接超时）按带抖动的指数退避重试并遵循 Retry-After，
+全局并发上限由AIMD控制器自适应调整：被限流时乘性减小，服务健康时加性增大。
+同时在途的相同请求（相同去重键）合并为一次网络调用，所有调用方共享同一个结果。
+实际的请求由可插拔后端（utils/llm_backend.py：live / record / replay）完成。
+"""
+import asyncio
+import dataclasses
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+from utils.llm_backend import LiveBackend
+
+
+@dataclasses.dataclass
+class ChatResult:
+    """
+    一次对话补全的结果
+
+    属性:
+        response: 原始响应对象（ChatCompletion）
+        retries: 本次请求经历的重试次数
+        coalesced: 是否复用了其他调用方在途请求的结果
+    """
+    response: object
+    retries: int = 0
+    coalesced: bool = False
+
+
+class ConcurrencyLimiter:
+    """
+    可调整上限的异步计数信号量（上限可在运行时修改，修改后立即对等待者生效）
+    """
+
+    def __init__(self, limit: int):
+        self._limit = max(1, int(limit))
+        self._in_use = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def _condition(self) -> asyncio.Condition:
+        # Condition 需在事件循环内创建，首次使用时再初始化
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            while self._in_use >= self._limit:
+                await cond.wait()
+            self._in_use += 1
+
+    async def release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self._in_use -= 1
+            cond.notify()
+
+    async def set_limit(self, limit: int) -> None:
+        cond = self._condition()
+        async with cond:
+            self._limit = max(1, int(limit))
+            cond.notify_all()
+
+
+class RetryPolicy:
+    """
+    重试策略：带完全抖动(full jitter)的指数退避，服务端给出Retry-After时以其为准
+
+    参数:
+        max_retries: 最大重试次数（不含首次请求）
+        base_delay: 退避基数（秒）
+        max_delay: 单次等待上限（秒）
+    """
+    RETRYABLE_STATUS = {408, 409, 429}
+
+    def __init__(self, max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in self.RETRYABLE_STATUS or error.status_code >= 500
+        return False
+
+    @staticmethod
+    def is_throttle(error: Exception) -> bool:
+        """是否为限流类错误（用于触发并发收缩）"""
+        return isinstance(error, openai.RateLimitError) or (
+            isinstance(error, openai.APIStatusError) and error.status_code == 429)
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """
+        从响应头解析服务端建议的等待秒数（支持retry-after-ms、秒数和HTTP日期三种形式）
+        """
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        value = headers.get("retry-after-ms")
+        if value:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        """
+        计算第attempt次重试前的等待时间（attempt从0开始）
+        """
+        hinted = self.retry_after(error)
+        if hinted is not None:
+            # 服务端给出的等待时间上浮0~20%抖动，避免所有等待者同时醒来
+            return min(self.max_delay, hinted) * random.uniform(1.0, 1.2)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class AIMDController:
+    """
+    加性增/乘性减(AIMD)的并发控制器，动态调整限流器的上限
+
+    - 每累计约"当前上限"次成功请求，上限+increase_step
+    - 遇到限流时上限乘以decrease_factor；cooldown秒内只收缩一次，避免一批并发的429把上限压到底
+
+    参数:
+        limiter: 被调整的限流器
+        min_limit: 上限下界
+        max_limit: 上限上界
+    """
+
+    def __init__(self, limiter: "ConcurrencyLimiter", min_limit: int = 4, max_limit: int = 64,
+                 increase_step: int = 1, decrease_factor: float = 0.5, cooldown: float = 5.0):
+        self.limiter = limiter
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._successes = 0
+        self._last_decrease = 0.0
+
+    async def on_success(self) -> None:
+        self._successes += 1
+        limit = self.limiter.limit
+        if self._successes >= limit and limit < self.max_limit:
+            self._successes = 0
+            await self.limiter.set_limit(min(self.max_limit, limit + self.increase_step))
+
+    async def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        limit = self.limiter.limit
+        new_limit = max(self.min_limit, int(limit * self.decrease_factor))
+        if new_limit != limit:
+            print(f"LLM请求被限流，全局并发上限 {limit} -> {new_limit}")
+            await self.limiter.set_limit(new_limit)
+
+
+class ConcurrencyGovernor:
+    """
+    全局并发调度器：所有模型共享一个总并发上限，每个模型另有各自的并发上限
+    """
+
+    def __init__(self, max_concurrency: int = 64, model_limits: Optional[Dict[str, int]] = None,
+                 initial_concurrency: Optional[int] = None):
+        self.global_limiter = ConcurrencyLimiter(initial_concurrency or max_concurrency)
+        self.model_limiters: Dict[str, ConcurrencyLimiter] = {
+            model: ConcurrencyLimiter(limit) for model, limit in (model_limits or {}).items()
+        }
+
+    def _model_limiter(self, model: str) -> Optional[ConcurrencyLimiter]:
+        return self.model_limiters.get(model)
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        """
+        占用一个请求槽位：先占模型槽位，再占全局槽位（避免某个模型排队时占着全局槽位）
+        """
+        model_limiter = self._model_limiter(model)
+        if model_limiter is not None:
+            await model_limiter.acquire()
+        try:
+            await self.global_limiter.acquire()
+            try:
+                yield
+            finally:
+                await self.global_limiter.release()
+        finally:
+            if model_limiter is not None:
+                await model_limiter.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """返回各限流器当前的上限和占用数"""
+        res = {"global": {"limit": self.global_limiter.limit, "in_use": self.global_limiter.in_use}}
+        for model, limiter in self.model_limiters.items():
+            res[model] = {"limit": limiter.limit, "in_use": limiter.in_use}
+        return res
+
+
+class AsyncLLMClient:
+    """
+    进程级唯一的异步LLM客户端
+
+    - 在独立的守护线程中运行事件循环，AsyncOpenAI 客户端只在该循环内创建和使用
+    - 同步调用方通过 chat() 提交协程并阻塞等待结果；异步调用方直接 await achat()
+    """
+    _instance: Optional["AsyncLLMClient"] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, api_key: str = "", base_url: str = "", max_concurrency: int = 64,
+                     model_limits: Optional[Dict[str, int]] = None, retry_policy: Optional[RetryPolicy] = None,
+                     adaptive: Optional[Dict] = None, backend=None) -> "AsyncLLMClient":
+        """
+        获取全局唯一的客户端实例（线程安全，参数仅在首次创建时生效）
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls(api_key, base_url, max_concurrency, model_limits, retry_policy,
+                                        adaptive, backend)
+        return cls._instance
+
+    def __init__(self, api_key: str, base_url: str, max_concurrency: int = 64,
+                 model_limits: Optional[Dict[str, int]] = None, retry_policy: Optional[RetryPolicy] = None,
+                 adaptive: Optional[Dict] = None, backend=None):
+        """
+        参数:
+            api_key / base_url: 服务端配置
+            max_concurrency: 全局并发上限（开启自适应时为上界）
+            model_limits: 按模型的并发上限
+            retry_policy: 重试策略，默认RetryPolicy()
+            adaptive: 自适应并发配置，如{"enabled": True, "min_concurrency": 4, "initial_concurrency": 16}
+            backend: 请求后端（LiveBackend / RecordBackend / ReplayBackend），默认LiveBackend()
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.backend = backend or LiveBackend()
+        self.retry_policy = retry_policy or RetryPolicy()
+        adaptive = adaptive or {}
+        adaptive_enabled = adaptive.get("enabled", True)
+        # 自适应开启时从initial_concurrency起步，逐步增长到max_concurrency；关闭时固定为max_concurrency
+        initial = adaptive.get("initial_concurrency") if adaptive_enabled else None
+        self.governor = ConcurrencyGovernor(max_concurrency, model_limits, initial)
+        self.aimd: Optional[AIMDController] = None
+        if adaptive_enabled:
+            self.aimd = AIMDController(
+                self.governor.global_limiter,
+                min_limit=adaptive.get("min_concurrency", 4),
+                max_limit=max_concurrency,
+                cooldown=adaptive.get("cooldown", 5.0)
+            )
+        self._client: Optional[AsyncOpenAI] = None
+        # 在途请求表 {去重键: Task}，只在事件循环线程内读写
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.coalesced_count = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="llm-client-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def _get_client(self) -> AsyncOpenAI:
+        # 仅在事件循环线程内调用，无需加锁
+        if self._client is None:
+            # 关闭SDK自带重试，由本层统一重试并驱动并发调整
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    async def _live_create(self, **kwargs):
+        return await self._get_client().chat.completions.create(**kwargs)
+
+    async def _achat_on_loop(self, model: str, messages: List[Dict[str, str]],
+                             response_format: Optional[Dict] = None, dedupe_key: Optional[str] = None):
+        """
+        在事件循环内执行请求；给定dedupe_key时，相同键的并发请求共享同一个Task（single-flight）
+        """
+        if dedupe_key is None:
+            return await self._request(model, messages, response_format)
+        task = self._inflight.get(dedupe_key)
+        if task is not None:
+            self.coalesced_count += 1
+            # shield：某个等待者被取消时不影响共享同一请求的其他调用方
+            result = await asyncio.shield(task)
+            return dataclasses.replace(result, coalesced=True)
+        task = self._loop.create_task(self._request(model, messages, response_format))
+        self._inflight[dedupe_key] = task
+        task.add_done_callback(lambda _t, key=dedupe_key: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _request(self, model: str, messages: List[Dict[str, str]],
+                       response_format: Optional[Dict] = None) -> ChatResult:
+        kwargs = {"model": model, "messages": messages, "stream": False}
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            # 退避等待期间不占用并发槽位
+            async with self.governor.slot(model):
+                try:
+                    response = await self.backend.create(self._live_create, **kwargs)
+                except Exception as e:
+                    error = e
+                else:
+                    if self.aimd is not None:
+                        await self.aimd.on_success()
+                    return ChatResult(response, retries=attempt)
+            if not policy.is_retryable(error) or attempt >= policy.max_retries:
+                error.llm_retries = attempt  # 供遥测记录失败前的重试次数
+                raise error
+            if self.aimd is not None and policy.is_throttle(error):
+                await self.aimd.on_throttle()
+            wait = policy.delay(attempt, error)
+            print(f"LLM请求失败({type(error).__name__})，{wait:.1f}秒后进行第{attempt + 1}次重试")
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    async def achat(self, model: str, messages: List[Dict[str, str]], response_format: Optional[Dict] = None,
+                    dedupe_key: Optional[str] = None):
+        """
+        异步发起一次对话补全请求
+
+        参数:
+            model: 模型名称
+            messages: 消息列表
+            response_format: 可选的返回格式约束（如{'type': 'json_object'}）
+            dedupe_key: 去重键，相同键的在途请求只发起一次网络调用；None表示不合并
+
+        返回:
+            ChatResult: 原始响应对象及重试/合并信息
+        """
+        coro = self._achat_on_loop(model, messages, response_format, dedupe_key)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return await coro
+        # 调用方处于其他事件循环中：转交给客户端循环执行，避免跨循环复用连接
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def chat(self, model: str, messages: List[Dict[str, str]], response_format: Optional[Dict] = None,
+             dedupe_key: Optional[str] = None):
+        """
+        同步发起一次对话补全请求（阻塞当前线程直到返回），参数同achat()
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("不能在LLM客户端事件循环线程内同步调用chat()，请改用await achat()")
+        future = asyncio.run_coroutine_threadsafe(
+            self._achat_on_loop(model, messages, response_format, dedupe_key), self._loop)
+        return future.result()
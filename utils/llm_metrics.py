@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+LLM调用遥测：按调用点记录token、耗时、重试、缓存命中等指标
+
+每次 llm_call* 调用写一行JSON到JSONL文件（多进程追加写同一文件），
+run.py / run_all.py 结束时调用 print_llm_metrics_summary 按调用点汇总耗时与费用。
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+def metrics_path_from_config(config_file: str = "config.json") -> str:
+    """
+    从配置文件读取指标文件路径（供只需汇总、不发起LLM调用的入口脚本使用）
+    """
+    default = os.path.join("llm_metrics", "llm_calls.jsonl")
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+    return config.get("llm", {}).get("metrics", {}).get("path", default)
+
+
+def extract_usage(response) -> Dict[str, int]:
+    """
+    从响应对象的usage中提取token数，兼容OpenAI(prompt_tokens_details.cached_tokens)
+    和DeepSeek(prompt_cache_hit_tokens)两种缓存命中字段
+
+    返回:
+        Dict[str, int]: {"prompt_tokens", "completion_tokens", "cached_tokens"}
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": cached or 0
+    }
+
+
+def estimate_cost(record: Dict, prices: Dict[str, Dict[str, float]]) -> float:
+    """
+    按价格表估算单次调用费用
+
+    参数:
+        record: 指标记录
+        prices: {模型: {"input": 每百万输入token价格, "cached_input": 缓存命中输入价格, "output": 每百万输出token价格}}
+
+    返回:
+        float: 费用（与价格表同币种）
+    """
+    price = prices.get(record.get("model", ""))
+    if not price or record.get("cache_hit") or record.get("coalesced"):
+        return 0.0
+    cached = record.get("cached_tokens", 0)
+    uncached = max(0, record.get("prompt_tokens", 0) - cached)
+    cost = uncached * price.get("input", 0)
+    cost += cached * price.get("cached_input", price.get("input", 0))
+    cost += record.get("completion_tokens", 0) * price.get("output", 0)
+    return cost / 1_000_000
+
+
+class LLMMetricsSink:
+    """
+    JSONL指标写入器（线程安全，每条记录一行，追加写入）
+    """
+
+    def __init__(self, path: str, prices: Optional[Dict[str, Dict[str, float]]] = None):
+        self.path = path
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, **fields) -> Dict:
+        """
+        写入一条调用记录，自动补充时间戳、进程号和估算费用
+        """
+        record = {"ts": time.time(), "pid": os.getpid()}
+        record.update(fields)
+        record["cost"] = round(estimate_cost(record, self.prices), 6)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return record
+
+
+def load_llm_metrics(path: str, since: Optional[float] = None) -> List[Dict]:
+    """
+    读取JSONL指标文件
+
+    参数:
+        path: 指标文件路径
+        since: 仅返回该时间戳（秒）之后的记录
+
+    返回:
+        List[Dict]: 指标记录列表（损坏的行会被跳过）
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since is not None and record.get("ts", 0) < since:
+                continue
+            records.append(record)
+    return records
+
+
+def summarize_llm_metrics(records: List[Dict]) -> Dict[str, Dict]:
+    """
+    按调用点（模块.函数）聚合指标
+
+    返回:
+        Dict[str, Dict]: {调用点: {"calls", "cache_hits", "coalesced", "retries", "errors",
+                          "prompt_tokens", "completion_tokens", "cached_tokens", "latency", "cost"}}
+    """
+    summary = defaultdict(lambda: {
+        "calls": 0, "cache_hits": 0, "coalesced": 0, "retries": 0, "errors": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+        "latency": 0.0, "cost": 0.0
+    })
+    for record in records:
+        item = summary[record.get("caller", "?")]
+        item["calls"] += 1
+        item["cache_hits"] += 1 if record.get("cache_hit") else 0
+        item["coalesced"] += 1 if record.get("coalesced") else 0
+        item["retries"] += record.get("retries", 0)
+        item["errors"] += 1 if record.get("error") else 0
+        item["prompt_tokens"] += record.get("prompt_tokens", 0)
+        item["completion_tokens"] += record.get("completion_tokens", 0)
+        item["cached_tokens"] += record.get("cached_tokens", 0)
+        item["latency"] += record.get("latency", 0.0)
+        item["cost"] += record.get("cost", 0.0)
+    return dict(summary)
+
+
+def _ratio(part: int, total: int) -> str:
+    return f"{part / total:.1%}" if total else "-"
+
+
+def print_llm_metrics_summary(path: str, since: Optional[float] = None, top_n: int = 30) -> Dict[str, Dict]:
+    """
+    打印按调用点汇总的LLM指标（按累计耗时降序）
+
+    参数:
+        path: 指标文件路径
+        since: 仅统计该时间戳之后的记录（如本次运行的开始时间）
+        top_n: 最多打印的调用点数量
+
+    返回:
+        Dict[str, Dict]: 汇总结果
+    """
+    summary = summarize_llm_metrics(load_llm_metrics(path, since))
+    if not summary:
+        print(f"未找到LLM调用指标记录: {path}")
+        return summary
+
+    rows = sorted(summary.items(), key=lambda kv: kv[1]["latency"], reverse=True)
+    total_calls = sum(v["calls"] for v in summary.values())
+    total_latency = sum(v["latency"] for v in summary.values())
+    total_cost = sum(v["cost"] for v in summary.values())
+    total_prompt = sum(v["prompt_tokens"] for v in summary.values())
+    total_cached = sum(v["cached_tokens"] for v in summary.values())
+
+    print(f"\n{'='*60}")
+    print(f"LLM调用统计（共 {total_calls} 次，累计耗时 {total_latency:.1f}秒，估算费用 {total_cost:.4f}）")
+    print(f"前缀缓存命中 {total_cached}/{total_prompt} 输入tokens（{_ratio(total_cached, total_prompt)}）")
+    print(f"{'='*60}")
+    for caller, v in rows[:top_n]:
+        avg = v["latency"] / v["calls"] if v["calls"] else 0
+        print(f"{caller}")
+        print(f"   调用 {v['calls']} 次 | 缓存命中 {v['cache_hits']} | 合并 {v['coalesced']} | 重试 {v['retries']} | 失败 {v['errors']}")
+        print(f"   输入 {v['prompt_tokens']} tokens（前缀缓存命中 {v['cached_tokens']}，"
+              f"{_ratio(v['cached_tokens'], v['prompt_tokens'])}）| 输出 {v['completion_tokens']} tokens")
+        print(f"   累计耗时 {v['latency']:.1f}秒 | 平均 {avg:.2f}秒 | 费用 {v['cost']:.4f}")
+    if len(rows) > top_n:
+        print(f"... 其余 {len(rows) - top_n} 个调用点未列出")
+    print(f"{'='*60}")
+    return summary
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+sentence-transformers模型的ONNX int8 CPU后端
+
+把本地模型（如 event/local_models/all-MiniLM-L6-v2）导出为ONNX，并做int8动态量化，
+由onnxruntime在CPU上推理；分词使用tokenizers，池化与归一化按模型目录中的
+1_Pooling/config.json 与 modules.json 复现，输出与SentenceTransformer.encode一致。
+
+依赖（可选）：onnxruntime；导出时还需要torch与transformers。
+
+命令行（导出 + 一致性校验 + 性能对比）：
+    python -m utils.onnx_embedding --model event/local_models/all-MiniLM-L6-v2
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+PARITY_FILE = "parity.json"  # 一致性校验通过后写入，记录校验对象（int8文件大小与修改时间）和最小余弦相似度
+
+# 一致性校验与性能对比使用的默认样本（与记忆库中的topic风格一致）
+SAMPLE_TEXTS = [
+    "晨间瑜伽", "早餐", "工作会议", "晚餐", "项目复盘", "周末去公园散步", "加班到深夜",
+    "和朋友聚餐", "看医生复查", "给父母打电话", "通勤路上听播客", "超市购物",
+    "准备季度汇报材料", "参加孩子的家长会", "健身房力量训练", "整理房间", "学习英语口语",
+    "Weekly planning session", "Dentist appointment", "Reading a novel before bed",
+]
+
+
+def _read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class OnnxSentenceEncoder:
+    """
+    onnxruntime推理的句向量编码器，接口与SentenceTransformer.encode一致
+
+    参数:
+        model_path: 原始sentence-transformers模型目录（读取分词器与池化配置）
+        onnx_path: ONNX模型文件
+        num_threads: onnxruntime算子内线程数，0表示由onnxruntime决定
+    """
+
+    def __init__(self, model_path: str, onnx_path: str, num_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_path = model_path
+        self.onnx_path = onnx_path
+        max_seq_length = _read_json(os.path.join(model_path, "sentence_bert_config.json"), {}).get("max_seq_length", 256)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        pad_token = "[PAD]"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        pooling = _read_json(os.path.join(model_path, "1_Pooling", "config.json"), {})
+        self.pooling = "cls" if pooling.get("pooling_mode_cls_token") else "mean"
+        modules = _read_json(os.path.join(model_path, "modules.json"), [])
+        self.normalize = any(m.get("type", "").endswith("Normalize") for m in modules)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 64, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.session.get_outputs()[0].shape[-1] or 0), dtype=np.float32)
+        # 按长度排序后分批，减少填充
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            chunk = self._forward([texts[i] for i in rows])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), chunk.shape[1]), dtype=np.float32)
+            vectors[rows] = chunk
+        return vectors[0] if single else vectors
+
+
+def export_onnx_int8(model_path: str, output_dir: str, opset: int = 14) -> str:
+    """
+    导出ONNX模型并做int8动态量化
+
+    参数:
+        model_path: sentence-transformers模型目录
+        output_dir: 输出目录（写入model.onnx与model_int8.onnx）
+        opset: ONNX opset版本
+
+    返回:
+        str: 量化后的模型文件路径
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    int8_path = os.path.join(output_dir, INT8_FILE)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModel.from_pretrained(model_path)
+    model.eval()
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.encoder(input_ids=input_ids, attention_mask=attention_mask,
+                                token_type_ids=token_type_ids)[0]
+
+    inputs = tokenizer(SAMPLE_TEXTS[:2], padding=True, return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStates(model),
+            tuple(inputs[name] for name in names),
+            fp32_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in names},
+                          "last_hidden_state": {0: "batch", 1: "sequence"}},
+            opset_version=opset
+        )
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"已导出ONNX模型：{fp32_path}（{os.path.getsize(fp32_path) / 2**20:.1f}MB）"
+          f" -> int8：{int8_path}（{os.path.getsize(int8_path) / 2**20:.1f}MB）")
+    return int8_path
+
+
+def check_parity(reference, candidate, texts: Optional[List[str]] = None, threshold: float = 0.99) -> float:
+    """
+    一致性校验：两个编码器在同一批文本上的向量余弦相似度
+
+    参数:
+        reference: 基准编码器（fp32 SentenceTransformer）
+        candidate: 待校验编码器（ONNX int8）
+        texts: 校验文本，默认SAMPLE_TEXTS
+        threshold: 最低余弦相似度
+
+    返回:
+        float: 所有文本中的最小余弦相似度
+
+    异常:
+        ValueError: 最小余弦相似度低于阈值
+    """
+    texts = texts or SAMPLE_TEXTS
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    min_cosine = float((expected * actual).sum(axis=1).min())
+    if min_cosine < threshold:
+        raise ValueError(f"ONNX int8编码器一致性校验失败：最小余弦相似度 {min_cosine:.4f} < {threshold}")
+    return min_cosine
+
+
+def _int8_signature(int8_path: str) -> Dict[str, int]:
+    stat = os.stat(int8_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_parity_marker(onnx_dir: str, min_cosine: float, threshold: float) -> None:
+    """记录int8模型已通过一致性校验（只在校验通过后调用）"""
+    from utils.IO import atomic_write_json
+    marker = {"model": INT8_FILE, "min_cosine": min_cosine, "threshold": threshold,
+              **_int8_signature(os.path.join(onnx_dir, INT8_FILE))}
+    atomic_write_json(os.path.join(onnx_dir, PARITY_FILE), marker)
+
+
+def parity_verified(onnx_dir: str, threshold: float) -> bool:
+    """
+    int8模型是否已通过一致性校验：标记文件存在、对应当前的int8文件，且记录的最小余弦相似度不低于threshold
+    """
+    try:
+        marker = _read_json(os.path.join(onnx_dir, PARITY_FILE))
+        signature = _int8_signature(os.path.join(onnx_dir, INT8_FILE))
+    except (OSError, ValueError):
+        return False
+    return (isinstance(marker, dict)
+            and all(marker.get(key) == value for key, value in signature.items())
+            and marker.get("min_cosine", -1.0) >= threshold)
+
+
+def benchmark(encoders: Dict[str, object], texts: Optional[List[str]] = None,
+              batch_size: int = 64, repeats: int = 5) -> Dict[str, float]:
+    """
+    编码吞吐对比（逐条编码与批量编码各测一次，预热后取repeats轮平均）
+
+    参数:
+        encoders: {名称: 编码器}
+        texts: 测试文本，默认SAMPLE_TEXTS
+        batch_size: 批量编码的批大小
+        repeats: 重复轮数
+
+    返回:
+        Dict[str, float]: {"名称/single"、"名称/batch": 每秒编码文本数}
+    """
+    texts = texts or SAMPLE_TEXTS
+    results = {}
+    for name, encoder in encoders.items():
+        encoder.encode(texts[:2])  # 预热
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                encoder.encode(text)
+        results[f"{name}/single"] = repeats * len(texts) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(repeats):
+            encoder.encode(texts, batch_size=batch_size)
+        results[f"{name}/batch"] = repeats * len(texts) / (time.perf_counter() - started)
+    for key, value in results.items():
+        print(f"  {key:<16} {value:10.1f} 条/秒")
+    return results
+
+
+def load_onnx_encoder(model_path: str, onnx_dir: str, num_threads: int = 0,
+                      parity_threshold: float = 0.99) -> Optional[OnnxSentenceEncoder]:
+    """
+    加载ONNX int8编码器；量化模型不存在时先导出，没有有效的一致性校验标记（parity.json）时先做一致性校验
+
+    导出后、校验完成前进程退出时不会留下标记，下次启动重新校验，未经校验的模型不会被使用
+
+    返回:
+        OnnxSentenceEncoder: 编码器；依赖缺失、导出/加载失败或一致性校验不通过时返回None（调用方回退到fp32）
+    """
+    int8_path = os.path.join(onnx_dir, INT8_FILE)
+    parity_path = os.path.join(onnx_dir, PARITY_FILE)
+    try:
+        if not os.path.exists(int8_path):
+            if os.path.exists(parity_path):
+                os.remove(parity_path)
+            export_onnx_int8(model_path, onnx_dir)
+        encoder = OnnxSentenceEncoder(model_path, int8_path, num_threads)
+        if not parity_verified(onnx_dir, parity_threshold):
+            from utils.embedding_registry import load_sentence_transformer
+            min_cosine = check_parity(load_sentence_transformer(model_path), encoder, threshold=parity_threshold)
+            write_parity_marker(onnx_dir, min_cosine, parity_threshold)
+            print(f"ONNX int8编码器一致性校验通过：最小余弦相似度 {min_cosine:.4f}")
+        return encoder
+    except ImportError as e:
+        print(f"警告: ONNX后端依赖缺失（{e}），回退到PyTorch fp32编码")
+    except Exception as e:
+        # 导出中断、模型文件损坏或一致性校验不通过：删除（可能不完整的）量化模型和校验标记，下次启动重新导出
+        print(f"警告: ONNX int8编码器不可用（{e}），回退到PyTorch fp32编码")
+        for path in (int8_path, parity_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出ONNX int8句向量模型并校验一致性、对比性能")
+    parser.add_argument("--model", type=str, default="event/local_models/all-MiniLM-L6-v2", help="sentence-transformers模型目录")
+    parser.add_argument("--output", type=str, default=None, help="ONNX输出目录，默认<模型目录>-onnx")
+    parser.add_argument("--threshold", type=float, default=0.99, help="一致性校验的最低余弦相似度")
+    parser.add_argument("--batch-size", type=int, default=64, help="批量编码的批大小")
+    parser.add_argument("--repeats", type=int, default=5, help="性能测试轮数")
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime线程数，0为默认")
+    args = parser.parse_args()
+
+    from utils.embedding_registry import load_sentence_transformer
+
+    output_dir = args.output or args.model.rstrip("/\\") + "-onnx"
+    int8_path = export_onnx_int8(args.model, output_dir)
+    fp32 = load_sentence_transformer(args.model)
+    encoders = {
+        "torch-fp32": fp32,
+        "onnx-fp32": OnnxSentenceEncoder(args.model, os.path.join(output_dir, FP32_FILE), args.threads),
+        "onnx-int8": OnnxSentenceEncoder(args.model, int8_path, args.threads),
+    }
+    for name in ("onnx-fp32", "onnx-int8"):
+        min_cosine = check_parity(fp32, encoders[name], threshold=args.threshold)
+        print(f"{name} 一致性校验通过：最小余弦相似度 {min_cosine:.4f}")
+    write_parity_marker(output_dir, min_cosine, args.threshold)
+    print("编码吞吐：")
+    results = benchmark(encoders, batch_size=args.batch_size, repeats=args.repeats)
+    print(f"int8批量编码加速比：{results['onnx-int8/batch'] / results['torch-fp32/batch']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
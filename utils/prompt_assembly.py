@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+提示词组装：适配服务端前缀（上下文）缓存
+
+模板中静态的大段说明经常和人物画像、日期等变量交错排列，导致同一人物数千次逐日调用的
+提示词从很靠前的位置就开始不同，前缀缓存几乎无法命中。
+
+prefix_cache模式下，模板中的占位符被替换为【变量名】引用，模板正文保持静态，
+随后依次追加人物级数据块（整个人物生成过程中不变）和本次调用的变量数据块：
+
+    系统上下文 → 静态模板正文 → 人物级数据 → 逐日变量
+
+inline模式（默认）与原先的 template.format(...) 完全一致。
+模式由 config.json 的 llm.prompt_assembly 配置（inline / prefix_cache）。
+"""
+import json
+import string
+from typing import Dict, Optional
+
+INLINE = "inline"
+PREFIX_CACHE = "prefix_cache"
+
+_mode: Optional[str] = None
+
+
+def get_prompt_assembly_mode(config_file: str = "config.json") -> str:
+    """读取提示词组装模式（首次调用时从配置文件读取）"""
+    global _mode
+    if _mode is None:
+        try:
+            with open(config_file, "r", encoding="utf-8") as f:
+                mode = json.load(f).get("llm", {}).get("prompt_assembly", INLINE)
+        except (OSError, json.JSONDecodeError):
+            mode = INLINE
+        if mode not in (INLINE, PREFIX_CACHE):
+            print(f"警告: 未知的提示词组装模式 {mode}，使用 {INLINE}")
+            mode = INLINE
+        _mode = mode
+    return _mode
+
+
+def set_prompt_assembly_mode(mode: str) -> None:
+    """在运行时切换提示词组装模式（inline / prefix_cache）"""
+    global _mode
+    if mode not in (INLINE, PREFIX_CACHE):
+        raise ValueError(f"未知的提示词组装模式: {mode}")
+    _mode = mode
+
+
+def _placeholders(template: str):
+    """按出现顺序返回模板中的占位符名称（去重）"""
+    names = []
+    for _, field, _, _ in string.Formatter().parse(template):
+        if field and field not in names:
+            names.append(field)
+    return names
+
+
+def _data_block(title: str, names, values: Dict) -> str:
+    lines = [title]
+    for name in names:
+        lines.append(f"【{name}】：{values[name]}")
+    return "\n".join(lines)
+
+
+def assemble_prompt(template: str, stable: Optional[Dict] = None, /, **variables) -> str:
+    """
+    组装提示词
+
+    参数:
+        template: str.format风格的提示词模板
+        stable: 人物级变量（如persona、cognition、contacts），同一人物的所有调用中保持不变
+        **variables: 每次调用都会变化的变量（如date、plan、memory、当日事件）
+
+    返回:
+        str: 组装后的提示词
+    """
+    stable = stable or {}
+    if get_prompt_assembly_mode() != PREFIX_CACHE:
+        return template.format(**stable, **variables)
+
+    names = _placeholders(template)
+    values = {**stable, **variables}
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise KeyError(missing[0])
+    body = template.format(**{name: f"【{name}】" for name in names})
+    blocks = [body.rstrip()]
+    stable_names = [name for name in names if name in stable and name not in variables]
+    variable_names = [name for name in names if name in variables]
+    if stable_names:
+        blocks.append(_data_block("以下为上文【】处引用的人物信息：", stable_names, values))
+    if variable_names:
+        blocks.append(_data_block("以下为上文【】处引用的本次数据：", variable_names, values))
+    return "\n\n".join(blocks) + "\n"